@@ -0,0 +1,116 @@
+"""
+Agent replay benchmark: re-runs a corpus of recorded agent traces
+(AGENT_TRACE=true) with the recorded tool outputs and memories, so only the
+LLM side varies. Reports per-task iterations, tokens, latency and how far the
+answer drifted from the recorded one.
+
+    python benchmark_agent_replay.py data/agent_traces --llm ollama --model llama3.2:3b
+    python benchmark_agent_replay.py data/agent_traces --llm recorded   # deterministic baseline
+
+--llm recorded repeats the recorded LLM outputs (harness overhead and tool
+latency only), fake uses the offline scripted backend, ollama the real model.
+"""
+
+import argparse
+import difflib
+import json
+import os
+import time
+
+parser = argparse.ArgumentParser(description="Replay recorded agent traces")
+parser.add_argument("traces", help="Trace directory or a single trace file")
+parser.add_argument("--llm", choices=["recorded", "fake", "ollama"], default="recorded")
+parser.add_argument("--model", help="Ollama model to replay with (default OLLAMA_MODEL)")
+parser.add_argument("--no-tool-latency", action="store_true", help="Return recorded tool outputs instantly")
+parser.add_argument("--llm-latency", action="store_true", help="With --llm recorded, also replay recorded LLM timings")
+parser.add_argument("--diff", action="store_true", help="Print answer diffs")
+parser.add_argument("--out", help="Write the full report as JSON")
+args = parser.parse_args()
+
+if args.llm == "fake":
+    os.environ["JARVIS_FAKE_BACKENDS"] = "true"
+os.environ["AGENT_TRACE"] = "false"
+os.environ["AGENT_TOOL_CACHE"] = "false"  # Every task sees exactly its recorded tool outputs
+os.environ["AGENT_PLAN_CACHE"] = "false"
+if args.llm == "recorded":
+    os.environ["AGENT_SHARED_ADMISSION"] = "false"  # No Ollama behind the recorded replies
+
+import core.agent as agent_module
+from core.agent import autonomous_agent
+from core.agent_trace import load_traces, ReplayTools, ReplayMemory, RecordedLLM
+
+def total_tokens(usage: dict) -> int:
+    return (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+
+def replay(trace: dict) -> dict:
+    tools = ReplayTools(trace, latency=not args.no_tool_latency)
+    autonomous_agent.tools = {name: dict(info, func=tools.func(name)) for name, info in autonomous_agent._get_tools().items()}
+    agent_module.memory_manager = ReplayMemory(trace)
+    if args.llm == "recorded":
+        autonomous_agent.llm = RecordedLLM(trace, latency=args.llm_latency)
+
+    start = time.time()
+    result = autonomous_agent.execute(trace["task"], trace.get("context"))
+    seconds = time.time() - start
+
+    recorded = trace.get("result") or {}
+    recorded_answer = recorded.get("output", "")
+    answer = result.get("output", "")
+    return {
+        "task": trace["task"],
+        "file": trace["file"],
+        "recorded": {
+            "iterations": len(recorded.get("usage", {}).get("per_iteration", [])),
+            "tokens": total_tokens(recorded.get("usage", {})),
+            "seconds": round(trace.get("duration_ms", 0) / 1000, 2),
+            "success": recorded.get("success")
+        },
+        "replay": {
+            "iterations": len(result.get("usage", {}).get("per_iteration", [])),
+            "tokens": total_tokens(result.get("usage", {})),
+            "seconds": round(seconds, 2),
+            "success": result.get("success")
+        },
+        "tool_misses": tools.misses,
+        "answer_similarity": round(difflib.SequenceMatcher(None, recorded_answer, answer).ratio(), 3),
+        "answer_diff": list(difflib.unified_diff(recorded_answer.splitlines(), answer.splitlines(), "recorded", "replay", lineterm=""))
+    }
+
+def main():
+    traces = load_traces(args.traces)
+    if not traces:
+        print(f"No traces found in {args.traces} (record some with AGENT_TRACE=true)")
+        return
+    if args.model:
+        autonomous_agent.model = args.model
+    print(f"🔁 Replaying {len(traces)} trace(s) with llm={args.llm} model={autonomous_agent.model}\n")
+
+    report = []
+    for trace in traces:
+        row = replay(trace)
+        report.append(row)
+        rec, rep = row["recorded"], row["replay"]
+        print(f"• {row['task'][:60]}")
+        print(f"   iterations {rec['iterations']} -> {rep['iterations']}   tokens {rec['tokens']} -> {rep['tokens']}   "
+              f"latency {rec['seconds']:.2f}s -> {rep['seconds']:.2f}s   answer similarity {row['answer_similarity']:.2f}"
+              + (f"   tool misses {row['tool_misses']}" if row["tool_misses"] else ""))
+        if args.diff and row["answer_diff"]:
+            print("   " + "\n   ".join(row["answer_diff"]))
+
+    n = len(report)
+    print("\n📊 Totals")
+    for key in ("iterations", "tokens", "seconds"):
+        before = sum(r["recorded"][key] for r in report)
+        after = sum(r["replay"][key] for r in report)
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"   {key}: {before:g} -> {after:g} ({change})")
+    print(f"   mean answer similarity: {sum(r['answer_similarity'] for r in report) / n:.3f}")
+    print(f"   success: {sum(1 for r in report if r['recorded']['success'])}/{n} -> {sum(1 for r in report if r['replay']['success'])}/{n}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Report written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Import-time benchmark for the agent (python -X importtime): compares importing
+core.agent with lazily loaded tools against importing it and then loading every
+tool implementation, which is what the eager imports used to cost at startup.
+"""
+
+import re
+import subprocess
+import sys
+
+LAZY = "import core.agent"
+EAGER = "import core.agent; from core.tools.registry import tool_registry; tool_registry.load_all()"
+TOOL_PACKAGES = ("duckduckgo_search", "bs4", "requests", "pyautogui", "pywhatkit")
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def importtime(code: str) -> dict:
+    """Per-module self/cumulative microseconds for a fresh interpreter running `code`"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    modules = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules[name] = (self_us, cumulative_us)
+        if len(indent) == 1:  # Top-level import
+            total += cumulative_us
+    if proc.returncode != 0:
+        print(f"⚠️ {code!r} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    return {"total_ms": total / 1000, "modules": modules}
+
+def report(label: str, result: dict):
+    modules = result["modules"]
+    tool_packages = [pkg for pkg in TOOL_PACKAGES if pkg in modules]
+    print(f"\n{label}: {result['total_ms']:.0f} ms, {len(modules)} modules")
+    print(f"   Tool packages imported: {', '.join(tool_packages) or 'none'}")
+    heaviest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:8]
+    for name, (self_us, _) in heaviest:
+        print(f"   {self_us / 1000:8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    print("⏱️ Measuring agent import time...")
+    lazy, eager = importtime(LAZY), importtime(EAGER)
+    report("Lazy tools (startup)", lazy)
+    report("All tools loaded", eager)
+    saved = eager["total_ms"] - lazy["total_ms"]
+    print(f"\n💡 Deferred until first tool use: {saved:.0f} ms, {len(eager['modules']) - len(lazy['modules'])} modules")
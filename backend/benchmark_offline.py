@@ -0,0 +1,69 @@
+"""
+Offline load test: drives HybridLLMEngine and AutonomousAgent against the fake
+backends (no Ollama, Gemini key or internet needed) and reports latency
+percentiles and throughput. Timing is controlled by FAKE_TTFT_MS,
+FAKE_TOKENS_PER_SEC and FAKE_SEARCH_LATENCY_MS.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["JARVIS_FAKE_BACKENDS"] = "true"
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+os.environ.setdefault("ROUTER_LOG_PATH", "")
+
+from core.llm_engine import llm_engine
+from core.agent import autonomous_agent
+
+PROMPTS = [
+    "What is a Python decorator?",
+    "Write a python function to reverse a string.",
+    "Analyze the trade-offs between SQL and NoSQL databases for analytics and design a strategy.",
+    "Explain list comprehensions.",
+]
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def timed_request(i: int) -> float:
+    start = time.time()
+    llm_engine.generate_response(PROMPTS[i % len(PROMPTS)], system_prompt="You are Jarvis.", use_cache=False)
+    return time.time() - start
+
+def benchmark(requests: int = 40, concurrency: int = 8):
+    print("🚀 Starting Offline Load Test...")
+
+    # 1. Single request
+    print("\n1. Single request latency...")
+    print(f"   Time: {timed_request(0):.2f} seconds")
+
+    # 2. Concurrent load
+    print(f"\n2. {requests} requests at concurrency {concurrency}...")
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed_request, range(requests)))
+    wall = time.time() - start
+    print(f"   p50: {percentile(latencies, 0.5):.2f}s  p95: {percentile(latencies, 0.95):.2f}s  max: {max(latencies):.2f}s")
+    print(f"   Throughput: {requests / wall:.1f} req/s")
+    print(f"   Admission: {llm_engine.admission_stats()}")
+
+    # 3. Agent loop
+    print("\n3. Agent task...")
+    start = time.time()
+    result = autonomous_agent.execute("Calculate 25 * 4")
+    print(f"   Result: {result.get('output', '')[:80]}")
+    print(f"   Steps: {len(result.get('steps', []))}  Time: {time.time() - start:.2f} seconds")
+
+    # 4. Tokens saved by stopping at the tool call
+    print("\n4. Agent decode tokens per step (early stop on vs off)...")
+    for early_stop in (True, False):
+        autonomous_agent.early_stop = early_stop
+        usage = autonomous_agent.execute("Calculate 25 * 4").get("usage", {})
+        per_step = [step["completion_tokens"] for step in usage.get("per_iteration", [])]
+        print(f"   early_stop={early_stop}: completion tokens {per_step}  discarded {usage.get('discarded_tokens', 0)}")
+
+if __name__ == "__main__":
+    benchmark(*(int(arg) for arg in sys.argv[1:3]))
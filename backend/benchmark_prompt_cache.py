@@ -0,0 +1,101 @@
+"""
+Benchmark: prompt-eval time with legacy vs prefix-stable prompt assembly.
+Replays the same multi-turn conversation against Ollama both ways and compares
+the prompt tokens Ollama had to evaluate (tokens served from its KV cache are
+not counted in prompt_eval_count).
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+import ollama
+from core.prompt_builder import PromptBuilder, compose_user_turn
+
+TURNS = [
+    "What is a Python decorator?",
+    "Show me a decorator that times a function.",
+    "How would I make it work for async functions too?",
+    "What's the difference between functools.wraps and not using it?",
+    "Can decorators take arguments?",
+    "Write one that retries a function 3 times.",
+    "How do class decorators differ?",
+    "Summarize what we discussed.",
+]
+
+RAG_SNIPPETS = [
+    "Relevant Context from Knowledge Base:\n[1] Decorators wrap callables...",
+    "Relevant Context from Knowledge Base:\n[1] time.perf_counter is a monotonic clock...",
+    "Relevant Context from Knowledge Base:\n[1] asyncio coroutines must be awaited...",
+    "",
+]
+
+def fake_clock(turn: int) -> str:
+    # Each turn lands in a different minute, as in real use
+    return (datetime(2025, 1, 6, 9, 0) + timedelta(minutes=3 * turn)).strftime("%A, %B %d, %Y at %I:%M %p")
+
+def legacy_messages(turn: int, history: list, message: str) -> list:
+    """Old main.py layout: time and RAG context at the top, sliding 10-message window"""
+    system_prompt = f"""You are Jarvis, an advanced AI assistant specializing in coding, education, and general knowledge.
+
+Current time: {fake_clock(turn)}
+
+{RAG_SNIPPETS[turn % len(RAG_SNIPPETS)]}
+
+Be helpful, concise, and accurate."""
+    window = history[-9:]
+    return [{"role": "system", "content": system_prompt}, *window, {"role": "user", "content": message}]
+
+def stable_messages(builder: PromptBuilder, turn: int, history: list, message: str) -> list:
+    """New layout: stable system prompt and history first, volatile context in the last turn"""
+    prompt = builder.build("normal", history, current_time=fake_clock(turn), rag_context=RAG_SNIPPETS[turn % len(RAG_SNIPPETS)])
+    return [
+        {"role": "system", "content": prompt["system_prompt"]},
+        *prompt["history"],
+        {"role": "user", "content": compose_user_turn(message, prompt["context"])},
+    ]
+
+def run_session(client: ollama.Client, model: str, layout: str) -> dict:
+    builder = PromptBuilder()
+    history = []
+    totals = {"prompt_tokens": 0, "prompt_eval_ms": 0.0, "wall_s": 0.0}
+
+    for turn, message in enumerate(TURNS):
+        if layout == "legacy":
+            messages = legacy_messages(turn, history, message)
+        else:
+            messages = stable_messages(builder, turn, history, message)
+
+        start = time.time()
+        response = client.chat(model=model, messages=messages, options={"temperature": 0, "num_predict": 64})
+        totals["wall_s"] += time.time() - start
+        totals["prompt_tokens"] += response.get("prompt_eval_count", 0) or 0
+        totals["prompt_eval_ms"] += (response.get("prompt_eval_duration", 0) or 0) / 1e6
+
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": response["message"]["content"]})
+
+    return totals
+
+def benchmark():
+    print("🚀 Starting Prompt Prefix Benchmark...")
+    model = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:3b")
+    client = ollama.Client(host=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"))
+
+    # Warm the model so load time doesn't skew the first layout
+    client.chat(model=model, messages=[{"role": "user", "content": "hi"}], options={"num_predict": 1})
+
+    results = {}
+    for layout in ("legacy", "stable"):
+        print(f"\n▶ Replaying {len(TURNS)} turns with {layout} layout...")
+        results[layout] = run_session(client, model, layout)
+        r = results[layout]
+        print(f"   Prompt tokens evaluated: {r['prompt_tokens']}")
+        print(f"   Prompt eval time: {r['prompt_eval_ms']:.0f} ms")
+        print(f"   Wall time: {r['wall_s']:.2f} s")
+
+    saved_ms = results["legacy"]["prompt_eval_ms"] - results["stable"]["prompt_eval_ms"]
+    saved_tokens = results["legacy"]["prompt_tokens"] - results["stable"]["prompt_tokens"]
+    print(f"\n📊 Prefix-stable layout saved {saved_tokens} prompt tokens and {saved_ms:.0f} ms of prompt eval")
+
+if __name__ == "__main__":
+    benchmark()
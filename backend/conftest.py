@@ -0,0 +1,29 @@
+"""
+Shared pytest fixtures. Tests run offline: LLM, search and scraping calls go
+to the stand-ins in core.fakes (JARVIS_FAKE_BACKENDS=true).
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("JARVIS_FAKE_BACKENDS", "true")
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """A fresh AutonomousAgent on the fake Ollama client (skipped if the agent's packages are missing)"""
+    pytest.importorskip("ollama")
+    pytest.importorskip("dotenv")
+    monkeypatch.setenv("JARVIS_FAKE_BACKENDS", "true")
+    monkeypatch.setenv("FAKE_TTFT_MS", "1")
+    monkeypatch.setenv("FAKE_TOKENS_PER_SEC", "100000")
+    monkeypatch.setenv("FAKE_PROMPT_TOKENS_PER_SEC", "1000000")
+    # Keep runs independent of the chat engine and of earlier runs' plans
+    monkeypatch.setenv("AGENT_SHARED_ADMISSION", "false")
+    monkeypatch.setenv("AGENT_PLAN_CACHE", "false")
+    monkeypatch.setenv("AGENT_TRACE", "false")
+    from core.agent import AutonomousAgent
+    instance = AutonomousAgent()
+    yield instance
+    instance.tool_pool.shutdown(wait=False)
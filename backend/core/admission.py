@@ -0,0 +1,341 @@
+"""
+Admission Control for LLM Backends
+Per-backend concurrency limits and token-bucket rate limiting.
+Callers that cannot be served in time are rejected fast with a retry hint.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+
+class BackendOverloaded(Exception):
+    """Raised when a backend's queue is full or its rate budget is exhausted"""
+
+    def __init__(self, backend: str, retry_after: float, reason: str):
+        self.backend = backend
+        self.retry_after = max(1.0, retry_after)
+        self.reason = reason
+        super().__init__(f"{backend} backend overloaded ({reason}), retry after {self.retry_after:.0f}s")
+
+
+class StreamCancelled(Exception):
+    """Raised to a caller whose request was cancelled while it waited for a slot"""
+
+
+class Cancellation:
+    """Thread-safe cancel flag (a threading.Event stand-in) that runs registered callbacks when it is set"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Run `callback` on cancellation (right away if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancel callback failed: {e}")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float) -> float:
+        """
+        Take one token and return how long the caller must wait before using it.
+        Raises BackendOverloaded (without taking a token) if the wait exceeds max_wait.
+        """
+        with self._lock:
+            self._refill()
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                raise BackendOverloaded("", wait, "rate limit")
+            self.tokens -= 1
+            return wait
+
+    def refund(self):
+        """Return a token that was reserved but never used"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class BackendLimiter:
+    """
+    Concurrency limit + bounded wait queue (+ optional token bucket) for one backend.
+    Uses threading primitives so it protects both sync callers (agent, scripts)
+    and async endpoints, which run generation off the event loop.
+    Background callers (batch and agent jobs) have lower priority: they are only
+    admitted while no interactive request is queued, and hold at most
+    `max_background` slots, so with more than one slot one stays free for chat.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        max_wait: float = 30.0,
+        rate_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_background: Optional[int] = None
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_background = max(1, max_background if max_background is not None else self.max_concurrency - 1)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.bucket = None
+        if rate_per_minute:
+            self.bucket = TokenBucket(rate_per_minute / 60.0, burst or max(1, int(rate_per_minute // 6)))
+
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.background_in_flight = 0
+        self.background_waiting = 0
+
+        # Metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.total_service = 0.0
+        self.ewma_service = 0.0
+        self.completed = 0
+
+    def _retry_after(self) -> float:
+        """Estimate when a slot will free up from the average service time"""
+        avg_service = self.total_service / self.completed if self.completed else 5.0
+        return avg_service * (self.waiting + 1) / self.max_concurrency
+
+    def _wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _blocked(self, background: bool) -> bool:
+        """Whether a caller of this priority has to wait (lock held)"""
+        if self.in_flight >= self.max_concurrency:
+            return True
+        if not background:
+            return False
+        return self.waiting > self.background_waiting or self.background_in_flight >= self.max_background
+
+    def acquire(self, cancel: Optional[Cancellation] = None, background: bool = False) -> float:
+        """Block until a slot is free (or `cancel` is set); returns the time spent waiting"""
+        start = time.monotonic()
+        deadline = start + self.max_wait
+
+        if self.bucket:
+            try:
+                rate_wait = self.bucket.reserve(self.max_wait)
+            except BackendOverloaded as e:
+                with self._cond:
+                    self.rejected += 1
+                raise BackendOverloaded(self.name, e.retry_after, "rate limit")
+            if rate_wait > 0:
+                time.sleep(rate_wait)
+
+        with self._cond:
+            # Each priority has its own queue bound, so queued jobs never fill chat's queue
+            queued = self.background_waiting if background else self.waiting - self.background_waiting
+            if self._blocked(background) and queued >= self.max_queue:
+                self.rejected += 1
+                if self.bucket:
+                    self.bucket.refund()
+                raise BackendOverloaded(self.name, self._retry_after(), "queue full")
+
+            self.waiting += 1
+            if background:
+                self.background_waiting += 1
+            if cancel:
+                cancel.on_cancel(self._wake_all)
+            try:
+                while self._blocked(background):
+                    if cancel and cancel.is_set():
+                        if self.bucket:
+                            self.bucket.refund()
+                        raise StreamCancelled(f"{self.name} request cancelled while queued")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        if self.bucket:
+                            self.bucket.refund()
+                        raise BackendOverloaded(self.name, self._retry_after(), "queue timeout")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                if background:
+                    self.background_waiting -= 1
+                    # Interactive callers may have been the only ones ahead
+                    self._cond.notify_all()
+
+            self.in_flight += 1
+            if background:
+                self.background_in_flight += 1
+            waited = time.monotonic() - start
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+            return waited
+
+    def release(self, service_time: float = 0.0, background: bool = False):
+        """Free a slot and wake the waiters"""
+        with self._cond:
+            self.in_flight -= 1
+            if background:
+                self.background_in_flight -= 1
+            self.completed += 1
+            self.total_service += service_time
+            # Recent latency, weighted towards the last few calls
+            self.ewma_service = service_time if self.completed == 1 else 0.8 * self.ewma_service + 0.2 * service_time
+            # Waiters of both priorities check different conditions
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, background: bool = False):
+        """Hold a slot for the duration of the block"""
+        self.acquire(background=background)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start, background)
+
+    def stream(self, iterator: Iterator, cancel: Optional[Cancellation] = None, background: bool = False) -> "SlotStream":
+        """
+        Acquire a slot now and hold it until the stream is exhausted or closed,
+        or until `cancel` is set (even while the stream waits for its first chunk)
+        """
+        self.acquire(cancel, background)
+        return SlotStream(iterator, lambda service_time: self.release(service_time, background), cancel)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "background_in_flight": self.background_in_flight,
+                "background_queue_depth": self.background_waiting,
+                "max_background": self.max_background,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(1000 * self.total_wait / self.admitted, 1) if self.admitted else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seen, 1),
+                "ewma_latency_ms": round(1000 * self.ewma_service, 1),
+                "rate_tokens": round(self.bucket.tokens, 2) if self.bucket else None
+            }
+
+
+class SlotStream:
+    """
+    Iterator wrapper that releases its admission slot exactly once, when the
+    underlying stream is closed. On cancel an idle stream is closed at once; one
+    blocked waiting for a chunk (e.g. in Ollama's prompt evaluation) is closed
+    as soon as that chunk arrives, so the slot is never freed while the backend
+    request is still running.
+    """
+
+    def __init__(self, iterator: Iterator, release: Callable[[float], None], cancel: Optional[Cancellation] = None):
+        self._iterator = iter(iterator)
+        self._release = release
+        self._start = time.monotonic()
+        self._released = False
+        self._active = False
+        self._cancelled = False
+        self._closed = False
+        self._lock = threading.Lock()
+        if cancel:
+            cancel.on_cancel(self._cancel)
+
+    def _finish(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._release(time.monotonic() - self._start)
+
+    def _cancel(self):
+        with self._lock:
+            self._cancelled = True
+            if self._active:
+                return  # The thread inside __next__ closes the stream when it returns
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            if self._cancelled:
+                cancelled = True
+            else:
+                cancelled = False
+                self._active = True
+        if cancelled:
+            self.close()
+            raise StreamCancelled("stream cancelled")
+        try:
+            item = next(self._iterator)
+        except BaseException:
+            with self._lock:
+                self._active = False
+            self.close()
+            raise
+        with self._lock:
+            self._active = False
+            cancelled = self._cancelled
+        if cancelled:
+            self.close()
+            raise StreamCancelled("stream cancelled")
+        return item
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            close = getattr(self._iterator, "close", None)
+            if close:
+                close()
+        finally:
+            self._finish()
+
+    def __del__(self):
+        self._finish()
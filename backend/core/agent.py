@@ -3,23 +3,48 @@ Advanced Autonomous Agent
 Implements robust reasoning and tool use capabilities
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Generator
 import os
 import re
 import json
+import time
+import uuid
+import queue
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import ollama
 from dotenv import load_dotenv
-from langchain_community.llms import Ollama
-from core.tools.web_search import search_web, get_current_time, search_news, scrape_webpage
-from core.tools.calculator import calculate
-from core.tools.code_executor import execute_code
-from core.tools.file_manager import file_manager
-from core.tools.automation import AutomationTools
-from core.tools.communication import CommunicationTools
+from core.tools.registry import tool_registry
 from core.memory import memory_manager
+from core.tool_cache import ToolResultCache, NEVER_CACHE, is_cacheable_output
+from core.plan_cache import create_plan_cache
+from core.budget import RunBudget, parse_tool_timeouts
+from core.agent_trace import TraceRecorder, AgentTrace
+from core.fakes import fake_backends_enabled
+from core.request_context import RequestContext
+from core.telemetry import LLMTelemetry
+from core.admission import BackendOverloaded, Cancellation, StreamCancelled
 
 load_dotenv()
 
+# Where a model that ignores the protocol starts inventing the tool's output
+STOP_SEQUENCES = ["[System]", "\nObservation:", "\nOBSERVATION:", "\nTool Output:"]
+
+TEXT_TOOL_FORMAT = """5. To use a tool, you MUST use this EXACT format:
+   TOOL: tool_name
+   INPUT: input_for_the_tool
+6. For independent lookups (e.g. the weather in three cities), write several TOOL/INPUT pairs in one reply; they run in parallel and all outputs come back together.
+7. If you have the final answer or don't need a tool, just write the answer normally."""
+
+JSON_TOOL_FORMAT = """5. Reply with ONE JSON object: {"thought": "...", "tool_calls": [{"tool": "tool_name", "input": "input_for_the_tool"}], "answer": ""}
+6. For independent lookups (e.g. the weather in three cities), put several calls in tool_calls; they run in parallel and all outputs come back together.
+7. When you have the final answer, return an empty tool_calls list and put the answer in "answer"."""
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4
+
 class AutonomousAgent:
     """
     Advanced Autonomous Agent
@@ -29,115 +54,90 @@ class AutonomousAgent:
     def __init__(self):
         self.model = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:14b-instruct-q4_K_M")
         self.max_iterations = int(os.getenv("MAX_ITERATIONS", "10"))
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # Tool observations kept verbatim in the conversation; older ones are truncated past this
+        self.observation_budget = int(os.getenv("AGENT_OBSERVATION_BUDGET", "2000"))
+        self.max_observation_tokens = int(os.getenv("AGENT_MAX_OBSERVATION_TOKENS", "1000"))
+        # Independent tool calls from one step run concurrently
+        self.tool_timeout = float(os.getenv("AGENT_TOOL_TIMEOUT", "30"))
+        # Per-tool overrides, e.g. "scrape_webpage=20,execute_code=10"
+        self.tool_timeouts = parse_tool_timeouts(os.getenv("AGENT_TOOL_TIMEOUTS", ""))
+        # Reserved for the best-effort answer written when a run budget runs out
+        self.final_answer_tokens = int(os.getenv("AGENT_FINAL_ANSWER_TOKENS", "256"))
+        self.final_answer_seconds = float(os.getenv("AGENT_FINAL_ANSWER_SECONDS", "30"))
+        # Halt generation once a tool call is complete: stop sequences plus a client-side
+        # cut when the reply moves on past its last TOOL/INPUT pair
+        self.early_stop = os.getenv("AGENT_EARLY_STOP", "true").lower() == "true"
+        # JSON-schema constrained tool calls (Ollama "format"); the reply ends when the object closes
+        self.structured_output = os.getenv("AGENT_STRUCTURED_OUTPUT", "false").lower() == "true"
+        self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+        self._schema_format: Optional[bool] = None  # Detected on first use
+        self.tool_workers = int(os.getenv("AGENT_TOOL_WORKERS", "4"))
+        self.tool_pool = self._new_tool_pool()
+        self._pool_lock = threading.Lock()
+        self.abandoned_tool_calls = 0
+        # Results of idempotent tools are reused within and across runs
+        self.tool_cache = None
+        if os.getenv("AGENT_TOOL_CACHE", "true").lower() == "true":
+            self.tool_cache = ToolResultCache(max_entries=int(os.getenv("AGENT_TOOL_CACHE_MAX_ENTRIES", "256")))
+        
+        # Tool-call plans of successful runs, reused for recurring tasks
+        self.plan_cache = create_plan_cache() if os.getenv("AGENT_PLAN_CACHE", "true").lower() == "true" else None
+        
+        # LLM calls go through the chat engine's local admission limiter, circuit
+        # breaker and telemetry, so agent runs and chat share Ollama's slots
+        self.shared_admission = os.getenv("AGENT_SHARED_ADMISSION", "true").lower() == "true"
+        # Background runs (agent jobs) queue behind chat; a queue timeout is retried this often
+        self.background_retries = int(os.getenv("AGENT_JOB_ADMISSION_RETRIES", "3"))
         
         print(f"🤖 Initializing Advanced Agent with model: {self.model}")
         
-        # Initialize LLM with error handling
+        # Initialize LLM (chat API, so Ollama can reuse the KV cache across iterations)
         try:
-            self.llm = Ollama(
-                model=self.model,
-                base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-                temperature=0.7
-            )
+            if fake_backends_enabled():
+                from core.fakes import FakeOllamaClient
+                self.llm = FakeOllamaClient()
+            else:
+                self.llm = ollama.Client(host=self.base_url)
         except Exception as e:
             print(f"❌ Agent LLM Initialization Failed: {e}")
             self.llm = None
         
-        # Initialize Tool Suites
-        self.automation = AutomationTools()
-        self.communication = CommunicationTools()
-        
-        # Define tools
+        # Define tools (implementations are imported on first use)
         self.tools = self._get_tools()
+        
+        # Cancellation handles of runs in progress, by run id
+        self.active_runs: Dict[str, Cancellation] = {}
+        # Full run traces for replay benchmarks (AGENT_TRACE=true)
+        self.tracer = TraceRecorder()
     
     def _get_tools(self) -> Dict[str, Any]:
-        """Get available tools with detailed descriptions"""
-        return {
-            "web_search": {
-                "func": search_web,
-                "desc": "Search the internet for real-time information, news, and facts."
-            },
-            "calculator": {
-                "func": calculate,
-                "desc": "Perform mathematical calculations. Input: math expression string."
-            },
-            "execute_code": {
-                "func": execute_code,
-                "desc": "Execute Python code in a secure sandbox. Input: valid python code."
-            },
-            "read_file": {
-                "func": file_manager.read_file,
-                "desc": "Read contents of a file. Input: filename."
-            },
-            "list_files": {
-                "func": lambda x: str(file_manager.list_files(x if x else ".")),
-                "desc": "List files in directory. Input: directory path (or empty for root)."
-            },
-            "write_file": {
-                "func": lambda x: self._handle_write_file(x),
-                "desc": "Write content to a file. Input format: 'filename||content'"
-            },
-            "get_time": {
-                "func": lambda x: get_current_time(),
-                "desc": "Get current date and time."
-            },
-            "open_app": {
-                "func": lambda x: self.automation.execute("open_app", x),
-                "desc": "Open a desktop application. Input: app name (e.g., 'spotify', 'notepad')."
-            },
-            "type_text": {
-                "func": lambda x: self.automation.execute("type_text", x),
-                "desc": "Type text on the keyboard. Input: text to type."
-            },
-            "send_email": {
-                "func": lambda x: self.communication.execute("send_email", x),
-                "desc": "Send an email. Input format: 'to_email|subject|body'"
-            },
-            "send_whatsapp": {
-                "func": lambda x: self.communication.execute("send_whatsapp", x),
-                "desc": "Send a WhatsApp message. Input format: 'phone_number|message'"
-            },
-            "remember": {
-                "func": lambda x: memory_manager.store_long_term_memory(x),
-                "desc": "Store a fact or memory for the future. Input: text to remember."
-            }
-        }
-    
-    def _handle_write_file(self, input_str: str) -> str:
-        """Helper to parse write_file input"""
-        try:
-            if "||" in input_str:
-                path, content = input_str.split("||", 1)
-                return file_manager.write_file(path, content)
-            return "Error: Input must be 'filename||content'"
-        except Exception as e:
-            return f"Error writing file: {e}"
-
-    def execute(self, task: str, context: Optional[str] = None) -> Dict[str, Any]:
         """
-        Execute a complex task using reasoning and tools.
+        Get available tools with detailed descriptions (see core/tools/registry.py;
+        tools with missing packages or settings are left out).
+        Optional keys: "timeout" (seconds, default AGENT_TOOL_TIMEOUT),
+        "parallel" (False for tools that drive the desktop or have side effects
+        whose order matters; those run one at a time, in the order requested) and
+        "cache_ttl" (seconds to reuse a result for the same input, None = forever;
+        ignored for tools in NEVER_CACHE).
         """
-        if not self.llm:
-            return {"success": False, "output": "Agent not initialized (Ollama connection failed). Please check if Ollama is running.", "steps": []}
+        tools = tool_registry.tools()
+        for name in NEVER_CACHE & tools.keys():
+            tools[name].pop("cache_ttl", None)
+        for name, timeout in self.tool_timeouts.items():
+            if name in tools:
+                tools[name]["timeout"] = timeout
+        return tools
 
-        print(f"🤖 Agent received task: {task}")
-        
-        # Retrieve relevant memories
-        memories = memory_manager.search_memories(task)
-        memory_context = ""
-        if memories:
-            memory_context = "\nRELEVANT MEMORIES:\n" + "\n".join([f"- {m}" for m in memories]) + "\n"
-            print(f"🧠 Found relevant memories: {len(memories)}")
-        
-        # Construct the system prompt
+    def _system_prompt(self) -> str:
+        """Task-independent instructions, so the prefix is identical across runs"""
         tools_desc = "\n".join([f"- {name}: {info['desc']}" for name, info in self.tools.items()])
         
-        system_prompt = f"""You are Jarvis, an Advanced Autonomous AI Agent running LOCALLY on the user's computer.
+        return f"""You are Jarvis, an Advanced Autonomous AI Agent running LOCALLY on the user's computer.
 
 CAPABILITIES:
 {tools_desc}
 
-{memory_context}
 IMPORTANT:
 - You have FULL PERMISSION to control the mouse, keyboard, and open applications.
 - You have FULL PERMISSION to send emails and messages as requested.
@@ -150,80 +150,695 @@ INSTRUCTIONS:
 2. Think step-by-step about how to solve it.
 3. Use tools when you need external information or to perform actions.
 4. **VERIFY TOOL OUTPUT**: If a tool returns "Error" or "not recognized", trying again or using a different method. DO NOT claim success if the tool failed.
-5. To use a tool, you MUST use this EXACT format:
-   TOOL: tool_name
-   INPUT: input_for_the_tool
-6. If you have the final answer or don't need a tool, just write the answer normally.
-
-TASK: {task}
+{JSON_TOOL_FORMAT if self.structured_output else TEXT_TOOL_FORMAT}
 """
-        if context:
-            system_prompt += f"\nCONTEXT: {context}"
 
-        system_prompt += "\n\nBegin reasoning:"
+    def _tool_call_schema(self) -> Dict[str, Any]:
+        """JSON schema for a structured reply; tool names are constrained to real tools"""
+        return {
+            "type": "object",
+            "properties": {
+                "thought": {"type": "string"},
+                "tool_calls": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "tool": {"type": "string", "enum": list(self.tools.keys())},
+                            "input": {"type": "string"}
+                        },
+                        "required": ["tool", "input"]
+                    }
+                },
+                "answer": {"type": "string"}
+            },
+            "required": ["thought", "tool_calls", "answer"]
+        }
+
+    def _schema_format_supported(self) -> bool:
+        """
+        A JSON schema as `format` needs ollama-python >= 0.4 and an Ollama server
+        >= 0.5 (structured outputs); checked once
+        """
+        if self._schema_format is None:
+            self._schema_format = fake_backends_enabled() or self._detect_schema_format()
+            if not self._schema_format:
+                print("⚠️ Ollama doesn't support JSON-schema output here; using JSON mode with stop sequences")
+        return self._schema_format
+
+    def _detect_schema_format(self) -> bool:
+        def version(text: str):
+            return tuple(int(n) for n in re.findall(r"\d+", text)[:2])
+        try:
+            from importlib.metadata import version as package_version
+            import requests
+            if version(package_version("ollama")) < (0, 4):
+                return False
+            server = requests.get(f"{self.base_url}/api/version", timeout=3).json().get("version", "0")
+            return version(server) >= (0, 5)
+        except Exception as e:
+            print(f"⚠️ Could not detect Ollama structured output support: {e}")
+            return False
+
+    def _decoding_options(self) -> Dict[str, Any]:
+        if self.structured_output:
+            if self._schema_format_supported():
+                return {"format": self._tool_call_schema()}
+            # Older Ollama only takes "json": the prompt describes the object, stop sequences end runaway replies
+            return {"format": "json", "stop": STOP_SEQUENCES}
+        if self.early_stop:
+            return {"stop": STOP_SEQUENCES}
+        return {}
+
+    def _guarded(self, produce, stream: bool, background: bool, cancel: Optional[Cancellation] = None):
+        """
+        Run an LLM call under the engine's local limiter and breaker (imported on
+        first use). Background calls are admitted behind chat and retry a full queue;
+        `cancel` ends a wait for a slot (StreamCancelled) and closes the stream.
+        """
+        if not self.shared_admission:
+            return produce(None)
+        from core.llm_engine import llm_engine
+        reason = "agent job" if background else "agent"
+        attempts = self.background_retries + 1 if background else 1
+        for attempt in range(attempts):
+            try:
+                return llm_engine.guarded_call("local", self.model, reason, produce, stream, cancel, background)
+            except BackendOverloaded as e:
+                if attempt == attempts - 1 or (cancel or Cancellation()).wait(e.retry_after):
+                    raise
+
+    def _llm_chat(self, messages: List[Dict], background: bool = False) -> Dict:
+        """One chat completion with Ollama's token counts"""
+        def produce(record: Optional[Dict]):
+            response = self.llm.chat(
+                model=self.model,
+                messages=messages,
+                keep_alive=self.keep_alive,
+                options={"temperature": 0.7}
+            )
+            if record is not None:
+                LLMTelemetry.fill_ollama(record, response)
+            return response
+
+        response = self._guarded(produce, False, background)
+        return {
+            "text": response["message"]["content"],
+            # Only tokens not already in the KV cache are evaluated (and counted)
+            "prompt_tokens": response.get("prompt_eval_count") or 0,
+            "completion_tokens": response.get("eval_count") or 0
+        }
+
+    def _llm_stream(self, messages: List[Dict], reply: Dict, stop: Optional[List[str]] = None, format: Optional[Dict] = None, num_predict: Optional[int] = None, background: bool = False, cancel: Optional[Cancellation] = None) -> Generator:
+        """
+        Stream one chat completion token by token; the full text and token counts
+        are left in `reply`. Waits for an admission slot before returning (raises
+        BackendOverloaded / BackendUnavailable, or StreamCancelled if `cancel` is
+        set meanwhile). Closing the generator closes the HTTP stream, which makes
+        Ollama stop generating (token counts are then the chunks received, and
+        the prompt count is unknown). Setting `cancel` ends the generator at once.
+        """
+        options = {"temperature": 0.7}
+        if stop:
+            options["stop"] = stop
+        if num_predict:
+            options["num_predict"] = num_predict
+        kwargs = {"format": format} if format else {}
+        reply["text"] = ""
+        reply["prompt_tokens"] = None
+        reply["completion_tokens"] = 0
+
+        def produce(record: Optional[Dict]) -> Generator:
+            stream = self.llm.chat(
+                model=self.model,
+                messages=messages,
+                stream=True,
+                keep_alive=self.keep_alive,
+                options=options,
+                **kwargs
+            )
+            chunks = []
+            try:
+                for chunk in stream:
+                    if chunk.get("done"):
+                        reply["prompt_tokens"] = chunk.get("prompt_eval_count") or 0
+                        reply["completion_tokens"] = chunk.get("eval_count") or 0
+                        reply["done_reason"] = chunk.get("done_reason")
+                        if record is not None:
+                            LLMTelemetry.fill_ollama(record, chunk)
+                    text = chunk.get("message", {}).get("content", "")
+                    if text:
+                        chunks.append(text)
+                        yield text
+            finally:
+                reply["text"] = "".join(chunks)
+                if "done_reason" not in reply:
+                    reply["completion_tokens"] = len(chunks)
+                close = getattr(stream, "close", None)
+                if close:
+                    close()
+
+        call_cancel = Cancellation()
+        if cancel:
+            cancel.on_cancel(call_cancel.set)
+        stream = self._guarded(produce, True, background, call_cancel)
+        return self._interruptible(stream, call_cancel, cancel)
+
+    @staticmethod
+    def _interruptible(stream, call_cancel: Cancellation, run_cancel: Optional[Cancellation]) -> Generator:
+        """
+        Read an LLM stream on a helper thread, so a cancelled run stops waiting at
+        once, even during prompt evaluation. The request itself is closed (freeing
+        its admission slot) when its next chunk arrives.
+        """
+        events: "queue.Queue" = queue.Queue()
+        finished = threading.Event()
+
+        def pump():
+            try:
+                for chunk in stream:
+                    if call_cancel.is_set():
+                        break
+                    events.put(("chunk", chunk))
+                events.put(("done", None))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                stream.close()
+                finished.set()
+
+        call_cancel.on_cancel(lambda: events.put(("cancelled", None)))
+        threading.Thread(target=pump, name="agent-llm", daemon=True).start()
+        try:
+            while True:
+                kind, payload = events.get()
+                if kind == "chunk":
+                    yield payload
+                elif kind == "error" and not isinstance(payload, StreamCancelled):
+                    raise payload
+                else:
+                    return
+        finally:
+            call_cancel.set()
+            if not (run_cancel and run_cancel.is_set()):
+                finished.wait()  # Stopped by the caller mid-reply: the next chunk ends it, and fills `reply`
+
+    @staticmethod
+    def _call_boundary(text: str) -> Optional[int]:
+        """
+        End of the last complete TOOL/INPUT pair once the reply has clearly moved
+        on to something other than another call (None while it may still be one)
+        """
+        pairs = list(re.finditer(r'TOOL:\s*\w+\s*INPUT:[^\n]*\n', text, re.IGNORECASE))
+        if not pairs:
+            return None
+        rest = text[pairs[-1].end():].lstrip().upper()
+        if not rest or "TOOL:".startswith(rest[:5]) or rest.startswith("TOOL:"):
+            return None
+        return pairs[-1].end()
+
+    def _parse_tool_calls(self, response: str) -> List[Dict[str, str]]:
+        """All TOOL/INPUT pairs in a reply, in order"""
+        return [
+            {"tool": m.group(1).lower(), "input": m.group(2).strip()}
+            for m in re.finditer(r'TOOL:\s*(\w+)\s*INPUT:\s*([^\n]*)', response, re.IGNORECASE)
+        ]
+
+    def _parse_reply(self, response: str):
+        """(tool calls, final answer text) from a structured or TOOL/INPUT reply"""
+        if self.structured_output:
+            try:
+                data = json.loads(response)
+                calls = [
+                    {"tool": str(c.get("tool", "")).lower(), "input": str(c.get("input", "")).strip()}
+                    for c in data.get("tool_calls") or []
+                ]
+                return calls, data.get("answer") or data.get("thought") or response
+            except (json.JSONDecodeError, AttributeError):
+                pass  # Backend ignored the schema; fall back to the text protocol
+        return self._parse_tool_calls(response), response
+
+    def _run_tools(self, calls: List[Dict[str, str]], budget: Optional[RunBudget] = None) -> List[Dict[str, Any]]:
+        """
+        Execute one step's tool calls: parallel-safe tools concurrently on the tool
+        pool, the rest in order. Each call is bounded by its tool's timeout (and by
+        the time left in the run), counted from when it starts running; a timed
+        out call is reported as an error and its thread left to finish on its own.
+        """
+        results = [None] * len(calls)
+        futures = {}
+        for idx, call in enumerate(calls):
+            tool = self.tools.get(call["tool"])
+            if not tool:
+                results[idx] = {**call, "output": f"Error: Tool '{call['tool']}' not found. Available tools: {', '.join(self.tools.keys())}", "duration_ms": 0}
+                continue
+            cached = self._cached_result(call, tool)
+            if cached is not None:
+                results[idx] = {**call, "output": cached, "duration_ms": 0, "cache": "hit"}
+            elif tool.get("parallel", True):
+                futures[idx] = self._submit(tool["func"], call["input"])
+        
+        for idx, call in enumerate(calls):
+            tool = self.tools.get(call["tool"])
+            if tool and results[idx] is None and not tool.get("parallel", True):
+                results[idx] = self._collect(call, self._submit(tool["func"], call["input"]), self._tool_timeout(tool, budget))
+        
+        for idx, job in futures.items():
+            call = calls[idx]
+            results[idx] = self._collect(call, job, self._tool_timeout(self.tools[call["tool"]], budget))
+        
+        # Remember fresh results of cacheable tools
+        for result in results:
+            tool = self.tools.get(result["tool"])
+            if self.tool_cache and tool and "cache_ttl" in tool and "cache" not in result:
+                result["cache"] = "miss"
+                if not result.get("timed_out"):
+                    self.tool_cache.put(result["tool"], result["input"], result["output"], tool["cache_ttl"])
+        return results
+
+    def _tool_timeout(self, tool: Dict[str, Any], budget: Optional[RunBudget]) -> float:
+        timeout = tool.get("timeout", self.tool_timeout)
+        return budget.cap_timeout(timeout) if budget else timeout
+
+    def _cached_result(self, call: Dict[str, str], tool: Dict[str, Any]) -> Optional[str]:
+        if self.tool_cache and "cache_ttl" in tool:
+            return self.tool_cache.get(call["tool"], call["input"])
+        return None
+
+    def _timed_call(self, func, tool_input: str):
+        start = time.time()
+        try:
+            output = str(func(tool_input))
+        except Exception as e:
+            output = f"Error executing tool: {e}"
+        return output, time.time() - start
+
+    def _new_tool_pool(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.tool_workers, thread_name_prefix="agent-tool")
+
+    def _submit(self, func, tool_input: str, job: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a tool call on the current pool; `started` is set (and `start` stamped) when a thread picks it up"""
+        job = job or {"func": func, "input": tool_input, "started": threading.Event(), "start": None}
+
+        def run():
+            job["start"] = time.time()
+            job["started"].set()
+            return self._timed_call(func, tool_input)
+
+        with self._pool_lock:
+            job["pool"] = self.tool_pool
+            job["future"] = self.tool_pool.submit(run)
+        return job
+
+    def _abandon_pool(self):
+        """
+        A timed out call keeps its pool thread until it returns: move new calls to
+        a fresh pool so abandoned calls can't starve later ones
+        """
+        with self._pool_lock:
+            old, self.tool_pool = self.tool_pool, self._new_tool_pool()
+            self.abandoned_tool_calls += 1
+        old.shutdown(wait=False)
+
+    def _collect(self, call: Dict[str, str], job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        Wait for a tool call, counting the timeout from when it started running.
+        A call still queued on a replaced pool moves to the current one; a call
+        still queued after a full timeout is dropped.
+        """
+        queue_deadline = time.time() + timeout
+        try:
+            while not job["started"].wait(0.05):
+                if job["pool"] is not self.tool_pool and job["future"].cancel():
+                    self._submit(job["func"], job["input"], job)
+                elif time.time() > queue_deadline and job["future"].cancel():
+                    raise FutureTimeout()
+            output, seconds = job["future"].result(timeout=max(0.0, timeout - (time.time() - job["start"])))
+            return {**call, "output": output, "duration_ms": round(seconds * 1000, 1)}
+        except FutureTimeout:
+            if job["future"].running():
+                self._abandon_pool()
+            print(f"⏱️ Tool {call['tool']} timed out after {timeout:.3g}s")
+            return {**call, "output": f"Error: tool '{call['tool']}' timed out after {timeout:.3g}s", "duration_ms": round(timeout * 1000, 1), "timed_out": True}
+
+    def _clip_observation(self, text: str, max_tokens: int) -> str:
+        max_chars = max_tokens * 4
+        if len(text) <= max_chars:
+            return text
+        return f"{text[:max_chars]}\n...[truncated {len(text) - max_chars} characters]"
+
+    def _compact_observations(self, messages: List[Dict], observation_indices: List[int]):
+        """
+        Truncate the oldest tool observations (never the latest) until they fit the
+        observation budget. A truncated message stays truncated, so the prefix only
+        changes when the budget is exceeded and the KV cache stays reusable otherwise.
+        """
+        total = sum(_estimate_tokens(messages[i]["content"]) for i in observation_indices)
+        for i in observation_indices[:-1]:
+            if total <= self.observation_budget:
+                break
+            before = _estimate_tokens(messages[i]["content"])
+            messages[i]["content"] = self._clip_observation(messages[i]["content"], 50)
+            total -= before - _estimate_tokens(messages[i]["content"])
+
+    def execute(self, task: str, context: Optional[str] = None, cancel: Optional[Cancellation] = None, budget: Optional[RunBudget] = None, background: bool = False) -> Dict[str, Any]:
+        """
+        Execute a complex task using reasoning and tools.
+        """
+        result = {}
+        for event in self.run(task, context, cancel, budget, background):
+            if event["event"] == "final":
+                result = {k: v for k, v in event.items() if k != "event"}
+        return result
+
+    def run(self, task: str, context: Optional[str] = None, cancel: Optional[Cancellation] = None, budget: Optional[RunBudget] = None, background: bool = False) -> Generator[Dict[str, Any], None, None]:
+        """
+        Execute a task, yielding an event per step as it happens:
+        start, token (LLM output as it streams), thought, tool_call, tool_output
+        and finally "final" with the same payload execute() returns.
+        Setting `cancel` (or calling cancel_run with the run id from the start
+        event) stops the loop, including an in-flight LLM call. When the run
+        budget (time, tokens or iterations) runs out the loop stops the same way
+        and the model writes a best-effort answer from what it has so far.
+        `background` runs (agent jobs) get Ollama slots only after chat requests.
+        """
+        cancel = cancel or Cancellation()
+        budget = budget or RunBudget(max_iterations=self.max_iterations)
+        run_id = uuid.uuid4().hex[:12]
+        self.active_runs[run_id] = cancel
+        trace = self.tracer.start(run_id, task, context, self._trace_config(budget))
+        try:
+            for event in self._run(task, context, cancel, run_id, budget, trace, background):
+                if trace:
+                    trace.observe(event)
+                yield event
+        finally:
+            self.active_runs.pop(run_id, None)
+
+    def _trace_config(self, budget: RunBudget) -> Dict[str, Any]:
+        """Settings that change agent behaviour, stored with each trace"""
+        return {
+            "model": self.model,
+            "early_stop": self.early_stop,
+            "plan_cache": bool(self.plan_cache),
+            "structured_output": self.structured_output,
+            "observation_budget": self.observation_budget,
+            "max_observation_tokens": self.max_observation_tokens,
+            "tools": sorted(self.tools.keys()),
+            "budget": {"max_seconds": budget.max_seconds, "max_tokens": budget.max_tokens, "max_iterations": budget.max_iterations}
+        }
+
+    def cancel_run(self, run_id: str) -> bool:
+        """Cancel a run in progress"""
+        cancel = self.active_runs.get(run_id)
+        if not cancel:
+            return False
+        cancel.set()
+        return True
+
+    def _best_effort_answer(self, messages: List[Dict], steps: List[Dict], reason: str, usage: Dict, cancel: Cancellation, trace: Optional[AgentTrace] = None, background: bool = False) -> Generator[Dict[str, Any], None, str]:
+        """
+        Final tool-free reply after a budget ran out, with its own small token and
+        time allowance. Falls back to the latest tool outputs if the model can't answer.
+        """
+        messages.append({"role": "user", "content": (
+            f"[System] The {reason} budget for this task is used up. Do not call any more tools. "
+            "Give your best final answer now from what you have found so far, and say briefly what is incomplete."
+        )})
+        reply = {}
+        started = time.monotonic()
+        first_token = None
+        deadline = started + self.final_answer_seconds
+        try:
+            tokens = self._llm_stream(messages, reply, num_predict=self.final_answer_tokens, background=background, cancel=cancel)
+            try:
+                for token in tokens:
+                    if cancel.is_set() or time.monotonic() > deadline:
+                        break
+                    first_token = first_token or time.monotonic()
+                    yield {"event": "token", "step": "final", "text": token}
+            finally:
+                tokens.close()
+            if trace:
+                trace.llm_call(messages, reply, started, first_token)
+            usage["llm_calls"] += 1
+            usage["prompt_tokens"] += reply["prompt_tokens"] or 0
+            usage["completion_tokens"] += reply["completion_tokens"]
+            answer = self._parse_reply(reply["text"])[1].strip()
+            if answer:
+                return answer
+        except Exception as e:
+            print(f"⚠️ Best-effort answer failed: {e}")
+        
+        findings = "\n".join(f"- {step['tool']}: {step['tool_output'][:300]}" for step in steps[-3:])
+        return f"I ran out of {reason} before finishing this task." + (f" Here is what I found so far:\n{findings}" if findings else "")
+
+    def _act(self, step_no: int, response: str, calls: List[Dict[str, str]], reply: Dict, steps: List[Dict], usage: Dict, budget: RunBudget) -> Generator[Dict[str, Any], None, str]:
+        """Run one step's tool calls, yielding their events; returns the observation turn"""
+        for call in calls:
+            print(f"🛠️  Using tool: {call['tool']} with input: {call['input'][:50]}...")
+            yield {"event": "tool_call", "step": step_no, "tool": call["tool"], "input": call["input"]}
+        outcomes = self._run_tools(calls, budget)
+        
+        observations = []
+        for outcome in outcomes:
+            # Record step (the LLM token counts are those of the reply that requested the call)
+            step = {
+                "step": step_no,
+                "thought": response,
+                "tool": outcome["tool"],
+                "tool_input": outcome["input"],
+                "tool_output": outcome["output"],
+                "duration_ms": outcome["duration_ms"],
+                "timed_out": outcome.get("timed_out", False),
+                "cache": outcome.get("cache"),
+                "prompt_tokens": reply["prompt_tokens"],
+                "completion_tokens": reply["completion_tokens"]
+            }
+            steps.append(step)
+            yield {"event": "tool_output", **step}
+            if outcome.get("cache"):
+                usage["tool_cache"]["hits" if outcome["cache"] == "hit" else "misses"] += 1
+            observation = self._clip_observation(outcome["output"], self.max_observation_tokens)
+            observations.append(f"[System] Tool '{outcome['tool']}' Output: {observation}")
+        return "\n\n".join(observations) + "\n\nContinue reasoning:"
+
+    def _format_calls(self, calls: List[Dict[str, str]]) -> str:
+        """Tool calls written the way the model is asked to write them"""
+        if self.structured_output:
+            return json.dumps({"thought": "Reusing a plan that worked for this kind of task.", "tool_calls": calls, "answer": ""}, ensure_ascii=False)
+        return "\n".join(f"TOOL: {call['tool']}\nINPUT: {call['input']}" for call in calls) + "\n"
+
+    def _plan_hint(self, plan: Dict[str, Any], steps: List[List[Dict[str, str]]]) -> str:
+        lines = [f"\nPLAN THAT WORKED FOR A SIMILAR TASK (\"{plan['example_task']}\"):"]
+        for n, calls in enumerate(steps, 1):
+            lines += [f"Step {n}: TOOL: {call['tool']} INPUT: {call['input']}" for call in calls]
+        lines.append("If it fits, follow it: request calls that don't depend on each other together in one reply, adapt the inputs to this task, and skip exploring.\n")
+        return "\n".join(lines)
+
+    def _can_prefill(self, calls: List[Dict[str, str]]) -> bool:
+        """A cached first step runs without asking the model only if it has no side effects"""
+        return all(call["tool"] in self.tools and call["tool"] not in NEVER_CACHE for call in calls)
+
+    def _remember_plan(self, task: str, steps: List[Dict], usage: Dict, plan: Optional[Dict]) -> Optional[Dict]:
+        """Cache the tool calls of a successful run (or credit the plan it reused)"""
+        if not self.plan_cache:
+            return None
+        if plan and plan["match"] == "exact":
+            saved = self.plan_cache.record_saving(plan["llm_calls"], usage["llm_calls"])
+            return {"match": "exact", "template": plan["template"], "llm_calls_saved": saved}
+        
+        grouped: Dict[int, List[Dict[str, str]]] = {}
+        for step in steps:
+            # Failed calls were detours, not part of the plan
+            if is_cacheable_output(step["tool_output"]):
+                grouped.setdefault(step["step"], []).append({"tool": step["tool"], "input": step["tool_input"]})
+        # A run guided by a similar plan is credited against that plan's cost
+        baseline = max(usage["llm_calls"], plan["llm_calls"]) if plan else usage["llm_calls"]
+        self.plan_cache.put(task, [grouped[n] for n in sorted(grouped)], baseline)
+        if plan:
+            saved = self.plan_cache.record_saving(plan["llm_calls"], usage["llm_calls"])
+            return {"match": "similar", "template": plan["template"], "similarity": plan["similarity"], "llm_calls_saved": saved}
+        return None
 
-        history = system_prompt
+    def _run(self, task: str, context: Optional[str], cancel: Cancellation, run_id: str, budget: RunBudget, trace: Optional[AgentTrace] = None, background: bool = False) -> Generator[Dict[str, Any], None, None]:
         steps = []
+        usage = {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "discarded_tokens": 0, "per_iteration": [], "tool_cache": {"hits": 0, "misses": 0}}
+        plan_info = None
         
-        for i in range(self.max_iterations):
+        def final(success: bool, output: str, **extra) -> Dict[str, Any]:
+            return {"event": "final", "success": success, "output": output, "steps": steps, "usage": usage, "budget": budget.report(), "plan_cache": plan_info, **extra}
+        
+        if not self.llm:
+            yield final(False, "Agent not initialized (Ollama connection failed). Please check if Ollama is running.")
+            return
+
+        print(f"🤖 Agent received task: {task}")
+        yield {"event": "start", "run_id": run_id, "task": task}
+        
+        # Memory search and plan lookup are independent: run them in parallel,
+        # sharing one embedding of the task
+        request = RequestContext(task)
+        found = RequestContext.parallel(
+            memories=lambda: memory_manager.search_memories(task, embedding=request.embedding()),
+            plan=lambda: self.plan_cache.lookup(task) if self.plan_cache else None
+        )
+        memories = found["memories"]
+        memory_context = ""
+        if memories:
+            memory_context = "\nRELEVANT MEMORIES:\n" + "\n".join([f"- {m}" for m in memories]) + "\n"
+            print(f"🧠 Found relevant memories: {len(memories)}")
+        if trace:
+            trace.data["memories"] = list(memories or [])
+        
+        # A plan from an earlier run of the same kind of task: the first step of an
+        # exact match runs straight away if the plan refills cleanly with this task's
+        # values, the rest (or the whole plan otherwise) is offered to the model
+        plan = found["plan"]
+        prefill = plan["steps"][0] if plan and plan["match"] == "exact" and plan["reusable"] and self._can_prefill(plan["steps"][0]) else None
+        hint_steps = plan["steps"][1:] if prefill else (plan["steps"] if plan else [])
+        
+        # Task-specific content goes in the first user turn, after the stable system prompt
+        task_prompt = f"{memory_context}\nTASK: {task}\n"
+        if context:
+            task_prompt += f"\nCONTEXT: {context}"
+        if hint_steps:
+            task_prompt += self._plan_hint(plan, hint_steps)
+        task_prompt += "\n\nBegin reasoning:"
+
+        messages = [
+            {"role": "system", "content": self._system_prompt()},
+            {"role": "user", "content": task_prompt}
+        ]
+        observation_indices = []
+        sent = 0  # Messages already evaluated by Ollama (for estimating unreported prompt tokens)
+        
+        if prefill and budget.next_iteration():
+            print(f"📋 Reusing cached plan for: {plan['template']}")
+            response = self._format_calls(prefill)
+            no_llm = {"prompt_tokens": 0, "completion_tokens": 0}
+            messages.append({"role": "assistant", "content": response})
+            usage["per_iteration"].append({"step": 1, **no_llm, "stop_reason": "plan_cache", "discarded_tokens": 0})
+            yield {"event": "thought", "step": 1, "text": response, **no_llm, "plan_cache": True}
+            observation = yield from self._act(1, response, prefill, no_llm, steps, usage, budget)
+            if cancel.is_set():
+                yield final(False, "Cancelled by the user.", cancelled=True)
+                return
+            messages.append({"role": "user", "content": observation})
+            observation_indices.append(len(messages) - 1)
+        
+        while budget.next_iteration():
+            i = budget.iterations - 1
             try:
-                # 1. Get LLM response
-                response = self.llm.invoke(history)
+                # 1. Get LLM response (streamed, so a cancel stops generation mid-reply)
+                self._compact_observations(messages, observation_indices)
+                reply = {}
+                started = time.monotonic()
+                first_token = None
+                tokens = self._llm_stream(messages, reply, num_predict=budget.remaining_tokens(), background=background, cancel=cancel, **self._decoding_options())
+                received = ""
+                cut = None
+                try:
+                    for token in tokens:
+                        if cancel.is_set() or budget.check():
+                            break
+                        first_token = first_token or time.monotonic()
+                        received += token
+                        yield {"event": "token", "step": i+1, "text": token}
+                        if self.early_stop and not self.structured_output:
+                            cut = self._call_boundary(received)
+                            if cut is not None:
+                                break
+                finally:
+                    tokens.close()
+                if trace:
+                    trace.llm_call(messages, reply, started, first_token, cut)
+                if cancel.is_set():
+                    print("🛑 Agent run cancelled")
+                    yield final(False, "Cancelled by the user.", cancelled=True)
+                    return
+                
+                prompt_tokens = reply["prompt_tokens"]
+                if prompt_tokens is None:
+                    prompt_tokens = sum(_estimate_tokens(m["content"]) for m in messages[sent:])
+                sent = len(messages)
+                budget.tokens_used += prompt_tokens + reply["completion_tokens"]
+                if budget.check() and cut is None and reply.get("done_reason") in (None, "length"):
+                    break  # Cut off mid-reply; answer from what we have instead
+                
+                response = reply["text"]
+                discarded = 0
+                if cut is not None:
+                    # Decoded past the tool call before we hung up; drop that tail
+                    discarded = _estimate_tokens(response[cut:])
+                    response = response[:cut]
+                usage["llm_calls"] += 1
+                usage["prompt_tokens"] += reply["prompt_tokens"] or 0
+                usage["completion_tokens"] += reply["completion_tokens"]
+                usage["discarded_tokens"] += discarded
+                usage["per_iteration"].append({
+                    "step": i+1,
+                    "prompt_tokens": reply["prompt_tokens"],
+                    "completion_tokens": reply["completion_tokens"],
+                    "stop_reason": "tool_call" if cut is not None else reply.get("done_reason") or "stop",
+                    "discarded_tokens": discarded
+                })
                 print(f"💭 Agent Step {i+1}: {response[:100]}...")
+                messages.append({"role": "assistant", "content": response})
+                yield {"event": "thought", "step": i+1, "text": response, "prompt_tokens": reply["prompt_tokens"], "completion_tokens": reply["completion_tokens"]}
                 
-                # 2. Parse for tool usage
-                tool_match = re.search(r'TOOL:\s*(\w+)', response, re.IGNORECASE)
-                input_match = re.search(r'INPUT:\s*(.+?)(?:\n|$)', response, re.IGNORECASE | re.DOTALL)
+                # 2. Parse for tool usage (one or more independent calls)
+                calls, answer = self._parse_reply(response)
                 
-                if tool_match and input_match:
-                    tool_name = tool_match.group(1).lower()
-                    tool_input = input_match.group(1).strip()
+                if calls and budget.check() == "time":
+                    break  # No time left to run them
+                if calls:
+                    # 3. Execute Tools
+                    observation = yield from self._act(i+1, response, calls, reply, steps, usage, budget)
+                    
+                    if cancel.is_set():
+                        print("🛑 Agent run cancelled")
+                        yield final(False, "Cancelled by the user.", cancelled=True)
+                        return
                     
-                    # 3. Execute Tool
-                    if tool_name in self.tools:
-                        print(f"🛠️  Using tool: {tool_name} with input: {tool_input[:50]}...")
-                        try:
-                            tool_result = self.tools[tool_name]["func"](tool_input)
-                            tool_output = str(tool_result)
-                        except Exception as e:
-                            tool_output = f"Error executing tool: {e}"
-                        
-                        # Record step
-                        steps.append({
-                            "step": i+1,
-                            "thought": response,
-                            "tool": tool_name,
-                            "tool_input": tool_input,
-                            "tool_output": tool_output
-                        })
-                        
-                        # Append result to history for next iteration
-                        history += f"\n{response}\n\n[System] Tool '{tool_name}' Output: {tool_output}\n\nContinue reasoning:"
-                    else:
-                        history += f"\n{response}\n\n[System] Error: Tool '{tool_name}' not found. Available tools: {', '.join(self.tools.keys())}\n\nContinue reasoning:"
+                    # Feed all results back as the next user turn
+                    messages.append({"role": "user", "content": observation})
+                    observation_indices.append(len(messages) - 1)
                 else:
                     # No tool used, this is likely the final answer
-                    return {
-                        "success": True,
-                        "output": response,
-                        "steps": steps
-                    }
+                    plan_info = self._remember_plan(task, steps, usage, plan)
+                    yield final(True, answer)
+                    return
                     
+            except StreamCancelled:
+                # Cancelled while waiting for an Ollama slot
+                print("🛑 Agent run cancelled")
+                yield final(False, "Cancelled by the user.", cancelled=True)
+                return
             except Exception as e:
                 print(f"❌ Agent Loop Error: {e}")
                 traceback.print_exc()
-                return {"success": False, "output": f"An error occurred during execution: {e}", "steps": steps}
+                yield final(False, f"An error occurred during execution: {e}")
+                return
         
+        print(f"⏳ Agent budget exhausted ({budget.exhausted}), writing a best-effort answer")
+        answer = yield from self._best_effort_answer(messages, steps, budget.exhausted, usage, cancel, trace, background)
+        if cancel.is_set():
+            yield final(False, "Cancelled by the user.", cancelled=True)
+            return
+        yield final(True, answer, budget_exhausted=budget.exhausted)
+
+    def cache_stats(self) -> Dict[str, Any]:
         return {
-            "success": True, 
-            "output": "I reached the maximum number of steps without a final answer. Here is what I found so far.", 
-            "steps": steps
+            "tool_cache": self.tool_cache.stats() if self.tool_cache else None,
+            "plan_cache": self.plan_cache.stats() if self.plan_cache else None,
+            "abandoned_tool_calls": self.abandoned_tool_calls
         }
 
     def chat(self, message: str) -> str:
         """Direct chat bypass"""
         if not self.llm: return "Agent not initialized."
-        return self.llm.invoke(message)
+        return self._llm_chat([{"role": "user", "content": message}])["text"]
 
 # Global instance
 autonomous_agent = AutonomousAgent()
@@ -0,0 +1,212 @@
+"""
+Background Agent Jobs
+Queue long agent tasks onto a small worker pool instead of holding an HTTP
+connection open. Progress and the step trace are persisted per job, so jobs
+survive restarts: queued jobs are re-queued, and a job interrupted mid-run is
+re-run from the start only if it had not yet called a tool with side effects
+(otherwise it is marked "interrupted").
+"""
+
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.admission import Cancellation
+from core.agent import autonomous_agent
+from core.tool_cache import NEVER_CACHE
+from core.budget import RunBudget
+
+
+class AgentJobQueue:
+    """Persistent agent job queue with a configurable number of workers"""
+
+    def __init__(self, data_dir: str = "backend/data/agent_jobs", workers: Optional[int] = None):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Each worker runs one agent against Ollama. Its LLM calls are admitted at
+        # background priority: queued chat requests go first, and background calls
+        # hold at most LLM_BACKGROUND_SLOTS of the local slots
+        self.workers = workers or int(os.getenv("AGENT_JOB_WORKERS", "1"))
+        self.jobs = self._load_jobs()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._cancel: Dict[str, Cancellation] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _path(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.json"
+
+    def _load_jobs(self) -> Dict[str, Dict]:
+        jobs = {}
+        for path in self.data_dir.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+                jobs[job["id"]] = job
+            except Exception:
+                continue
+        return jobs
+
+    def _save_job(self, job: Dict):
+        """Write a job atomically (lock held)"""
+        tmp = self._path(job["id"]).with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self._path(job["id"]))
+
+    def start(self):
+        """Start the workers and re-queue jobs interrupted by a restart"""
+        if self._started:
+            return
+        self._started = True
+        pending = sorted(
+            (job for job in self.jobs.values() if job["status"] in ("queued", "running")),
+            key=lambda job: job["created_at"]
+        )
+        requeued = 0
+        for job in pending:
+            with self._lock:
+                if job["status"] == "running" and self._had_side_effects(job):
+                    # Running it again would repeat emails, messages, file writes...
+                    job.update({
+                        "status": "interrupted",
+                        "result": {"success": False, "output": "Interrupted by a server restart after running a tool with side effects; not re-run."},
+                        "finished_at": datetime.now().isoformat()
+                    })
+                    self._save_job(job)
+                    continue
+                job.update({"status": "queued", "steps": [], "tools_called": [], "iteration": 0})
+                self._save_job(job)
+            self._enqueue(job["id"])
+            requeued += 1
+        if requeued:
+            print(f"🗂️ Re-queued {requeued} agent job(s)")
+        if len(pending) > requeued:
+            print(f"⚠️ {len(pending) - requeued} interrupted agent job(s) had side effects and were not re-run")
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"agent-job-{i}", daemon=True).start()
+
+    @staticmethod
+    def _had_side_effects(job: Dict) -> bool:
+        """Whether a job called (or started calling) a tool that must not run twice"""
+        tools = set(job.get("tools_called", [])) | {step["tool"] for step in job["steps"]}
+        return bool(tools & NEVER_CACHE)
+
+    def submit(self, task: str, context: Optional[str] = None, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None) -> Dict:
+        """Queue a task and return its job record (the run budget starts when a worker picks it up)"""
+        job_id = datetime.now().strftime("job_%Y%m%d_%H%M%S_%f")
+        job = {
+            "id": job_id,
+            "task": task,
+            "context": context,
+            "max_seconds": max_seconds,
+            "max_tokens": max_tokens,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "iteration": 0,
+            "steps": [],
+            "tools_called": [],
+            "result": None
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            self._save_job(job)
+        self._enqueue(job_id)
+        return self.get_job(job_id)
+
+    def _enqueue(self, job_id: str):
+        self._cancel[job_id] = Cancellation()
+        self._queue.put(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job, or stop a running one at its next token/step"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        event = self._cancel.get(job_id)
+        if event:
+            event.set()
+        with self._lock:
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                job["finished_at"] = datetime.now().isoformat()
+                self._save_job(job)
+        return True
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            job = self.jobs.get(job_id)
+            cancel = self._cancel.get(job_id)
+            if job and job["status"] == "queued" and not cancel.is_set():
+                try:
+                    self._run(job, cancel)
+                except Exception as e:
+                    print(f"❌ Agent job {job_id} failed: {e}")
+                    with self._lock:
+                        job.update({"status": "failed", "result": {"success": False, "output": str(e)}, "finished_at": datetime.now().isoformat()})
+                        self._save_job(job)
+            self._cancel.pop(job_id, None)
+            self._queue.task_done()
+
+    def _run(self, job: Dict, cancel: Cancellation):
+        with self._lock:
+            job.update({"status": "running", "started_at": datetime.now().isoformat()})
+            self._save_job(job)
+
+        budget = RunBudget(job.get("max_seconds"), job.get("max_tokens"))
+        for event in autonomous_agent.run(job["task"], job["context"], cancel, budget, background=True):
+            kind = event["event"]
+            if kind == "token":
+                continue
+            with self._lock:
+                if kind == "thought":
+                    job["iteration"] = event["step"]
+                elif kind == "tool_call":
+                    # Saved before the tool runs, so a restart mid-call still sees it
+                    job.setdefault("tools_called", []).append(event["tool"])
+                elif kind == "tool_output":
+                    job["steps"].append({k: v for k, v in event.items() if k != "event"})
+                elif kind == "final":
+                    result = {k: v for k, v in event.items() if k not in ("event", "steps")}
+                    job["result"] = result
+                    job["status"] = "cancelled" if result.get("cancelled") else ("completed" if result["success"] else "failed")
+                    job["finished_at"] = datetime.now().isoformat()
+                else:
+                    continue
+                self._save_job(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Job status, progress and step trace"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return None
+        with self._lock:
+            snapshot = dict(job, steps=list(job["steps"]))
+        snapshot["max_iterations"] = autonomous_agent.max_iterations
+        if job["status"] == "queued":
+            snapshot["queue_position"] = self._queue_position(job_id)
+        return snapshot
+
+    def _queue_position(self, job_id: str) -> int:
+        with self._queue.mutex:
+            waiting = [j for j in self._queue.queue if self.jobs.get(j, {}).get("status") == "queued"]
+        return waiting.index(job_id) + 1 if job_id in waiting else 0
+
+    def list_jobs(self) -> List[Dict]:
+        jobs = [
+            {k: job[k] for k in ("id", "task", "status", "created_at", "finished_at", "iteration")}
+            for job in self.jobs.values()
+        ]
+        jobs.sort(key=lambda x: x["created_at"], reverse=True)
+        return jobs
+
+
+# Global instance
+agent_jobs = AgentJobQueue()
@@ -0,0 +1,201 @@
+"""
+Agent Trace Recording and Replay
+Records full agent runs (messages sent, LLM outputs, tool inputs/outputs,
+timings) as JSON, and provides the stand-ins used to replay a trace corpus:
+recorded tool outputs, recorded memories and an LLM that repeats the
+recorded replies. See benchmark_agent_replay.py.
+"""
+
+import json
+import os
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Generator, List, Optional
+
+from core.tool_cache import normalize_input
+
+
+class AgentTrace:
+    """One run being recorded"""
+
+    def __init__(self, path: Path, run_id: str, task: str, context: Optional[str], config: Dict):
+        self.path = path
+        self.started = time.monotonic()
+        self._sent = 0
+        self.data = {
+            "run_id": run_id,
+            "task": task,
+            "context": context,
+            "created_at": datetime.now().isoformat(),
+            "config": config,
+            "memories": [],
+            "llm_calls": [],
+            "tool_calls": [],
+            "result": None
+        }
+
+    def _offset_ms(self, at: float) -> float:
+        return round((at - self.started) * 1000, 1)
+
+    def llm_call(self, messages: List[Dict], reply: Dict, started: float, first_token: Optional[float], cut: Optional[int] = None):
+        """
+        Record one LLM call. Only the messages added since the previous call are
+        stored; together with the recorded outputs they rebuild the conversation.
+        `cut` is where the agent ended the reply after a complete tool call.
+        """
+        ended = time.monotonic()
+        text = reply.get("text", "")
+        self.data["llm_calls"].append({
+            "new_messages": [dict(m) for m in messages[self._sent:]],
+            "output": text[:cut] if cut is not None else text,
+            "raw_output": text,
+            "prompt_tokens": reply.get("prompt_tokens"),
+            "completion_tokens": reply.get("completion_tokens"),
+            "done_reason": reply.get("done_reason"),
+            "start_ms": self._offset_ms(started),
+            "ttft_ms": round((first_token - started) * 1000, 1) if first_token else None,
+            "duration_ms": round((ended - started) * 1000, 1)
+        })
+        self._sent = len(messages)
+
+    def observe(self, event: Dict):
+        """Pick tool calls and the final result out of the run's event stream"""
+        if event["event"] == "tool_output":
+            self.data["tool_calls"].append({
+                "step": event["step"],
+                "tool": event["tool"],
+                "input": event["tool_input"],
+                "output": event["tool_output"],
+                "duration_ms": event["duration_ms"],
+                "timed_out": event["timed_out"],
+                "cache": event["cache"]
+            })
+        elif event["event"] == "final":
+            self.data["result"] = {k: v for k, v in event.items() if k not in ("event", "steps")}
+            self.data["duration_ms"] = self._offset_ms(time.monotonic())
+            self.save()
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False, default=str)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save agent trace: {e}")
+
+
+class TraceRecorder:
+    """Creates a trace per run when AGENT_TRACE is on"""
+
+    def __init__(self, trace_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        self.trace_dir = Path(trace_dir or os.getenv("AGENT_TRACE_DIR", "backend/data/agent_traces"))
+        self.enabled = enabled if enabled is not None else os.getenv("AGENT_TRACE", "false").lower() == "true"
+
+    def start(self, run_id: str, task: str, context: Optional[str], config: Dict) -> Optional[AgentTrace]:
+        if not self.enabled:
+            return None
+        name = datetime.now().strftime("%Y%m%d_%H%M%S_") + run_id
+        return AgentTrace(self.trace_dir / f"{name}.json", run_id, task, context, config)
+
+
+# ==================== Replay ====================
+
+def load_traces(path: str) -> List[Dict]:
+    """Traces from a directory (or a single trace file), oldest first"""
+    source = Path(path)
+    files = sorted(source.glob("*.json")) if source.is_dir() else [source]
+    traces = []
+    for file in files:
+        try:
+            with open(file, 'r', encoding='utf-8') as f:
+                trace = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Skipping {file}: {e}")
+            continue
+        trace["file"] = str(file)
+        traces.append(trace)
+    return traces
+
+
+class ReplayTools:
+    """
+    Recorded tool outputs by (tool, normalized input). Repeated calls get the
+    recorded outputs in order; a call the trace never made is reported as an error.
+    """
+
+    def __init__(self, trace: Dict, latency: bool = True):
+        self.latency = latency
+        self.outputs = defaultdict(deque)
+        for call in trace.get("tool_calls", []):
+            self.outputs[(call["tool"], normalize_input(call["tool"], call["input"]))].append(call)
+        self.misses = 0
+
+    def func(self, tool: str):
+        def replay(tool_input: str) -> str:
+            recorded = self.outputs.get((tool, normalize_input(tool, tool_input)))
+            if not recorded:
+                self.misses += 1
+                return f"Error: no recorded output for {tool}({tool_input!r})"
+            call = recorded.popleft() if len(recorded) > 1 else recorded[0]
+            if self.latency:
+                time.sleep(call["duration_ms"] / 1000)
+            return call["output"]
+        return replay
+
+
+class ReplayMemory:
+    """Memory search answered from the trace"""
+
+    def __init__(self, trace: Dict):
+        self.memories = trace.get("memories", [])
+
+    def search_memories(self, query: str, *args, **kwargs) -> List[str]:
+        return list(self.memories)
+
+    def store_long_term_memory(self, text: str) -> str:
+        return "Memory stored (replay)."
+
+
+class RecordedLLM:
+    """
+    Ollama client stand-in that repeats a trace's LLM outputs in order with the
+    recorded token counts (and, optionally, recorded timings), regardless of
+    the prompt. Replaying with it is fully deterministic.
+    """
+
+    def __init__(self, trace: Dict, latency: bool = False):
+        self.calls = deque(trace.get("llm_calls", []))
+        self.latency = latency
+
+    def chat(self, model: str, messages: List[Dict], stream: bool = False, options: Optional[Dict] = None, **kwargs):
+        call = self.calls.popleft() if self.calls else {"raw_output": "", "prompt_tokens": 0, "completion_tokens": 0}
+        text = call.get("raw_output") or call.get("output", "")
+        final = {
+            "model": model,
+            "done": True,
+            "done_reason": call.get("done_reason") or "stop",
+            "prompt_eval_count": call.get("prompt_tokens") or 0,
+            "eval_count": call.get("completion_tokens") or 0
+        }
+        if not stream:
+            return {**final, "message": {"role": "assistant", "content": text}}
+        return self._stream(call, text, final)
+
+    def _stream(self, call: Dict, text: str, final: Dict) -> Generator[Dict, None, None]:
+        # As many chunks as the recorded completion had tokens, so an early stop
+        # lands on the same chunk count as in the recording
+        count = max(1, min(len(text), call.get("completion_tokens") or len(text.split())))
+        bounds = [round(i * len(text) / count) for i in range(count + 1)]
+        per_chunk = 0.0
+        if self.latency:
+            time.sleep((call.get("ttft_ms") or 0) / 1000)
+            per_chunk = max(0.0, (call.get("duration_ms") or 0) - (call.get("ttft_ms") or 0)) / 1000 / count
+        for start, end in zip(bounds, bounds[1:]):
+            if per_chunk:
+                time.sleep(per_chunk)
+            yield {"message": {"role": "assistant", "content": text[start:end]}, "done": False}
+        yield {**final, "message": {"role": "assistant", "content": ""}}
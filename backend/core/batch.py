@@ -0,0 +1,245 @@
+"""
+Batch Generation Jobs
+Runs a list of prompts in one mode (e.g. quizzes for a whole syllabus) with
+bounded concurrency. Results are appended to disk as they finish, so a job
+resumes where it stopped after a crash or restart.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.admission import BackendOverloaded
+from core.circuit_breaker import BackendUnavailable
+from core.llm_engine import llm_engine, LOCAL_FAILURE_MESSAGE
+from core.prompt_builder import prompt_builder
+from core.tools.web_search import get_current_time
+
+
+class BatchJobManager:
+    """Persistent, resumable batch generation jobs"""
+
+    def __init__(
+        self,
+        data_dir: str = "backend/data/batches",
+        concurrency: Optional[int] = None,
+        max_retries: int = 5
+    ):
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Total in-flight prompts per job; prompts are admitted at background
+        # priority, so they wait behind queued /chat requests and never hold
+        # every slot of a backend with more than one (LLM_BACKGROUND_SLOTS)
+        self.concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", "4"))
+        self.max_retries = max_retries
+        self.jobs = self._load_jobs()
+        self._cancel: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    # ==================== Persistence ====================
+
+    def _meta_path(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.json"
+
+    def _results_path(self, job_id: str) -> Path:
+        return self.data_dir / f"{job_id}.results.jsonl"
+
+    def _load_jobs(self) -> Dict[str, Dict]:
+        """Load job metadata; progress counters are rebuilt from the results files"""
+        jobs = {}
+        for path in self.data_dir.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except Exception:
+                continue
+            results = self._read_results(job["id"])
+            job["completed"] = sum(1 for r in results.values() if "response" in r)
+            job["failed"] = sum(1 for r in results.values() if "error" in r)
+            # Metadata is only rewritten on status changes; results carry the running total
+            job["active_seconds"] = max([job.get("active_seconds", 0.0)] + [r.get("active_seconds", 0.0) for r in results.values()])
+            jobs[job["id"]] = job
+        return jobs
+
+    def _save_job(self, job: Dict):
+        """Write metadata atomically so a crash never leaves a half-written file"""
+        tmp = self._meta_path(job["id"]).with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self._meta_path(job["id"]))
+
+    def _append_result(self, job_id: str, result: Dict):
+        with open(self._results_path(job_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def _read_results(self, job_id: str) -> Dict[int, Dict]:
+        """Results by prompt index (a torn last line from a crash is skipped)"""
+        results = {}
+        path = self._results_path(job_id)
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    results[result["index"]] = result
+        return results
+
+    # ==================== Jobs ====================
+
+    def create_job(self, prompts: List[str], mode: str = "normal", use_cache: bool = True) -> Dict:
+        """Create and start a batch job"""
+        job_id = datetime.now().strftime("batch_%Y%m%d_%H%M%S_%f")
+        job = {
+            "id": job_id,
+            "mode": mode,
+            "use_cache": use_cache,
+            "prompts": prompts,
+            "status": "queued",
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+            "completed": 0,
+            "failed": 0,
+            "active_seconds": 0.0
+        }
+        with self._lock:
+            self.jobs[job_id] = job
+            self._save_job(job)
+        self._start(job)
+        return self.get_status(job_id)
+
+    def resume_jobs(self):
+        """Restart jobs that were queued or running when the server stopped"""
+        for job in list(self.jobs.values()):
+            if job["status"] in ("queued", "running"):
+                print(f"📦 Resuming batch job {job['id']} ({job['completed'] + job['failed']}/{len(job['prompts'])} done)")
+                self._start(job)
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Stop scheduling new prompts; prompts already running finish and are kept"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return False
+        event = self._cancel.get(job_id)
+        if event:
+            event.set()
+        with self._lock:
+            if job["status"] in ("queued", "running"):
+                job["status"] = "cancelled"
+                self._save_job(job)
+        return True
+
+    def _start(self, job: Dict):
+        self._cancel[job["id"]] = threading.Event()
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job: Dict):
+        job_id = job["id"]
+        cancel = self._cancel[job_id]
+        done = self._read_results(job_id)
+        # Failed prompts are retried on resume; a later line for the same index supersedes the error
+        pending = [i for i in range(len(job["prompts"])) if "response" not in done.get(i, {})]
+
+        with self._lock:
+            if cancel.is_set():
+                return
+            job["failed"] -= sum(1 for i in pending if i in done)
+            job["status"] = "running"
+            self._save_job(job)
+        run_start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(self._generate_one, job, i, cancel) for i in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
+                    continue  # Skipped after cancellation
+                with self._lock:
+                    job["completed" if "response" in result else "failed"] += 1
+                    job["active_seconds"] += time.monotonic() - run_start
+                    run_start = time.monotonic()
+                    result["active_seconds"] = round(job["active_seconds"], 3)
+                    # Append only: the metadata (with the full prompt list) is not rewritten per result
+                    self._append_result(job_id, result)
+
+        with self._lock:
+            job["active_seconds"] += time.monotonic() - run_start
+            if job["status"] == "running":
+                job["status"] = "completed"
+                job["finished_at"] = datetime.now().isoformat()
+            self._save_job(job)
+        print(f"📦 Batch job {job_id} {job['status']}: {self.get_status(job_id)['prompts_per_min']} prompts/min")
+
+    def _generate_one(self, job: Dict, index: int, cancel: threading.Event) -> Optional[Dict]:
+        """Generate one prompt, waiting out admission rejections and open circuits"""
+        if cancel.is_set():
+            return None
+        message = job["prompts"][index]
+        mode = job["mode"]
+        if mode == "normal":
+            prompt = prompt_builder.build(mode, [], current_time=get_current_time())
+        else:
+            prompt = prompt_builder.build(mode, [])
+
+        start = time.time()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = llm_engine.generate_response(
+                    message,
+                    system_prompt=prompt["system_prompt"],
+                    history=prompt["history"],
+                    context=prompt["context"],
+                    use_cache=job["use_cache"],
+                    background=True
+                )
+                if response == LOCAL_FAILURE_MESSAGE:
+                    # The engine's apology is not an answer: record it so a resume retries the prompt
+                    return {"index": index, "prompt": message, "error": "local generation failed"}
+                return {"index": index, "prompt": message, "response": response, "seconds": round(time.time() - start, 2)}
+            except (BackendOverloaded, BackendUnavailable) as e:
+                if attempt == self.max_retries or cancel.wait(e.retry_after):
+                    return {"index": index, "prompt": message, "error": str(e)}
+            except Exception as e:
+                return {"index": index, "prompt": message, "error": str(e)}
+
+    # ==================== Queries ====================
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        """Progress and throughput (prompts/min over the time the job was actually running)"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return None
+        processed = job["completed"] + job["failed"]
+        minutes = job["active_seconds"] / 60
+        return {
+            "id": job["id"],
+            "mode": job["mode"],
+            "status": job["status"],
+            "total": len(job["prompts"]),
+            "completed": job["completed"],
+            "failed": job["failed"],
+            "progress": round(processed / len(job["prompts"]), 3) if job["prompts"] else 1.0,
+            "prompts_per_min": round(processed / minutes, 1) if minutes > 0 else 0.0,
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"]
+        }
+
+    def get_results(self, job_id: str) -> List[Dict]:
+        """Finished results ordered by prompt index"""
+        return [r for _, r in sorted(self._read_results(job_id).items())]
+
+    def list_jobs(self) -> List[Dict]:
+        jobs = [self.get_status(job_id) for job_id in self.jobs]
+        jobs.sort(key=lambda x: x["created_at"], reverse=True)
+        return jobs
+
+
+# Global instance
+batch_manager = BatchJobManager()
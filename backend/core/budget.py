@@ -0,0 +1,85 @@
+"""
+Agent Run Budgets
+Wall-clock and token limits for one agent run. The agent checks the budget
+between tokens and steps, caps each LLM call and tool timeout by what is
+left, and reports consumption in the run result.
+"""
+
+import os
+import time
+from typing import Dict, Optional
+
+
+def parse_tool_timeouts(spec: str) -> Dict[str, float]:
+    """'scrape_webpage=20,execute_code=10' -> {tool: seconds}"""
+    timeouts = {}
+    for item in spec.split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            try:
+                timeouts[name.strip()] = float(seconds)
+            except ValueError:
+                print(f"⚠️ Ignoring invalid tool timeout: {item.strip()}")
+    return timeouts
+
+
+class RunBudget:
+    """Limits for one run; 0 means unlimited"""
+
+    def __init__(self, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None, max_iterations: Optional[int] = None):
+        self.max_seconds = max_seconds if max_seconds is not None else float(os.getenv("AGENT_MAX_SECONDS", "300"))
+        self.max_tokens = max_tokens if max_tokens is not None else int(os.getenv("AGENT_MAX_TOKENS", "0"))
+        self.max_iterations = max_iterations if max_iterations is not None else int(os.getenv("MAX_ITERATIONS", "10"))
+        self.started = time.monotonic()
+        self.tokens_used = 0
+        self.iterations = 0
+        self.exhausted: Optional[str] = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self) -> Optional[float]:
+        if not self.max_seconds:
+            return None
+        return max(0.0, self.max_seconds - self.elapsed())
+
+    def remaining_tokens(self) -> Optional[int]:
+        if not self.max_tokens:
+            return None
+        return max(0, self.max_tokens - self.tokens_used)
+
+    def cap_timeout(self, timeout: float) -> float:
+        """A tool may not outlive the run"""
+        remaining = self.remaining_seconds()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def check(self) -> Optional[str]:
+        """Name of the exhausted limit ("time" or "tokens"; sticky once set), else None"""
+        if self.exhausted:
+            return self.exhausted
+        if self.max_seconds and self.elapsed() >= self.max_seconds:
+            self.exhausted = "time"
+        elif self.max_tokens and self.tokens_used >= self.max_tokens:
+            self.exhausted = "tokens"
+        return self.exhausted
+
+    def next_iteration(self) -> bool:
+        """Start another agent step if every limit allows it"""
+        if self.check():
+            return False
+        if self.iterations >= self.max_iterations:
+            self.exhausted = "iterations"
+            return False
+        self.iterations += 1
+        return True
+
+    def report(self) -> Dict:
+        return {
+            "max_seconds": self.max_seconds,
+            "elapsed_s": round(self.elapsed(), 2),
+            "max_tokens": self.max_tokens,
+            "tokens_used": self.tokens_used,
+            "max_iterations": self.max_iterations,
+            "iterations": self.iterations,
+            "exhausted": self.exhausted
+        }
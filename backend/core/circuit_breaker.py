@@ -0,0 +1,145 @@
+"""
+Circuit Breakers for LLM Backends
+Closed -> open when the recent error/slow-call rate is too high, open -> half-open
+after a cool-down, half-open -> closed once probe calls succeed.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+
+class BackendUnavailable(Exception):
+    """Raised when a backend's circuit is open and the call is failed fast"""
+
+    def __init__(self, backend: str, retry_after: float):
+        self.backend = backend
+        self.retry_after = max(1.0, retry_after)
+        super().__init__(f"{backend} backend unavailable (circuit open), retry after {self.retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Per-backend breaker driven by error rate and latency over a sliding window"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        slow_call_seconds: float = 45.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)  # True = failed or too slow
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def _retry_after(self) -> float:
+        return self.open_seconds - (time.monotonic() - self._opened_at)
+
+    def _open(self):
+        """Trip the breaker (lock held)"""
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self.times_opened += 1
+        print(f"🔌 Circuit OPEN for {self.name} backend")
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through (without taking a probe slot)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return self._retry_after() <= 0
+            if self.state == self.HALF_OPEN:
+                return self._probes_in_flight < self.half_open_probes
+            return True
+
+    def before_call(self):
+        """Admit a call or raise BackendUnavailable"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._retry_after() > 0:
+                    self.rejected += 1
+                    raise BackendUnavailable(self.name, self._retry_after())
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    raise BackendUnavailable(self.name, self.open_seconds)
+                self._probes_in_flight += 1
+
+    def record_success(self, latency: float):
+        with self._lock:
+            slow = latency > self.slow_call_seconds
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._open()
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    print(f"🔌 Circuit CLOSED for {self.name} backend")
+                return
+            self._outcomes.append(slow)
+            self._evaluate()
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.last_error = str(error)
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(True)
+            self._evaluate()
+
+    def release_probe(self):
+        """A half-open probe ended without a verdict (e.g. the caller cancelled it)"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def trip(self):
+        """Open the breaker immediately (e.g. the backend is unreachable at startup)"""
+        with self._lock:
+            if self.state != self.OPEN:
+                self._open()
+
+    def _evaluate(self):
+        """Open the breaker if the failure rate over the window is too high (lock held)"""
+        if self.state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "failure_rate": round(sum(self._outcomes) / calls, 3) if calls else 0.0,
+                "window_calls": calls,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "retry_after_s": round(max(0.0, self._retry_after()), 1) if self.state == self.OPEN else 0.0,
+                "last_error": self.last_error
+            }
@@ -0,0 +1,387 @@
+"""
+Offline Stand-in Backends
+Deterministic fakes for Ollama (in-process client and HTTP server), Gemini and
+DuckDuckGo/scraping, with configurable TTFT, token rate and scripted responses.
+Enable with JARVIS_FAKE_BACKENDS=true to benchmark or regression-test the full
+pipeline on an air-gapped box.
+
+Run the fake Ollama HTTP API standalone:
+    python -m core.fakes --port 11435
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Generator, List, Optional
+
+
+def fake_backends_enabled() -> bool:
+    return os.getenv("JARVIS_FAKE_BACKENDS", "false").lower() == "true"
+
+
+# Agent-friendly defaults; checked in order, first match wins
+DEFAULT_RULES = [
+    {"match": r"Tool '(\w+)' Output: ([^\n]{0,200})", "response": "Based on the \\1 tool, the answer is: \\2"},
+    # Tool calls run on past INPUT the way small local models do, inventing the output
+    {"match": r"TASK: .*?(\d+(?:\.\d+)?\s*[-+*/%]\s*\d+(?:\.\d+)?)", "response": "I should calculate this.\nTOOL: calculator\nINPUT: \\1\nWaiting for the calculator to return the result of the expression.\n[System] Tool 'calculator' Output: \\1\nSo the final answer is \\1."},
+    {"match": r"TASK: (?:search|find|look up) ([^\n]+)", "response": "I need fresh information.\nTOOL: web_search\nINPUT: \\1\nLet me wait for the search results to come back before answering.\n[System] Tool 'web_search' Output: nothing yet\nI could not find anything."},
+]
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word-ish tokens, keeping whitespace attached"""
+    return re.findall(r"\S+\s*|\s+", text) or [""]
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ScriptedResponder:
+    """
+    Picks a scripted response for a prompt and simulates generation timing.
+    Rules are {"match": regex, "response": template} with \\1-style group references.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[Dict]] = None,
+        default: str = "[offline] Scripted response to: {prompt}",
+        ttft: float = 0.2,
+        tokens_per_sec: float = 20.0,
+        prompt_tokens_per_sec: float = 200.0
+    ):
+        self.rules = [(re.compile(r["match"], re.IGNORECASE | re.DOTALL), r["response"]) for r in (rules or DEFAULT_RULES)]
+        self.default = default
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.prompt_tokens_per_sec = prompt_tokens_per_sec
+        self._prefixes: Dict[str, str] = {}  # model -> last prompt (simulated KV cache)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ScriptedResponder":
+        rules = None
+        script_path = os.getenv("FAKE_SCRIPT_PATH")
+        if script_path:
+            with open(script_path, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+        return cls(
+            rules=rules,
+            ttft=float(os.getenv("FAKE_TTFT_MS", "200")) / 1000,
+            tokens_per_sec=float(os.getenv("FAKE_TOKENS_PER_SEC", "20")),
+            prompt_tokens_per_sec=float(os.getenv("FAKE_PROMPT_TOKENS_PER_SEC", "200"))
+        )
+
+    def respond(self, prompt: str) -> str:
+        for pattern, template in self.rules:
+            match = pattern.search(prompt)
+            if match:
+                return match.expand(template)
+        return self.default.format(prompt=prompt.strip()[-80:])
+
+    def prompt_eval(self, model: str, full_prompt: str) -> int:
+        """Prompt tokens that need evaluating, crediting the prefix shared with the last call"""
+        with self._lock:
+            previous = self._prefixes.get(model, "")
+            self._prefixes[model] = full_prompt
+        shared = len(os.path.commonprefix([previous, full_prompt]))
+        return _approx_tokens(full_prompt[shared:])
+
+    def generate(self, model: str, full_prompt: str, last_turn: str, max_tokens: Optional[int] = None, stop: Optional[List[str]] = None) -> Generator:
+        """
+        Yield response tokens with simulated timing; the generator's return value
+        is a dict of Ollama-style timing stats.
+        """
+        start = time.time()
+        prompt_tokens = self.prompt_eval(model, full_prompt)
+        prompt_eval_s = prompt_tokens / self.prompt_tokens_per_sec if self.prompt_tokens_per_sec else 0.0
+        time.sleep(self.ttft + prompt_eval_s)
+
+        text = self.respond(last_turn)
+        for sequence in stop or []:
+            text = text.split(sequence, 1)[0]
+        tokens = _tokens(text)
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+        decode_start = time.time()
+        for i, token in enumerate(tokens):
+            if i and self.tokens_per_sec:
+                time.sleep(1 / self.tokens_per_sec)
+            yield token
+        eval_s = time.time() - decode_start
+
+        return {
+            "total_duration": int((time.time() - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval_s * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_s * 1e9)
+        }
+
+
+def _run_collecting(gen: Generator):
+    """Exhaust a responder generator, returning (tokens, stats)"""
+    tokens = []
+    while True:
+        try:
+            tokens.append(next(gen))
+        except StopIteration as stop:
+            return tokens, stop.value
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ==================== Ollama ====================
+
+class FakeOllamaClient:
+    """In-process stand-in for ollama.Client (chat, generate, list, ps)"""
+
+    def __init__(self, responder: Optional[ScriptedResponder] = None, models: Optional[List[str]] = None):
+        self.responder = responder or ScriptedResponder.from_env()
+        self.models = models or [os.getenv("OLLAMA_MODEL", "qwen2.5-coder:3b")]
+        self.loaded = set()
+
+    def _stream(self, model: str, full_prompt: str, last_turn: str, options: Optional[Dict], kind: str) -> Generator:
+        options = options or {}
+        gen = self.responder.generate(model, full_prompt, last_turn, options.get("num_predict"), options.get("stop"))
+        while True:
+            try:
+                token = next(gen)
+            except StopIteration as stop:
+                final = {"model": model, "created_at": _now(), "done": True, "done_reason": "stop", **stop.value}
+                final.update({"message": {"role": "assistant", "content": ""}} if kind == "chat" else {"response": ""})
+                yield final
+                return
+            chunk = {"model": model, "created_at": _now(), "done": False}
+            chunk.update({"message": {"role": "assistant", "content": token}} if kind == "chat" else {"response": token})
+            yield chunk
+
+    def _complete(self, model: str, full_prompt: str, last_turn: str, options: Optional[Dict], kind: str) -> Dict:
+        options = options or {}
+        tokens, stats = _run_collecting(self.responder.generate(model, full_prompt, last_turn, options.get("num_predict"), options.get("stop")))
+        text = "".join(tokens)
+        response = {"model": model, "created_at": _now(), "done": True, "done_reason": "stop", **stats}
+        response.update({"message": {"role": "assistant", "content": text}} if kind == "chat" else {"response": text})
+        return response
+
+    def chat(self, model: str, messages: List[Dict], stream: bool = False, options: Optional[Dict] = None, keep_alive=None, **kwargs):
+        self.loaded.add(model)
+        full_prompt = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        last_turn = messages[-1]["content"] if messages else ""
+        if stream:
+            return self._stream(model, full_prompt, last_turn, options, "chat")
+        return self._complete(model, full_prompt, last_turn, options, "chat")
+
+    def generate(self, model: str, prompt: str = "", stream: bool = False, options: Optional[Dict] = None, keep_alive=None, **kwargs):
+        self.loaded.add(model)
+        if not prompt:
+            # Load-only request
+            return {"model": model, "created_at": _now(), "response": "", "done": True, "load_duration": 0}
+        if stream:
+            return self._stream(model, prompt, prompt, options, "generate")
+        return self._complete(model, prompt, prompt, options, "generate")
+
+    def list(self) -> Dict:
+        return {"models": [{"name": m, "model": m} for m in self.models]}
+
+    def ps(self) -> Dict:
+        return {"models": [{"name": m, "model": m} for m in sorted(self.loaded)]}
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    """Minimal Ollama HTTP API: /api/chat, /api/generate, /api/tags, /api/ps"""
+
+    client: FakeOllamaClient = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/tags":
+            self._send_json(self.client.list())
+        elif self.path == "/api/ps":
+            self._send_json(self.client.ps())
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        stream = request.get("stream", True)
+        if self.path == "/api/chat":
+            result = self.client.chat(request["model"], request.get("messages", []), stream=stream, options=request.get("options"))
+        elif self.path == "/api/generate":
+            result = self.client.generate(request["model"], request.get("prompt", ""), stream=stream, options=request.get("options"))
+        else:
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        if not stream or isinstance(result, dict):
+            self._send_json(result)
+            return
+        # Close-delimited NDJSON stream
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        for chunk in result:
+            self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class FakeOllamaServer:
+    """Fake Ollama HTTP API on a background thread; point OLLAMA_BASE_URL at .url"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11435, client: Optional[FakeOllamaClient] = None):
+        handler = type("Handler", (_OllamaHandler,), {"client": client or FakeOllamaClient()})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ==================== Gemini ====================
+
+class _Text:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, completion_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = completion_tokens
+        self.total_token_count = prompt_tokens + completion_tokens
+
+
+class FakeGeminiResponse(_Text):
+    def __init__(self, text: str, stats: Dict):
+        super().__init__(text)
+        self.usage_metadata = _Usage(stats["prompt_eval_count"], stats["eval_count"])
+
+
+class FakeGeminiChat:
+    def __init__(self, model: "FakeGeminiModel", history: Optional[List[Dict]] = None):
+        self.model = model
+        self.history = list(history or [])
+
+    def _prompt(self, content) -> str:
+        turns = [" ".join(map(str, h.get("parts", []))) for h in self.history]
+        return "\n".join(turns + [str(content)])
+
+    def send_message(self, content, stream: bool = False, generation_config=None, **kwargs):
+        self.history.append({"role": "user", "parts": [str(content)]})
+        gen = self.model.responder.generate(self.model.model_name, self._prompt(content), str(content))
+        if stream:
+            return self._stream(gen)
+        tokens, stats = _run_collecting(gen)
+        text = "".join(tokens)
+        self.history.append({"role": "model", "parts": [text]})
+        return FakeGeminiResponse(text, stats)
+
+    def _stream(self, gen: Generator):
+        tokens = []
+        for token in gen:
+            tokens.append(token)
+            yield _Text(token)
+        self.history.append({"role": "model", "parts": ["".join(tokens)]})
+
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel (start_chat, generate_content)"""
+
+    def __init__(self, model_name: str = "gemini-fake", responder: Optional[ScriptedResponder] = None, system_instruction: Optional[str] = None, **kwargs):
+        self.model_name = model_name
+        self.responder = responder or ScriptedResponder.from_env()
+        self.system_instruction = system_instruction
+
+    def start_chat(self, history: Optional[List[Dict]] = None) -> FakeGeminiChat:
+        return FakeGeminiChat(self, history)
+
+    def generate_content(self, contents, stream: bool = False, generation_config=None, **kwargs):
+        return FakeGeminiChat(self).send_message(contents, stream=stream)
+
+
+# ==================== Web ====================
+
+class FakeDDGS:
+    """Stand-in for duckduckgo_search.DDGS (text, news) with fixed latency"""
+
+    def __init__(self, latency: Optional[float] = None):
+        self.latency = latency if latency is not None else float(os.getenv("FAKE_SEARCH_LATENCY_MS", "300")) / 1000
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _slug(self, query: str) -> str:
+        return re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "query"
+
+    def text(self, query: str, max_results: int = 5, **kwargs) -> List[Dict]:
+        time.sleep(self.latency)
+        slug = self._slug(query)
+        return [
+            {"title": f"{query} - result {i}", "body": f"Offline snippet {i} about {query}.", "href": f"https://example.com/{slug}/{i}"}
+            for i in range(1, max_results + 1)
+        ]
+
+    def news(self, query: str, max_results: int = 5, **kwargs) -> List[Dict]:
+        time.sleep(self.latency)
+        slug = self._slug(query)
+        return [
+            {"title": f"{query} - headline {i}", "body": f"Offline news {i} about {query}.", "url": f"https://news.example.com/{slug}/{i}", "date": "2025-01-06"}
+            for i in range(1, max_results + 1)
+        ]
+
+
+def fake_scrape(url: str, max_length: int = 2000) -> str:
+    """Stand-in for scrape_webpage"""
+    time.sleep(float(os.getenv("FAKE_SEARCH_LATENCY_MS", "300")) / 1000)
+    text = f"Offline page content for {url}. " * 20
+    return text[:max_length] + "..." if len(text) > max_length else text
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a fake Ollama HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    args = parser.parse_args()
+    server = FakeOllamaServer(args.host, args.port)
+    print(f"🧪 Fake Ollama listening on {server.url}")
+    server.httpd.serve_forever()
@@ -0,0 +1,279 @@
+"""
+Pooled Gemini Client Layer
+One place that configures the SDK and owns the Gemini objects shared by the
+LLM engine, image and video generators: model objects (and their connections)
+are reused, chat sessions are cached per conversation with LRU/TTL eviction,
+system prompts go in the native system_instruction, and a long stable prompt
+prefix (system instruction plus the older, block-aligned part of the history
+PromptBuilder keeps) is served from an explicit context cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from core.fakes import fake_backends_enabled
+
+load_dotenv()
+
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def to_gemini_history(history: Optional[List[Dict]]) -> List[Dict]:
+    """Convert chat history to Gemini contents (Gemini has no system role)"""
+    contents = []
+    for msg in history or []:
+        role = "user" if msg['role'] == 'user' else "model"
+        contents.append({"role": role, "parts": [msg['content']]})
+    return contents
+
+
+class GeminiPool:
+    """Process-wide Gemini models, chat sessions and context caches"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_sessions: int = 64,
+        session_ttl: float = 1800,
+        max_models: int = 16,
+        context_cache_min_tokens: int = 4096,
+        context_cache_ttl: float = 600,
+        max_context_caches: int = 32,
+        prefix_block: int = 6
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("GEMINI_API_KEY")
+        self.fake = fake_backends_enabled()
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_models = max_models
+        self.context_cache_min_tokens = context_cache_min_tokens
+        self.context_cache_ttl = context_cache_ttl
+        self.max_context_caches = max_context_caches
+        # History is cached in whole blocks (PromptBuilder's history_block), so one
+        # cached prefix serves several turns of a conversation
+        self.prefix_block = max(1, prefix_block)
+
+        self._configured = False
+        self._client = None
+        self._models: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._sessions: "OrderedDict[str, Tuple[object, float]]" = OrderedDict()
+        self._context_caches: "OrderedDict[str, Tuple[object, object, float]]" = OrderedDict()
+        self._caching_unsupported = set()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.models_created = 0
+        self.sessions_created = 0
+        self.sessions_reused = 0
+        self.sessions_evicted = 0
+        self.context_caches_created = 0
+        self.context_cache_hits = 0
+        self.context_caches_evicted = 0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key) or self.fake
+
+    def _configure(self):
+        """Configure the SDK once for the whole process"""
+        if not self._configured and self.api_key:
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+
+    def client(self):
+        """Shared genai.Client (used for Veo video generation)"""
+        with self._lock:
+            if self._client is None:
+                self._configure()
+                self._client = genai.Client()
+            return self._client
+
+    # ==================== Models ====================
+
+    def model(self, name: str, system_instruction: Optional[str] = None):
+        """Reusable GenerativeModel for a (model, system_instruction) pair"""
+        if not self.available:
+            return None
+        key = (name, system_instruction)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+            self._configure()
+            if self.fake:
+                from core.fakes import FakeGeminiModel
+                model = FakeGeminiModel(name, system_instruction=system_instruction)
+            else:
+                model = genai.GenerativeModel(name, system_instruction=system_instruction)
+            self._models[key] = model
+            self.models_created += 1
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+            return model
+
+    def _cached_model(self, name: str, system_instruction: Optional[str], prefix: List[Dict]):
+        """Model bound to an explicit context cache holding the system instruction and a history prefix"""
+        if self.fake or name in self._caching_unsupported:
+            return None
+        key = _fingerprint(name, system_instruction, prefix)
+        with self._lock:
+            expired = self._prune_context_caches(time.time())
+            entry = self._context_caches.get(key)
+            if entry:
+                self._context_caches.move_to_end(key)
+                self.context_cache_hits += 1
+        self._delete_caches(expired)
+        if entry:
+            return entry[0]
+        try:
+            self._configure()
+            cached_content = genai.caching.CachedContent.create(
+                model=name,
+                system_instruction=system_instruction,
+                contents=prefix,
+                ttl=timedelta(seconds=self.context_cache_ttl)
+            )
+            model = genai.GenerativeModel.from_cached_content(cached_content)
+        except Exception as e:
+            # Not every model supports explicit caching; don't retry on every call
+            print(f"⚠️ Gemini context caching unavailable for {name}: {e}")
+            self._caching_unsupported.add(name)
+            return None
+        with self._lock:
+            # Refresh a little before the server-side cache expires
+            self._context_caches[key] = (model, cached_content, time.time() + self.context_cache_ttl * 0.9)
+            self.context_caches_created += 1
+            evicted = self._prune_context_caches(time.time())
+        self._delete_caches(evicted)
+        return model
+
+    def _prune_context_caches(self, now: float) -> List[object]:
+        """
+        Drop expired and least recently used context caches (lock held); returns
+        the server-side caches of still-live entries, to delete outside the lock
+        """
+        live = []
+        for key, (_, _, expires) in list(self._context_caches.items()):
+            if expires <= now:
+                del self._context_caches[key]
+                self.context_caches_evicted += 1
+        while len(self._context_caches) > self.max_context_caches:
+            _, (_, cached_content, _) = self._context_caches.popitem(last=False)
+            self.context_caches_evicted += 1
+            live.append(cached_content)
+        return live
+
+    @staticmethod
+    def _delete_caches(caches: List[object]):
+        """Stop paying storage for evicted caches that haven't expired server-side yet"""
+        for cached_content in caches:
+            try:
+                cached_content.delete()
+            except Exception as e:
+                print(f"⚠️ Could not delete Gemini context cache: {e}")
+
+    def _start_chat(self, model_name: str, system_instruction: Optional[str], contents: List[Dict]):
+        """
+        New chat positioned at the end of `contents`. When the system instruction
+        plus the block-aligned part of the history is long enough, that prefix
+        comes from a context cache and only the rest is sent as chat history.
+        """
+        split = len(contents) - len(contents) % self.prefix_block
+        prefix = contents[:split]
+        prefix_chars = len(system_instruction or "") + sum(len(part) for turn in prefix for part in turn["parts"])
+        if prefix_chars // 4 >= self.context_cache_min_tokens:
+            model = self._cached_model(model_name, system_instruction, prefix)
+            if model is not None:
+                return model.start_chat(history=contents[split:])
+        return self.model(model_name, system_instruction).start_chat(history=contents)
+
+    # ==================== Chat sessions ====================
+
+    def checkout_chat(self, model_name: str, system_instruction: Optional[str], history: Optional[List[Dict]]):
+        """
+        Get a chat session positioned at the end of `history`. A conversation's
+        session is cached under the fingerprint of its history, so the next turn
+        of the same conversation picks it up instead of rebuilding it.
+        """
+        key = _fingerprint(model_name, system_instruction, to_gemini_history(history))
+        now = time.time()
+        with self._lock:
+            self._evict_sessions(now)
+            entry = self._sessions.pop(key, None)
+            if entry:
+                self.sessions_reused += 1
+                return entry[0]
+            self.sessions_created += 1
+        return self._start_chat(model_name, system_instruction, to_gemini_history(history))
+
+    def checkin_chat(self, chat, model_name: str, system_instruction: Optional[str], history: Optional[List[Dict]], message: str, response_text: str):
+        """
+        Return a chat after a successful turn. The last user turn is stored as
+        the bare message (without per-turn context), matching what the memory
+        manager will send as history next time.
+        """
+        turns = to_gemini_history(history) + [
+            {"role": "user", "parts": [message]},
+            {"role": "model", "parts": [response_text]}
+        ]
+        try:
+            chat.history = turns
+        except Exception:
+            return
+        key = _fingerprint(model_name, system_instruction, turns)
+        with self._lock:
+            self._sessions[key] = (chat, time.time())
+            self._sessions.move_to_end(key)
+            self._evict_sessions(time.time())
+
+    def _evict_sessions(self, now: float):
+        """Drop idle and least recently used sessions (lock held)"""
+        while self._sessions:
+            key, (_, last_used) = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - last_used > self.session_ttl:
+                self._sessions.popitem(last=False)
+                self.sessions_evicted += 1
+            else:
+                break
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.sessions_created + self.sessions_reused
+            return {
+                "models": len(self._models),
+                "sessions": len(self._sessions),
+                "sessions_created": self.sessions_created,
+                "sessions_reused": self.sessions_reused,
+                "session_reuse_rate": round(self.sessions_reused / lookups, 3) if lookups else 0.0,
+                "sessions_evicted": self.sessions_evicted,
+                "context_caches": len(self._context_caches),
+                "context_caches_created": self.context_caches_created,
+                "context_cache_hits": self.context_cache_hits,
+                "context_caches_evicted": self.context_caches_evicted
+            }
+
+
+def create_gemini_pool() -> GeminiPool:
+    return GeminiPool(
+        max_sessions=int(os.getenv("GEMINI_MAX_SESSIONS", "64")),
+        session_ttl=float(os.getenv("GEMINI_SESSION_TTL", "1800")),
+        context_cache_min_tokens=int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096")),
+        context_cache_ttl=float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "600")),
+        max_context_caches=int(os.getenv("GEMINI_MAX_CONTEXT_CACHES", "32"))
+    )
+
+
+# Global instance
+gemini_pool = create_gemini_pool()
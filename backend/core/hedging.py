@@ -0,0 +1,200 @@
+"""
+Hedged Requests
+If the primary backend hasn't produced a first token within its p95 TTFT,
+the same request is fired at the other backend and whichever streams first
+wins. The loser is cancelled: if it is still queued for admission it leaves
+the queue at once; if its request is already running, its stream is closed
+and its slot released when the backend sends its next chunk (the request
+can't be interrupted earlier), so the limiter never under-counts it.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Generator, Iterator, Optional
+
+from core.admission import Cancellation
+
+
+class TTFTTracker:
+    """Rolling window of time-to-first-token samples for one backend"""
+
+    def __init__(self, default_threshold: float, window: int = 200, min_samples: int = 20):
+        self.default_threshold = default_threshold
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return self.default_threshold
+            ordered = sorted(self.samples)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def threshold(self) -> float:
+        """Hedge after the p95 first-token latency"""
+        return self.percentile(0.95)
+
+
+class Hedger:
+    """Runs a primary stream and, if it is slow to start, a hedge on the other backend"""
+
+    def __init__(self, backends: list, default_threshold: float = 4.0, max_hedge_rate: float = 0.1, window: int = 100):
+        self.trackers = {name: TTFTTracker(default_threshold) for name in backends}
+        self.max_hedge_rate = max_hedge_rate
+        self._recent = deque(maxlen=window)  # True for requests that fired a hedge
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_lost = 0
+        self.failovers = 0
+        self.skipped_by_cap = 0
+
+    def _allow_hedge(self) -> bool:
+        """Enforce the hedge-rate cap over the recent request window"""
+        with self._lock:
+            if not self._recent:
+                return self.max_hedge_rate > 0
+            return sum(self._recent) / len(self._recent) < self.max_hedge_rate
+
+    def _pump(self, name: str, factory: Callable[[Cancellation], Iterator], events: queue.Queue, cancel: Cancellation):
+        """Drive one backend stream on a worker thread, forwarding chunks as events"""
+        stream = None
+        start = time.monotonic()
+        first = True
+        try:
+            stream = factory(cancel)
+            for chunk in stream:
+                if first:
+                    self.trackers[name].record(time.monotonic() - start)
+                    first = False
+                if cancel.is_set():
+                    break
+                events.put((name, "chunk", chunk))
+            else:
+                events.put((name, "done", None))
+        except Exception as e:
+            events.put((name, "error", e))
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+    def stream(
+        self,
+        primary: str,
+        primary_factory: Callable[[Cancellation], Iterator],
+        secondary: str,
+        secondary_factory: Callable[[Cancellation], Iterator],
+        served: Optional[Dict] = None
+    ) -> Generator:
+        """
+        Yield chunks from whichever backend produces its first token first (its
+        name goes in `served`). Factories get a Cancellation to pass to admission.
+        """
+        events = queue.Queue()
+        cancels: Dict[str, Cancellation] = {}
+        factories = {primary: primary_factory, secondary: secondary_factory}
+
+        def launch(name: str):
+            cancels[name] = Cancellation()
+            threading.Thread(target=self._pump, args=(name, factories[name], events, cancels[name]), daemon=True).start()
+
+        with self._lock:
+            self.requests += 1
+
+        launch(primary)
+        deadline = time.monotonic() + self.trackers[primary].threshold()
+        timing = True  # still waiting to decide whether to hedge
+        errors = {}
+        winner = first_chunk = None
+        winner_done = False
+
+        try:
+            while winner is None:
+                timeout = max(0.0, deadline - time.monotonic()) if timing else None
+                try:
+                    name, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    timing = False
+                    if self._allow_hedge():
+                        print(f"⏱️ {primary} slow to first token, hedging on {secondary}")
+                        with self._lock:
+                            self.hedges_fired += 1
+                        launch(secondary)
+                    else:
+                        with self._lock:
+                            self.skipped_by_cap += 1
+                    continue
+
+                if kind == "error":
+                    errors[name] = payload
+                    if name == primary and secondary not in cancels:
+                        # Primary failed outright: fail over without waiting
+                        print(f"⚠️ {primary} failed ({payload}), failing over to {secondary}")
+                        timing = False
+                        with self._lock:
+                            self.failovers += 1
+                        launch(secondary)
+                    elif len(errors) == len(cancels):
+                        raise errors.get(primary, payload)
+                    continue
+
+                winner = name
+                first_chunk = payload
+                winner_done = kind == "done"
+                if served is not None:
+                    served["backend"] = winner
+
+            hedged = secondary in cancels and primary not in errors
+            with self._lock:
+                self._recent.append(hedged)
+                if hedged:
+                    if winner == secondary:
+                        self.hedges_won += 1
+                    else:
+                        self.hedges_lost += 1
+            for name, cancel in cancels.items():
+                if name != winner:
+                    cancel.set()
+
+            if winner_done:
+                return
+            yield first_chunk
+            while True:
+                name, kind, payload = events.get()
+                if name != winner:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            for cancel in cancels.values():
+                cancel.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            recent_rate = sum(self._recent) / len(self._recent) if self._recent else 0.0
+            return {
+                "requests": self.requests,
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+                "hedges_lost": self.hedges_lost,
+                "failovers": self.failovers,
+                "skipped_by_cap": self.skipped_by_cap,
+                "recent_hedge_rate": round(recent_rate, 3),
+                "max_hedge_rate": self.max_hedge_rate,
+                "ttft_p95_s": {name: round(t.threshold(), 3) for name, t in self.trackers.items()}
+            }
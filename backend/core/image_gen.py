@@ -3,20 +3,16 @@ import os
 import base64
 import io
 from PIL import Image as PILImage
+from core.gemini_pool import gemini_pool
 
 class ImageGenerator:
     def __init__(self):
-        # Initialize Gemini for prompt enhancement AND native image generation
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            # Gemini 2.5 Flash for prompt enhancement
-            self.enhancer_model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            # Gemini 2.5 Flash Image for actual generation (Nano Banana)
-            self.image_model = genai.GenerativeModel('gemini-2.5-flash-image')
-        else:
-            self.enhancer_model = None
-            self.image_model = None
+        # Gemini for prompt enhancement AND native image generation
+        # (pooled models shared with the LLM engine; None without an API key)
+        # Gemini 2.5 Flash for prompt enhancement
+        self.enhancer_model = gemini_pool.model('gemini-2.0-flash-exp')
+        # Gemini 2.5 Flash Image for actual generation (Nano Banana)
+        self.image_model = gemini_pool.model('gemini-2.5-flash-image')
 
     def enhance_prompt(self, user_prompt: str) -> str:
         """
@@ -5,30 +5,120 @@ Routes queries between Local Qwen 2.5 (Low Latency) and Google Gemini (Complex R
 
 import os
 import time
-import re
-from typing import List, Dict, Optional, Generator
+import asyncio
+from typing import Any, Callable, List, Dict, Optional, Generator
 import ollama
 import google.generativeai as genai
 from dotenv import load_dotenv
+from core.admission import BackendLimiter, BackendOverloaded, Cancellation, StreamCancelled
+from core.response_cache import ResponseCache
+from core.prompt_builder import compose_user_turn, cache_context
+from core.router import create_router
+from core.hedging import Hedger
+from core.model_lifecycle import ModelLifecycleManager
+from core.fakes import fake_backends_enabled
+from core.circuit_breaker import CircuitBreaker, BackendUnavailable
+from core.single_flight import SingleFlight, request_key
+from core.request_context import RequestContext, rag_embed
+from core.gemini_pool import gemini_pool
+from core.telemetry import LLMTelemetry, render_gauges
 
 load_dotenv()
 
+LOCAL_FAILURE_MESSAGE = "I apologize, but I'm having trouble processing your request locally."
+
 class HybridLLMEngine:
     def __init__(self):
         # Local Setup (Qwen 2.5)
         self.local_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         self.local_model = os.getenv("OLLAMA_MODEL", "qwen2.5-coder:3b")
         self.ollama_client = ollama.Client(host=self.local_base_url)
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
         
-        # Cloud Setup (Gemini)
+        # Cloud Setup (Gemini) via the shared client layer (fake-aware)
         self.gemini_key = os.getenv("GEMINI_API_KEY")
-        self.gemini_model = None
-        if self.gemini_key:
-            genai.configure(api_key=self.gemini_key)
-            self.gemini_model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.gemini_model_name = 'gemini-2.0-flash-exp'
+        self.gemini = gemini_pool
+        self.gemini_model = self.gemini.model(self.gemini_model_name)
+        
+        # Offline stand-ins for benchmarking / air-gapped testing
+        if fake_backends_enabled():
+            from core.fakes import FakeOllamaClient
+            print("🧪 Using offline fake backends (JARVIS_FAKE_BACKENDS=true)")
+            self.ollama_client = FakeOllamaClient()
+        
+        # Preload + keep-warm for the local models (started with the server)
+        preload = [self.local_model] + [m.strip() for m in os.getenv("OLLAMA_PRELOAD_MODELS", "").split(",")]
+        self.lifecycle = ModelLifecycleManager(
+            self.ollama_client,
+            preload,
+            keep_alive=self.keep_alive,
+            ping_interval=float(os.getenv("OLLAMA_WARM_INTERVAL", "600")),
+            warm_hours=os.getenv("OLLAMA_WARM_HOURS", "8-20")
+        )
+        
+        # Admission control: concurrency matches Ollama's parallel slots,
+        # Gemini additionally gets a token bucket sized to the API quota
+        max_queue = int(os.getenv("LLM_MAX_QUEUE", "8"))
+        max_wait = float(os.getenv("LLM_MAX_QUEUE_WAIT", "30"))
+        self.limiters = {
+            "local": BackendLimiter(
+                "local",
+                max_concurrency=int(os.getenv("OLLAMA_NUM_PARALLEL", "1")),
+                max_queue=max_queue,
+                max_wait=max_wait,
+                max_background=int(os.getenv("LLM_BACKGROUND_SLOTS")) if os.getenv("LLM_BACKGROUND_SLOTS") else None
+            ),
+            "gemini": BackendLimiter(
+                "gemini",
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+                max_queue=max_queue,
+                max_wait=max_wait,
+                rate_per_minute=float(os.getenv("GEMINI_RPM", "15")),
+                max_background=int(os.getenv("LLM_BACKGROUND_SLOTS")) if os.getenv("LLM_BACKGROUND_SLOTS") else None
+            )
+        }
+        
+        # Circuit breakers: fail fast / reroute while a backend is unhealthy
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+                min_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+                window=int(os.getenv("BREAKER_WINDOW", "20")),
+                slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_S", "120")),
+                open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+            )
+            for name in ("local", "gemini")
+        }
+        
+        # Coalesce identical concurrent requests into one generation
+        self.single_flight = SingleFlight() if os.getenv("LLM_COALESCE", "true").lower() == "true" else None
+        
+        # Response Cache (opt-in)
+        self.response_cache = None
+        if os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true":
+            self.response_cache = ResponseCache(
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+                semantic_threshold=float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0.92")),
+                embedder=rag_embed
+            )
+        
+        # Query Router
+        self.router = create_router()
+        
+        # Per-call performance telemetry (exported on /metrics)
+        self.telemetry = LLMTelemetry()
         
-        self.last_call_time = 0
-        self.min_delay = 0.5
+        # Hedged requests (opt-in): race the other backend when the primary is slow to start
+        self.hedger = None
+        if os.getenv("LLM_HEDGING", "false").lower() == "true":
+            self.hedger = Hedger(
+                ["local", "gemini"],
+                default_threshold=float(os.getenv("HEDGE_DEFAULT_TTFT", "4")),
+                max_hedge_rate=float(os.getenv("HEDGE_MAX_RATE", "0.1"))
+            )
         
         # Verify Local Setup
         self._verify_local_setup()
@@ -40,29 +130,15 @@ class HybridLLMEngine:
             print(f"✅ Local LLM connected: {self.local_model}")
         except Exception as e:
             print(f"❌ Local LLM connection failed: {e}")
+            self.breakers["local"].trip()
 
     def _is_complex_query(self, message: str) -> bool:
         """
         Determine if a query requires complex reasoning (Gemini) or is simple (Local).
-        Heuristics:
-        - Length > 300 chars
-        - Keywords: plan, strategy, analyze, compare, reason, design, architecture
-        - Multi-step instructions
+        Uses the router's classifier (keyword heuristic until one is trained),
+        without the live latency adjustment applied in _route.
         """
-        if len(message) > 300:
-            return True
-        
-        complex_keywords = [
-            "plan", "strategy", "analyze", "compare", "reason", 
-            "design", "architecture", "evaluate", "critique", 
-            "complex", "step by step", "explain in detail"
-        ]
-        
-        message_lower = message.lower()
-        if any(kw in message_lower for kw in complex_keywords):
-            return True
-            
-        return False
+        return self.router.is_complex(message)
 
     def generate_response(
         self,
@@ -72,80 +148,338 @@ class HybridLLMEngine:
         temperature: float = 0.7,
         max_tokens: int = 2000,
         stream: bool = False,
-        force_local: bool = False
+        force_local: bool = False,
+        use_cache: bool = True,
+        cache_namespace: Optional[str] = None,
+        context: Optional[str] = None,
+        request: Optional[RequestContext] = None,
+        background: bool = False
     ) -> str | Generator:
         """
-        Generate response using Hybrid Routing
-        """
-        # Rate limiting
-        time_since_last = time.time() - self.last_call_time
-        if time_since_last < self.min_delay:
-            time.sleep(self.min_delay - time_since_last)
+        Generate response using Hybrid Routing.
+        Raises BackendOverloaded when the chosen backend cannot admit the request,
+        and BackendUnavailable when its circuit is open and there is nowhere to reroute.
         
-        # Routing Logic
-        use_gemini = False
-        if not force_local and self.gemini_model and self._is_complex_query(message):
-            use_gemini = True
-            print(f"🧠 Routing to Gemini (Complex Query)")
+        Args:
+            use_cache: Set False to bypass the response cache for this request
+            cache_namespace: Enables semantic cache matching among prompts in the
+                same namespace (e.g. a mode); temperature-0 calls always allow it
+            context: Volatile per-turn context (time, search results, RAG), sent
+                in the final user turn after the history so the prefix stays stable
+            request: The message's RequestContext, so routing and the semantic
+                cache reuse an embedding already computed for RAG retrieval
+            background: Admit at background priority (batch jobs), behind /chat
+        """
+        request = request if request is not None and request.text == message else RequestContext(message)
+        decision = self._route(message, force_local, request)
+        self.telemetry.record_route(decision)
+        backend = decision["backend"]
+        prompt = compose_user_turn(message, context)
+
+        # Response cache lookup
+        cache_key = cache_scope = None
+        if self.response_cache and use_cache:
+            model = self._model_name(backend)
+            # Keyed on the context with the clock rounded to the hour, so it survives the minute changing
+            cache_key = ResponseCache.make_key(model, system_prompt, history, compose_user_turn(message, cache_context(context)), temperature)
+            if temperature == 0 or cache_namespace:
+                cache_scope = ResponseCache.make_scope(model, history, temperature, cache_namespace or system_prompt or "")
+            cached = self.response_cache.get(cache_key, message, cache_scope, request)
+            if cached is not None:
+                print(f"💾 Serving cached response")
+                return iter([cached]) if stream else cached
+
+        backend = self._avoid_open_circuit(decision, force_local)
+
+        if self.hedger and self.gemini_model and not force_local:
+            generate = self._generate_hedged
         else:
-            print(f"⚡ Routing to Local Qwen (Low Latency)")
+            generate = self._generate_routed
+        args = (backend, message, system_prompt, history, temperature, max_tokens)
+        served = {}  # Backend that actually produced this caller's response
 
-        try:
-            if use_gemini:
-                return self._generate_gemini(message, system_prompt, history, temperature, stream)
+        if self.single_flight:
+            # Identical in-flight requests share one generation
+            flight_key = request_key(prompt, system_prompt, history, backend=backend, temperature=temperature, max_tokens=max_tokens)
+            if stream:
+                response = self.single_flight.stream(flight_key, lambda: generate(*args, True, decision["reason"], context, served, background=background))
             else:
-                return self._generate_local(message, system_prompt, history, temperature, max_tokens, stream)
+                response = self.single_flight.run(flight_key, lambda: generate(*args, False, decision["reason"], context, served, background=background))
+        else:
+            response = generate(*args, stream, decision["reason"], context, served, background=background)
+
+        if cache_key:
+            if stream:
+                return self._cache_stream(response, cache_key, message, cache_scope, request, served, backend)
+            self._cache_put(cache_key, response, message, cache_scope, request, served, backend)
+        return response
+
+    def _route(self, message: str, force_local: bool, request: Optional[RequestContext] = None) -> Dict:
+        """Pick the backend for a message using the classifier and live backend stats"""
+        decision = self.router.decide(
+            message,
+            force_local=force_local,
+            cloud_available=self.gemini_model is not None,
+            backend_stats=self.admission_stats(),
+            request=request
+        )
+        if decision["backend"] == "gemini":
+            print(f"🧠 Routing to Gemini ({decision['reason']})")
+        else:
+            print(f"⚡ Routing to Local Qwen ({decision['reason']})")
+        return decision
+
+    def _avoid_open_circuit(self, decision: Dict, force_local: bool) -> str:
+        """Reroute to the other backend while the routed one's circuit is open"""
+        backend = decision["backend"]
+        if self.breakers[backend].available():
+            return backend
+        other = "local" if backend == "gemini" else "gemini"
+        can_use_other = other == "local" or (self.gemini_model is not None and not force_local)
+        if can_use_other and self.breakers[other].available():
+            print(f"🔀 {backend} circuit open, rerouting to {other}")
+            decision["backend"] = other
+            decision["reason"] += f"; rerouted ({backend} circuit open)"
+            return other
+        raise BackendUnavailable(backend, self.breakers[backend].stats()["retry_after_s"])
+
+    def _model_name(self, backend: str) -> str:
+        return self.gemini_model_name if backend == "gemini" else self.local_model
+
+    def _generate_routed(self, backend: str, message: str, system_prompt: str, history: List[Dict], temperature: float, max_tokens: int, stream: bool, reason: str = "", context: Optional[str] = None, served: Optional[Dict] = None, background: bool = False):
+        """Generate on the routed backend, falling back to local if Gemini fails"""
+        served = served if served is not None else {}
+        use_gemini = backend == "gemini"
+        try:
+            response = self._dispatch(backend, message, system_prompt, history, temperature, max_tokens, stream, reason, context, background=background)
+            served["backend"] = backend
+            return response
         
+        except (BackendOverloaded, BackendUnavailable) as e:
+            if not use_gemini:
+                raise
+            print(f"⚠️ {e}. Falling back to Local Qwen...")
+            response = self._dispatch("local", message, system_prompt, history, temperature, max_tokens, stream, "fallback: gemini rejected", context, background=background)
+            served["backend"] = "local"
+            return response
+
         except Exception as e:
             print(f"❌ Primary model failed: {e}")
             # Fallback logic
             if use_gemini:
                 print("⚠️ Falling back to Local Qwen...")
-                return self._generate_local(message, system_prompt, history, temperature, max_tokens, stream)
+                response = self._dispatch("local", message, system_prompt, history, temperature, max_tokens, stream, "fallback: gemini error", context, background=background)
+                served["backend"] = "local"
+                return response
             else:
-                return "I apologize, but I'm having trouble processing your request locally."
-        
+                return LOCAL_FAILURE_MESSAGE
+
+    def _generate_hedged(self, backend: str, message: str, system_prompt: str, history: List[Dict], temperature: float, max_tokens: int, stream: bool, reason: str = "", context: Optional[str] = None, served: Optional[Dict] = None, background: bool = False):
+        """Stream from the routed backend, hedging on the other one if it is slow to start"""
+        other = "local" if backend == "gemini" else "gemini"
+        chunks = self.hedger.stream(
+            backend,
+            lambda cancel: self._dispatch(backend, message, system_prompt, history, temperature, max_tokens, True, reason, context, cancel, background),
+            other,
+            lambda cancel: self._dispatch(other, message, system_prompt, history, temperature, max_tokens, True, f"hedge for {backend}", context, cancel, background),
+            served=served
+        )
+        if stream:
+            return chunks
+        try:
+            return "".join(chunks)
+        except (BackendOverloaded, BackendUnavailable):
+            raise
+        except Exception as e:
+            print(f"❌ Hedged generation failed on both backends: {e}")
+            return LOCAL_FAILURE_MESSAGE
+
+    def _cache_put(self, cache_key: str, response: str, message: str, cache_scope: Optional[str], request: Optional[RequestContext], served: Dict, backend: str):
+        """
+        Cache a response under the routed model's key, but only if that model
+        produced it: fallback and hedge-winner replies, failures and replies
+        joined from another caller's generation are not cached.
+        """
+        if served.get("backend") != backend or response == LOCAL_FAILURE_MESSAGE:
+            return
+        self.response_cache.put(cache_key, response, message, cache_scope, request)
+
+    def _cache_stream(self, stream, cache_key: str, message: str, cache_scope: Optional[str], request: Optional[RequestContext], served: Dict, backend: str) -> Generator:
+        """Pass a stream through and cache the full text once it completes"""
+        chunks = []
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
         finally:
-            self.last_call_time = time.time()
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+        self._cache_put(cache_key, "".join(chunks), message, cache_scope, request, served, backend)
 
-    def _generate_gemini(self, message: str, system_prompt: str, history: List[Dict], temperature: float, stream: bool):
-        """Generate using Gemini API"""
-        # Convert history to Gemini format
-        chat_history = []
-        if history:
-            for msg in history:
-                role = "user" if msg['role'] == 'user' else "model"
-                chat_history.append({"role": role, "parts": [msg['content']]})
-        
-        # Add system prompt to the first message or configure it if supported (Gemini 1.5 supports system instructions)
-        # For simplicity, we'll prepend it to the history or current message if needed, 
-        # but Gemini 1.5 Pro/Flash supports system_instruction in GenerativeModel constructor.
-        # Here we initialized without it, so we can pass it in countent or just rely on context.
-        # Better: Prepend to chat session.
-        
-        if system_prompt:
-             # Gemini doesn't strictly have "system" role in chat history for all versions, 
-             # but we can prepend it to the first user message or use system_instruction.
-             # We'll use a simple approach: Prepend to the current message context.
-             pass # Gemini is smart enough usually.
-        
-        chat = self.gemini_model.start_chat(history=chat_history)
-        
-        full_prompt = message
-        if system_prompt:
-            full_prompt = f"System Instruction: {system_prompt}\n\nUser Query: {message}"
+    async def agenerate_response(self, message: str, **kwargs) -> str | Generator:
+        """Async wrapper: waits for admission and generates off the event loop"""
+        return await asyncio.to_thread(self.generate_response, message, **kwargs)
 
-        if stream:
-            response = chat.send_message(full_prompt, stream=True, generation_config=genai.GenerationConfig(temperature=temperature))
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
-        else:
-            response = chat.send_message(full_prompt, generation_config=genai.GenerationConfig(temperature=temperature))
-            return response.text
+    def _dispatch(self, backend: str, message: str, system_prompt: str, history: List[Dict], temperature: float, max_tokens: int, stream: bool, reason: str = "", context: Optional[str] = None, cancel: Optional[Cancellation] = None, background: bool = False):
+        """
+        Run a generation on one backend under its circuit breaker and admission limiter.
+        A stream's slot is released as soon as `cancel` is set (hedge losers);
+        background calls are admitted behind interactive ones.
+        """
+        def produce(record: Dict):
+            if backend == "gemini":
+                if stream:
+                    return self._stream_gemini(message, system_prompt, history, temperature, record, context)
+                return self._generate_gemini(message, system_prompt, history, temperature, record, context)
+            if stream:
+                return self._stream_local(message, system_prompt, history, temperature, max_tokens, record, context)
+            return self._generate_local(message, system_prompt, history, temperature, max_tokens, record, context)
 
-    def _generate_local(self, message: str, system_prompt: str, history: List[Dict], temperature: float, max_tokens: int, stream: bool):
-        """Generate using Local Ollama"""
+        return self.guarded_call(backend, self._model_name(backend), reason, produce, stream, cancel, background)
+
+    def guarded_call(self, backend: str, model: str, reason: str, produce: Callable[[Dict], Any], stream: bool, cancel: Optional[Cancellation] = None, background: bool = False):
+        """
+        Run `produce(record)` under a backend's circuit breaker, admission limiter
+        and telemetry. It returns the result, or for a stream a lazy iterator
+        that is admitted before its first chunk. Also used by the agent, so its
+        Ollama calls share the local backend's slots.
+        """
+        breaker = self.breakers[backend]
+        limiter = self.limiters[backend]
+        breaker.before_call()
+        record = self.telemetry.start(backend, model, reason, stream)
+        try:
+            if stream:
+                slot_stream = limiter.stream(produce(record), cancel, background)
+                self.telemetry.mark_admitted(record)
+                return self._observed_stream(breaker, record, slot_stream)
+            with limiter.slot(background):
+                self.telemetry.mark_admitted(record)
+                start = time.monotonic()
+                result = produce(record)
+        except BackendOverloaded:
+            breaker.release_probe()
+            self.telemetry.finish(record, "rejected")
+            raise
+        except StreamCancelled:
+            breaker.release_probe()
+            self.telemetry.finish(record, "cancelled")
+            raise
+        except Exception as e:
+            breaker.record_failure(e)
+            self.telemetry.finish(record, "error")
+            raise
+        breaker.record_success(time.monotonic() - start)
+        self.telemetry.finish(record)
+        return result
+
+    def _observed_stream(self, breaker: CircuitBreaker, record: Dict, stream) -> Generator:
+        """
+        Report a stream's outcome: TTFT on the first chunk to the breaker and
+        telemetry, then the full call (or the error / early close) to telemetry
+        """
+        start = time.monotonic()
+        verdict = False
+        outcome = "cancelled"
+        try:
+            for chunk in stream:
+                if not verdict:
+                    breaker.record_success(time.monotonic() - start)
+                    self.telemetry.mark_first_token(record)
+                    verdict = True
+                yield chunk
+            outcome = "ok"
+        except StreamCancelled:
+            raise  # Says nothing about the backend's health
+        except Exception as e:
+            breaker.record_failure(e)
+            verdict = True
+            outcome = "error"
+            raise
+        finally:
+            if not verdict:
+                breaker.release_probe()
+            stream.close()
+            self.telemetry.finish(record, outcome)
+
+    def metrics_text(self) -> str:
+        """Prometheus exposition: per-call histograms plus admission, breaker, cache and coalescing gauges"""
+        admission = self.admission_stats()
+        breakers = self.breaker_stats()
+        states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+        lines = []
+        lines += render_gauges("llm_admission_in_flight", "Requests holding a backend slot", {b: s["in_flight"] for b, s in admission.items()})
+        lines += render_gauges("llm_admission_queue_depth", "Requests waiting for a backend slot", {b: s["queue_depth"] for b, s in admission.items()})
+        lines += render_gauges("llm_admission_rejected_total", "Requests rejected by admission control", {b: s["rejected"] for b, s in admission.items()}, kind="counter")
+        lines += render_gauges("llm_admission_avg_wait_seconds", "Average queue wait", {b: s["avg_wait_ms"] / 1000 for b, s in admission.items()})
+        lines += render_gauges("llm_circuit_state", "Circuit state (0 closed, 1 half-open, 2 open)", {b: states[s["state"]] for b, s in breakers.items()})
+        lines += render_gauges("llm_circuit_rejected_total", "Calls failed fast by an open circuit", {b: s["rejected"] for b, s in breakers.items()}, kind="counter")
+        if self.single_flight:
+            flights = self.single_flight.stats()
+            lines += render_gauges("llm_coalesced_total", "Requests served by an identical in-flight generation", {"all": flights["coalesced"]}, label="scope", kind="counter")
+        if self.response_cache:
+            cache = self.response_cache.stats()
+            lookups = {"exact_hit": cache["exact_hits"], "semantic_hit": cache["semantic_hits"], "miss": cache["misses"]}
+            lines += render_gauges("llm_cache_lookups_total", "Response cache lookups by result", lookups, label="result", kind="counter")
+        return self.telemetry.render(lines)
+
+    def coalescing_stats(self) -> Dict:
+        """Generations started vs requests that joined an identical in-flight one"""
+        if not self.single_flight:
+            return {"status": "disabled"}
+        return self.single_flight.stats()
+
+    def breaker_stats(self) -> Dict:
+        """Circuit state and recent failure rate per backend"""
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+    def cache_stats(self) -> Dict:
+        """Response cache hit rates (or disabled)"""
+        if not self.response_cache:
+            return {"status": "disabled"}
+        return self.response_cache.stats()
+
+    def hedging_stats(self) -> Dict:
+        """Hedges fired/won/lost and per-backend p95 TTFT (or disabled)"""
+        if not self.hedger:
+            return {"status": "disabled"}
+        return self.hedger.stats()
+
+    def gemini_stats(self) -> Dict:
+        """Pooled Gemini models, chat session reuse and context caches"""
+        return self.gemini.stats()
+
+    def admission_stats(self) -> Dict:
+        """Queue depth, in-flight count and wait times per backend"""
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+    def _generate_gemini(self, message: str, system_prompt: str, history: List[Dict], temperature: float, record: Optional[Dict] = None, context: Optional[str] = None) -> str:
+        """Generate using Gemini API (pooled chat session, native system instruction)"""
+        chat = self.gemini.checkout_chat(self.gemini_model_name, system_prompt, history)
+        response = chat.send_message(compose_user_turn(message, context), generation_config=genai.GenerationConfig(temperature=temperature))
+        if record is not None:
+            LLMTelemetry.fill_gemini(record, response)
+        self.gemini.checkin_chat(chat, self.gemini_model_name, system_prompt, history, message, response.text)
+        return response.text
+
+    def _stream_gemini(self, message: str, system_prompt: str, history: List[Dict], temperature: float, record: Optional[Dict] = None, context: Optional[str] = None) -> Generator:
+        """Stream using Gemini API (pooled chat session, native system instruction)"""
+        chat = self.gemini.checkout_chat(self.gemini_model_name, system_prompt, history)
+        response = chat.send_message(compose_user_turn(message, context), stream=True, generation_config=genai.GenerationConfig(temperature=temperature))
+        chunks = []
+        for chunk in response:
+            if record is not None:
+                # Usage metadata is cumulative; the last chunk carries the totals
+                LLMTelemetry.fill_gemini(record, chunk)
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+        # Only a fully received turn goes back to the session cache
+        self.gemini.checkin_chat(chat, self.gemini_model_name, system_prompt, history, message, "".join(chunks))
+
+    def _local_messages(self, message: str, system_prompt: str, history: List[Dict], context: Optional[str] = None) -> List[Dict]:
+        """Build the Ollama chat message list"""
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
@@ -155,25 +489,36 @@ class HybridLLMEngine:
                 if msg['role'] in ['user', 'assistant', 'system']:
                     messages.append({"role": msg['role'], "content": msg['content']})
         
-        messages.append({"role": "user", "content": message})
-        
-        if stream:
-            stream_response = self.ollama_client.chat(
-                model=self.local_model,
-                messages=messages,
-                stream=True,
-                options={"temperature": temperature, "num_predict": max_tokens}
-            )
-            for chunk in stream_response:
-                if 'message' in chunk and 'content' in chunk['message']:
-                    yield chunk['message']['content']
-        else:
-            response = self.ollama_client.chat(
-                model=self.local_model,
-                messages=messages,
-                options={"temperature": temperature, "num_predict": max_tokens}
-            )
-            return response['message']['content']
+        messages.append({"role": "user", "content": compose_user_turn(message, context)})
+        return messages
+
+    def _generate_local(self, message: str, system_prompt: str, history: List[Dict], temperature: float, max_tokens: int, record: Optional[Dict] = None, context: Optional[str] = None) -> str:
+        """Generate using Local Ollama"""
+        response = self.ollama_client.chat(
+            model=self.local_model,
+            messages=self._local_messages(message, system_prompt, history, context),
+            keep_alive=self.keep_alive,
+            options={"temperature": temperature, "num_predict": max_tokens}
+        )
+        if record is not None:
+            LLMTelemetry.fill_ollama(record, response)
+        return response['message']['content']
+
+    def _stream_local(self, message: str, system_prompt: str, history: List[Dict], temperature: float, max_tokens: int, record: Optional[Dict] = None, context: Optional[str] = None) -> Generator:
+        """Stream using Local Ollama"""
+        stream_response = self.ollama_client.chat(
+            model=self.local_model,
+            messages=self._local_messages(message, system_prompt, history, context),
+            stream=True,
+            keep_alive=self.keep_alive,
+            options={"temperature": temperature, "num_predict": max_tokens}
+        )
+        for chunk in stream_response:
+            if chunk.get('done') and record is not None:
+                # The final chunk carries Ollama's token counts and timings
+                LLMTelemetry.fill_ollama(record, chunk)
+            if 'message' in chunk and 'content' in chunk['message']:
+                yield chunk['message']['content']
 
     def create_educational_prompt(self, message: str, mode: str = "tutor") -> str:
         """Same as before"""
@@ -108,14 +108,14 @@ class MemoryManager:
     def get_conversation_history(
         self,
         session_id: str,
-        max_messages: int = 20
+        max_messages: Optional[int] = 20
     ) -> List[Dict]:
         """
         Get conversation history formatted for LLM
         
         Args:
             session_id: Session ID
-            max_messages: Maximum number of messages to return
+            max_messages: Maximum number of messages to return (None for all)
         
         Returns:
             List of messages in LLM format
@@ -123,7 +123,7 @@ class MemoryManager:
         messages = self.get_messages(session_id)
         
         # Take only last max_messages
-        if len(messages) > max_messages:
+        if max_messages and len(messages) > max_messages:
             messages = messages[-max_messages:]
         
         # Format for LLM
@@ -178,14 +178,14 @@ class MemoryManager:
         except Exception as e:
             return f"Failed to store memory: {e}"
 
-    def search_memories(self, query: str, limit: int = 3) -> List[str]:
-        """Search long-term memories"""
+    def search_memories(self, query: str, limit: int = 3, embedding: Optional[List[float]] = None) -> List[str]:
+        """Search long-term memories (pass `embedding` if the query is already embedded)"""
         from core.rag import rag_system
         if not rag_system.enabled:
             return []
             
         try:
-            results = rag_system.search(query, n_results=limit)
+            results = rag_system.search(query, n_results=limit, embedding=embedding)
             memories = [res["content"] for res in results]
             return memories
         except Exception as e:
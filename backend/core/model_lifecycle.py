@@ -0,0 +1,139 @@
+"""
+Ollama Model Lifecycle
+Preloads the configured local models in the background, pins them with
+keep_alive, and sends keep-warm pings during business hours so the first
+request after idle doesn't pay the model load.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+def model_key(name: str) -> str:
+    """Ollama names an untagged model ':latest' ('llama3' -> 'llama3:latest')"""
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+def parse_hours(spec: str) -> Tuple[int, int]:
+    """Parse 'start-end' hours (24h clock, end exclusive), e.g. '8-20'"""
+    start, end = spec.split("-", 1)
+    return int(start), int(end)
+
+
+class ModelLifecycleManager:
+    """Tracks load state of local models and keeps them warm"""
+
+    def __init__(
+        self,
+        client,
+        models: List[str],
+        keep_alive: str = "30m",
+        ping_interval: float = 600,
+        warm_hours: str = "8-20",
+        refresh_interval: float = 10.0
+    ):
+        self.client = client
+        self.models = list(dict.fromkeys(m for m in models if m))
+        self.keep_alive = keep_alive
+        self.ping_interval = ping_interval
+        self.warm_hours = parse_hours(warm_hours)
+        self.refresh_interval = refresh_interval
+        self._refreshed = 0.0
+        self.state: Dict[str, Dict] = {
+            m: {"status": "unloaded", "load_time_s": None, "last_warmed": None, "error": None}
+            for m in self.models
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Preload models and start the keep-warm loop in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ollama-keep-warm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def in_warm_hours(self, now: Optional[datetime] = None) -> bool:
+        start, end = self.warm_hours
+        hour = (now or datetime.now()).hour
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def _run(self):
+        for model in self.models:
+            self.warm(model)
+        while not self._stop.wait(self.ping_interval):
+            if not self.in_warm_hours():
+                continue
+            for model in self.models:
+                self.warm(model)
+
+    def warm(self, model: str) -> bool:
+        """
+        Load (or keep loaded) a model with an empty prompt, which Ollama treats
+        as a load-only request, and pin it for keep_alive.
+        """
+        with self._lock:
+            first_load = self.state[model]["status"] != "loaded"
+            if first_load:
+                self.state[model]["status"] = "loading"
+        start = time.time()
+        try:
+            response = self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+            elapsed = time.time() - start
+            load_duration = (response.get("load_duration") or 0) / 1e9
+            with self._lock:
+                entry = self.state[model]
+                entry["status"] = "loaded"
+                entry["error"] = None
+                entry["last_warmed"] = datetime.now().isoformat()
+                if first_load:
+                    entry["load_time_s"] = round(load_duration or elapsed, 3)
+            if first_load:
+                print(f"🔥 Preloaded {model} in {elapsed:.1f}s (keep_alive={self.keep_alive})")
+            return True
+        except Exception as e:
+            with self._lock:
+                self.state[model]["status"] = "error"
+                self.state[model]["error"] = str(e)
+            print(f"⚠️ Failed to warm {model}: {e}")
+            return False
+
+    def refresh(self):
+        """Reconcile load state with the models Ollama actually has in memory (blocking HTTP call)"""
+        self._refreshed = time.monotonic()
+        try:
+            running = self.client.ps()
+        except Exception:
+            return
+        loaded = set()
+        for m in running.get("models") or []:
+            name = m.get("model") or m.get("name")
+            if name:
+                loaded.add(model_key(name))
+        with self._lock:
+            for model, entry in self.state.items():
+                if model_key(model) in loaded:
+                    entry["status"] = "loaded"
+                elif entry["status"] == "loaded":
+                    entry["status"] = "unloaded"
+
+    def status(self) -> Dict:
+        """
+        Load state and load time per model, for /health. Ollama is asked at most
+        every refresh_interval seconds; call it off the event loop.
+        """
+        if time.monotonic() - self._refreshed >= self.refresh_interval:
+            self.refresh()
+        with self._lock:
+            return {
+                "keep_alive": self.keep_alive,
+                "warm_hours": f"{self.warm_hours[0]}-{self.warm_hours[1]}",
+                "models": {m: dict(entry) for m, entry in self.state.items()}
+            }
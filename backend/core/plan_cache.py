@@ -0,0 +1,295 @@
+"""
+Agent Plan Cache
+Remembers the tool-call sequence of successful agent runs, keyed by a task
+template (the task with numbers, URLs, emails and quoted strings turned into
+slots). A new task with the same template reuses the plan with its own slot
+values; a similar one (embedding or word overlap) gets the plan as a hint.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.request_context import rag_embed
+
+# Slot patterns, most specific first
+SLOT_PATTERN = re.compile(
+    r"https?://\S+[^\s.,;:!?)\]]"        # URLs
+    r"|[\w.+-]+@[\w-]+\.[\w.-]+"          # Emails
+    r"|\"[^\"]+\"|'[^']{2,}'"             # Quoted strings
+    r"|\d+(?:[.,]\d+)*"                   # Numbers
+)
+
+
+def task_template(task: str) -> Tuple[str, List[str]]:
+    """("what's {0}% of {1}", ["15", "240"]) for "What's 15% of 240?" """
+    slots = []
+
+    def slot(match):
+        slots.append(match.group(0).strip("\"'"))
+        return "{%d}" % (len(slots) - 1)
+
+    template = SLOT_PATTERN.sub(slot, task.strip())
+    template = " ".join(template.lower().split()).rstrip(" ?.!")
+    return template, slots
+
+
+def _templatize(text: str, slots: List[str]) -> Tuple[str, bool]:
+    """
+    Replace a task's slot values inside a tool input with their placeholders.
+    A value that appears in several slots maps its occurrences to them in order.
+    Also reports whether the input is clean: no slot value is left in it as a
+    literal (e.g. "15" inside "0.15" for "15%"), so refilling it is safe.
+    """
+    text = text.replace("{", "{{").replace("}", "}}")
+    values = sorted({value for value in slots if value}, key=len, reverse=True)
+    if not values:
+        return text, True
+    pattern = re.compile("|".join(r"(?<![\w.])%s(?!\w)" % re.escape(value) for value in values))
+    seen = {}
+
+    def placeholder(match):
+        value = match.group(0)
+        indices = [i for i, slot in enumerate(slots) if slot == value]
+        count = seen.get(value, 0)
+        seen[value] = count + 1
+        return "{%d}" % indices[min(count, len(indices) - 1)]
+
+    rest = pattern.sub(" ", text)
+    clean = not any(re.search(r"(?<!\w)%s(?!\w)" % re.escape(value), rest) for value in values)
+    return pattern.sub(placeholder, text), clean
+
+
+def _placeholders(template: str) -> set:
+    return {int(n) for n in re.findall(r"(?<!\{)\{(\d+)\}", template)}
+
+
+def _fill(template: str, slots: List[str]) -> Optional[str]:
+    try:
+        return template.format(*slots)
+    except (IndexError, KeyError, ValueError):
+        return None
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z]+|\{\d+\}", text.lower()))
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class PlanCache:
+    """Successful tool-call plans by task template, persisted to disk"""
+
+    def __init__(
+        self,
+        path: str = "backend/data/plan_cache.json",
+        max_entries: int = 200,
+        threshold: float = 0.85,
+        word_threshold: float = 0.7,
+        embedder: Optional[Callable[[str], Optional[List[float]]]] = None
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.word_threshold = word_threshold
+        self.embedder = embedder
+        self._entries: Dict[str, Dict] = self._load()
+        self._vectors: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.llm_calls_saved = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {entry["template"]: entry for entry in json.load(f)}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"⚠️ Could not load plan cache: {e}")
+            return {}
+
+    def _save(self):
+        """Write entries atomically (lock held)"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(list(self._entries.values()), f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️ Could not save plan cache: {e}")
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        if not self.embedder:
+            return None
+        try:
+            vector = self.embedder(text)
+        except Exception as e:
+            print(f"⚠️ Plan cache embedding failed: {e}")
+            self.embedder = None  # Fall back to word overlap from now on
+            return None
+        return _normalize(list(vector)) if vector is not None else None
+
+    def _cosine(self, vector: List[float], candidate: str) -> float:
+        other = self._vectors.get(candidate)
+        if other is None:
+            other = self._embed(candidate)
+            if not other:
+                return 0.0
+            self._vectors[candidate] = other
+        return sum(a * b for a, b in zip(vector, other))
+
+    @staticmethod
+    def _overlap(template: str, candidate: str) -> float:
+        words, other_words = _words(template), _words(candidate)
+        return len(words & other_words) / len(words | other_words) if words | other_words else 0.0
+
+    def _closest(self, template: str, candidates: List[str]) -> Tuple[Optional[str], float]:
+        """Most similar stored template if it clears the threshold: cosine similarity
+        of embeddings, or word overlap when no embedder is available"""
+        vector = self._embed(template)
+        if vector:
+            scored = [(self._cosine(vector, c), c) for c in candidates]
+            threshold = self.threshold
+        else:
+            scored = [(self._overlap(template, c), c) for c in candidates]
+            threshold = self.word_threshold
+        score, best = max(scored)
+        return (best, score) if score >= threshold else (None, score)
+
+    def lookup(self, task: str) -> Optional[Dict]:
+        """
+        Plan for a task: {"match": "exact" | "similar", "steps": [[{tool, input}]],
+        "similarity", "example_task", "llm_calls", "reusable"}. Inputs are filled
+        with this task's slot values when the slots line up and the input was
+        cleanly templated, and left as recorded otherwise. Only a "reusable" plan
+        (every slot filled into it, no literal left over) may run without the model.
+        """
+        template, slots = task_template(task)
+        with self._lock:
+            entry = self._entries.get(template)
+            candidates = list(self._entries) if entry is None else []
+        match, similarity = ("exact", 1.0) if entry else (None, 0.0)
+
+        if entry is None and candidates:
+            best, similarity = self._closest(template, candidates)
+            if best:
+                with self._lock:
+                    entry = self._entries.get(best)
+                match = "similar"
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["hits"] += 1
+            entry["last_used"] = time.time()
+            if match == "exact":
+                self.exact_hits += 1
+            else:
+                self.similar_hits += 1
+
+        steps = []
+        for step in entry["steps"]:
+            calls = []
+            for call in step:
+                filled = _fill(call["input"], slots) if call.get("clean") and len(slots) == entry.get("slots", len(slots)) else None
+                calls.append({"tool": call["tool"], "input": filled if filled is not None else call["example_input"]})
+            steps.append(calls)
+        return {
+            "match": match,
+            "template": entry["template"],
+            "similarity": round(similarity, 3),
+            "example_task": entry["example_task"],
+            "steps": steps,
+            "llm_calls": entry["llm_calls"],
+            "reusable": entry.get("reusable", False)
+        }
+
+    def put(self, task: str, steps: List[List[Dict[str, str]]], llm_calls: int):
+        """Remember the tool calls of a successful run, grouped by step"""
+        if not steps:
+            return
+        template, slots = task_template(task)
+        templated = []
+        for step in steps:
+            calls = []
+            for c in step:
+                templated_input, clean = _templatize(c["input"], slots)
+                calls.append({"tool": c["tool"], "input": templated_input, "example_input": c["input"], "clean": clean})
+            templated.append(calls)
+        used = set().union(*(_placeholders(c["input"]) for step in templated for c in step))
+        entry = {
+            "template": template,
+            "example_task": task,
+            "steps": templated,
+            "slots": len(slots),
+            # Safe to replay with another task's values: every slot is used and nothing is left hard-coded
+            "reusable": all(c["clean"] for step in templated for c in step) and used == set(range(len(slots))),
+            "llm_calls": llm_calls,
+            "hits": 0,
+            "created_at": time.time(),
+            "last_used": time.time()
+        }
+        with self._lock:
+            previous = self._entries.pop(template, None)
+            if previous:
+                # Keep the cheaper plan and the hit count
+                entry["hits"] = previous["hits"]
+                if previous["llm_calls"] <= llm_calls:
+                    entry = dict(previous, last_used=time.time())
+            self._entries[template] = entry
+            while len(self._entries) > self.max_entries:
+                oldest = min(self._entries.values(), key=lambda e: e["last_used"])
+                del self._entries[oldest["template"]]
+                self._vectors.pop(oldest["template"], None)
+            self._save()
+
+    def record_saving(self, cached_llm_calls: int, llm_calls: int) -> int:
+        """LLM calls a run saved compared with the run that produced its plan"""
+        saved = max(0, cached_llm_calls - llm_calls)
+        with self._lock:
+            self.llm_calls_saved += saved
+        return saved
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._save()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "llm_calls_saved": self.llm_calls_saved
+            }
+
+
+def create_plan_cache() -> PlanCache:
+    return PlanCache(
+        path=os.getenv("AGENT_PLAN_CACHE_PATH", "backend/data/plan_cache.json"),
+        max_entries=int(os.getenv("AGENT_PLAN_CACHE_MAX_ENTRIES", "200")),
+        threshold=float(os.getenv("AGENT_PLAN_CACHE_THRESHOLD", "0.85")),
+        word_threshold=float(os.getenv("AGENT_PLAN_CACHE_WORD_THRESHOLD", "0.7")),
+        embedder=rag_embed
+    )
@@ -0,0 +1,114 @@
+"""
+Prompt Assembly
+Orders prompt content from most to least stable so Ollama can reuse its KV cache
+across turns: persona + mode instructions -> older history -> time / retrieved
+context -> current message.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+# "Current time: Saturday, October 18, 2026 at 03:42 PM" -> minutes dropped
+_CLOCK_MINUTES = re.compile(r"^(Current time: .* \d{1,2}):\d{2}( [AP]M)?$", re.MULTILINE)
+
+PERSONAS = {
+    "general": "You are Jarvis, an advanced AI assistant specializing in coding, education, and general knowledge.",
+    "coding": "You are Jarvis, an expert programming assistant.",
+    "education": "You are Professor Jarvis, an expert educational AI tutor."
+}
+
+MODE_INSTRUCTIONS = {
+    "normal": "Be helpful, concise, and accurate. When the user's message includes context "
+              "(current time, web search results or knowledge base entries), use it to answer accurately.",
+    "coding": "Provide clean, documented code.",
+    "quiz": "MODE: QUIZ\nGenerate 3-5 multiple choice questions on the topic the user gives.",
+    "eli5": "MODE: ELI5\nExplain the user's topic simply.",
+    "flashcard": "MODE: FLASHCARDS\nGenerate terms for the topic the user gives.",
+    "tutor": "MODE: TUTOR\nGuide the user on the topic they give."
+}
+
+EDUCATIONAL_MODES = {"quiz", "eli5", "flashcard", "tutor"}
+
+
+def compose_user_turn(message: str, context: Optional[str] = None) -> str:
+    """Final user turn: volatile context first, then the user's message"""
+    if not context:
+        return message
+    return f"{context}\n\nUser Query: {message}"
+
+
+def cache_context(context: Optional[str]) -> Optional[str]:
+    """Context as used in response cache keys: the clock rounded down to the hour"""
+    if not context:
+        return context
+    return _CLOCK_MINUTES.sub(r"\1\2", context)
+
+
+class PromptBuilder:
+    """Builds prefix-stable prompts for a chat turn"""
+
+    def __init__(self, max_history: int = 10, history_block: int = 6):
+        self.max_history = max_history
+        self.history_block = history_block
+
+    def system_prompt(self, mode: str = "normal") -> str:
+        """Stable system prompt: persona + mode instructions, nothing that changes per turn"""
+        if mode == "coding":
+            persona = PERSONAS["coding"]
+        elif mode in EDUCATIONAL_MODES:
+            persona = PERSONAS["education"]
+        else:
+            persona = PERSONAS["general"]
+        return f"{persona}\n{MODE_INSTRUCTIONS.get(mode, MODE_INSTRUCTIONS['normal'])}"
+
+    def stable_history(self, history: List[Dict]) -> List[Dict]:
+        """
+        Trim history to at most max_history messages, dropping old messages in
+        whole blocks so the window start (and therefore the prompt prefix) stays
+        the same for several turns instead of sliding every turn.
+        """
+        excess = len(history) - self.max_history
+        if excess <= 0:
+            return history
+        start = -(-excess // self.history_block) * self.history_block
+        return history[start:]
+
+    def context_block(
+        self,
+        current_time: Optional[str] = None,
+        search_results: Optional[str] = None,
+        rag_context: Optional[str] = None
+    ) -> str:
+        """Volatile per-turn context, placed after the history"""
+        sections = []
+        if current_time:
+            sections.append(f"Current time: {current_time}")
+        if search_results:
+            sections.append(f"Web Search Results:\n{search_results}")
+        if rag_context:
+            sections.append(rag_context.strip())
+        return "\n\n".join(sections)
+
+    def build(
+        self,
+        mode: str,
+        history: List[Dict],
+        current_time: Optional[str] = None,
+        search_results: Optional[str] = None,
+        rag_context: Optional[str] = None
+    ) -> Dict:
+        """
+        Assemble a chat turn.
+
+        Returns:
+            Dict with 'system_prompt', 'history' and 'context'; the engine appends
+            'context' and the current message as the final user turn.
+        """
+        return {
+            "system_prompt": self.system_prompt(mode),
+            "history": self.stable_history(history),
+            "context": self.context_block(current_time, search_results, rag_context)
+        }
+
+# Global instance
+prompt_builder = PromptBuilder()
@@ -6,7 +6,7 @@ Gracefully degrades if ML dependencies are missing.
 
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class RAGSystem:
     def __init__(self):
@@ -36,6 +36,12 @@ class RAGSystem:
         except Exception as e:
             print(f"❌ RAG System Error: {e}")
 
+    def embed(self, text: str) -> Optional[List[float]]:
+        """Embed text with the sentence-transformer (None if RAG is disabled)"""
+        if not self.enabled:
+            return None
+        return self.model.encode(text).tolist()
+
     def add_document(self, text: str, metadata: Dict[str, Any] = None) -> str:
         """Add a document to the knowledge base"""
         if not self.enabled:
@@ -60,14 +66,14 @@ class RAGSystem:
             print(f"Error adding document: {e}")
             return "error"
 
-    def search(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Search for relevant documents"""
+    def search(self, query: str, n_results: int = 5, embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Search for relevant documents (pass `embedding` if the query is already embedded)"""
         if not self.enabled:
             return []
             
         try:
             # Generate query embedding
-            query_embedding = self.model.encode(query).tolist()
+            query_embedding = embedding if embedding is not None else self.model.encode(query).tolist()
             
             # Search
             results = self.collection.query(
@@ -90,12 +96,12 @@ class RAGSystem:
             print(f"Error searching documents: {e}")
             return []
 
-    def get_context_for_query(self, query: str, n_results: int = 3) -> str:
+    def get_context_for_query(self, query: str, n_results: int = 3, embedding: Optional[List[float]] = None) -> str:
         """Get formatted context string for LLM prompt"""
         if not self.enabled:
             return ""
             
-        results = self.search(query, n_results)
+        results = self.search(query, n_results, embedding)
         if not results:
             return ""
             
@@ -0,0 +1,80 @@
+"""
+Request Context
+Per-request state shared by the lookups one chat turn or agent task makes:
+the query embedding is computed once, on first use, and reused by memory
+search, RAG retrieval, the semantic response cache and the router.
+Independent lookups run in parallel on a small shared pool.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+_lookup_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LOOKUP_WORKERS", "4")), thread_name_prefix="lookup")
+
+# Process-wide counters (embeddings computed vs. served from a request context)
+_stats = {"embeddings_computed": 0, "embeddings_reused": 0, "embed_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def rag_embed(text: str) -> Optional[List[float]]:
+    """
+    Embed text with the RAG system's sentence-transformer, if it is available
+    (the default embedder here, and the one the response and plan caches use)
+    """
+    from core.rag import rag_system
+    return rag_system.embed(text)
+
+
+class RequestContext:
+    """Lazily computed, shared query embedding for one request"""
+
+    def __init__(self, text: str, embedder: Callable[[str], Optional[List[float]]] = rag_embed):
+        self.text = text
+        self._embedder = embedder
+        self._embedding: Optional[List[float]] = None
+        self._computed = False
+        self._lock = threading.Lock()
+
+    def embedding(self) -> Optional[List[float]]:
+        """The query embedding (None when no embedding model is available)"""
+        with self._lock:
+            if self._computed:
+                with _stats_lock:
+                    _stats["embeddings_reused"] += 1
+                return self._embedding
+            start = time.perf_counter()
+            try:
+                self._embedding = self._embedder(self.text)
+            except Exception as e:
+                print(f"⚠️ Query embedding failed: {e}")
+                self._embedding = None
+            self._computed = True
+            with _stats_lock:
+                _stats["embeddings_computed"] += 1
+                _stats["embed_seconds"] += time.perf_counter() - start
+            return self._embedding
+
+    @staticmethod
+    def parallel(**lookups: Callable[[], Any]) -> Dict[str, Any]:
+        """Run independent lookups concurrently; a failed lookup yields None"""
+        futures = {name: _lookup_pool.submit(fn) for name, fn in lookups.items()}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"⚠️ Lookup {name} failed: {e}")
+                results[name] = None
+        return results
+
+
+def embedding_stats() -> Dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["embeddings_computed"] + stats["embeddings_reused"]
+    stats["reuse_rate"] = round(stats["embeddings_reused"] / total, 3) if total else 0.0
+    stats["embed_seconds"] = round(stats["embed_seconds"], 3)
+    return stats
@@ -0,0 +1,147 @@
+"""
+Response Cache for the Hybrid LLM Engine
+Exact-match tier (TTL + LRU) with an optional semantic tier over recent prompts.
+"""
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+
+def _hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class ResponseCache:
+    """
+    Two-tier response cache.
+    - Exact: keyed by model, system prompt, history hash, message and temperature.
+    - Semantic: cosine similarity of the message embedding against recent prompts
+      that share the same scope (model, temperature, history, namespace).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 3600,
+        semantic_threshold: float = 0.92,
+        semantic_window: int = 256,
+        embedder: Optional[Callable[[str], Optional[List[float]]]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self.embedder = embedder
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, response)
+        self._recent = deque(maxlen=semantic_window)  # (scope, vector, key)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, system_prompt: Optional[str], history: Optional[List[Dict]], message: str, temperature: float) -> str:
+        """Exact-tier key"""
+        history_hash = _hash([(m.get("role"), m.get("content")) for m in history or []])
+        return _hash([model, system_prompt or "", history_hash, message, round(temperature, 3)])
+
+    @staticmethod
+    def make_scope(model: str, history: Optional[List[Dict]], temperature: float, namespace: str) -> str:
+        """Semantic-tier scope: only prompts in the same scope can match each other"""
+        history_hash = _hash([(m.get("role"), m.get("content")) for m in history or []])
+        return _hash([model, history_hash, round(temperature, 3), namespace])
+
+    def _get_live(self, key: str) -> Optional[str]:
+        """Return a non-expired entry and mark it recently used (lock held)"""
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at, response = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _embed(self, message: str, request=None) -> Optional[List[float]]:
+        """Message embedding; a RequestContext for the same text supplies its shared one"""
+        if not self.embedder:
+            return None
+        try:
+            vector = request.embedding() if request is not None and request.text == message else self.embedder(message)
+        except Exception as e:
+            print(f"⚠️ Cache embedding failed: {e}")
+            return None
+        return _normalize(list(vector)) if vector is not None else None
+
+    def get(self, key: str, message: Optional[str] = None, scope: Optional[str] = None, request=None) -> Optional[str]:
+        """
+        Look up a cached response.
+        The semantic tier is consulted only when a scope is given.
+        """
+        with self._lock:
+            response = self._get_live(key)
+            if response is not None:
+                self.exact_hits += 1
+                return response
+            candidates = [(vec, k) for s, vec, k in self._recent if s == scope] if scope else []
+
+        if candidates and message:
+            vector = self._embed(message, request)
+            if vector:
+                best_score, best_key = max(
+                    ((sum(a * b for a, b in zip(vector, vec)), k) for vec, k in candidates),
+                    key=lambda pair: pair[0]
+                )
+                if best_score >= self.semantic_threshold:
+                    with self._lock:
+                        response = self._get_live(best_key)
+                        if response is not None:
+                            self.semantic_hits += 1
+                            return response
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, response: str, message: Optional[str] = None, scope: Optional[str] = None, request=None):
+        """Store a response; also index it for semantic lookups when scoped"""
+        vector = self._embed(message, request) if scope and message else None
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if vector:
+                self._recent.append((scope, vector, key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._recent.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
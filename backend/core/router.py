@@ -0,0 +1,347 @@
+"""
+Query Router
+Decides whether a message goes to the local model or Gemini.
+Combines a lightweight classifier (embedding + logistic regression, trainable
+from logged traffic) with live per-backend latency and queue stats, and
+records every decision.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPLEX_KEYWORDS = [
+    "plan", "strategy", "analyze", "compare", "reason",
+    "design", "architecture", "evaluate", "critique",
+    "complex", "step by step", "explain in detail"
+]
+
+def keyword_is_complex(message: str) -> bool:
+    """Legacy heuristic: long messages or any 'complex' keyword go to the cloud"""
+    if len(message) > 300:
+        return True
+    message_lower = message.lower()
+    return any(kw in message_lower for kw in COMPLEX_KEYWORDS)
+
+
+# ==================== Features ====================
+
+class HashingEmbedder:
+    """
+    Dependency-free sparse features: hashed word unigrams and bigrams plus a few
+    shape features (length, question marks, code-like characters).
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 2048):
+        self.dim = dim
+
+    def __call__(self, text: str, request=None) -> Dict[int, float]:
+        words = re.findall(r"[a-z0-9']+", text.lower())
+        features: Dict[int, float] = {}
+        tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for token in tokens:
+            index = zlib.crc32(token.encode("utf-8")) % self.dim
+            features[index] = features.get(index, 0.0) + 1.0
+        norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+        features = {i: v / norm for i, v in features.items()}
+        # Shape features live past the hashed range
+        features[self.dim] = min(len(text), 4000) / 4000
+        features[self.dim + 1] = min(text.count("\n"), 100) / 100
+        features[self.dim + 2] = min(sum(text.count(c) for c in "{}();=<>"), 200) / 200
+        return features
+
+
+class SentenceEmbedder:
+    """Dense sentence-transformer features from the RAG system (if installed)"""
+
+    name = "sentence-transformer"
+
+    def __call__(self, text: str, request=None) -> Optional[Dict[int, float]]:
+        """Reuses the request's query embedding when one is given"""
+        if request is not None and request.text == text:
+            vector = request.embedding()
+        else:
+            from core.rag import rag_system
+            vector = rag_system.embed(text)
+        if vector is None:
+            return None
+        return dict(enumerate(vector))
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    SentenceEmbedder.name: SentenceEmbedder
+}
+
+
+# ==================== Classifier ====================
+
+class LogisticRegression:
+    """Binary logistic regression over sparse feature dicts, trained with SGD"""
+
+    def __init__(self, weights: Optional[Dict[int, float]] = None, bias: float = 0.0):
+        self.weights = weights or {}
+        self.bias = bias
+
+    def predict_proba(self, x: Dict[int, float]) -> float:
+        z = self.bias + sum(self.weights.get(i, 0.0) * v for i, v in x.items())
+        z = max(-30.0, min(30.0, z))
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def fit(self, X: List[Dict[int, float]], y: List[int], epochs: int = 200, lr: float = 0.5, l2: float = 1e-4):
+        for epoch in range(epochs):
+            step = lr / (1 + epoch * 0.02)
+            for x, label in zip(X, y):
+                error = self.predict_proba(x) - label
+                self.bias -= step * error
+                for i, v in x.items():
+                    w = self.weights.get(i, 0.0)
+                    self.weights[i] = w - step * (error * v + l2 * w)
+        return self
+
+
+class QueryClassifier:
+    """Predicts the probability that a message needs the cloud model"""
+
+    def __init__(self, embedder=None, model: Optional[LogisticRegression] = None):
+        self.embedder = embedder or HashingEmbedder()
+        self.model = model
+
+    @property
+    def trained(self) -> bool:
+        return self.model is not None
+
+    def probability(self, message: str, request=None) -> Optional[float]:
+        if not self.model:
+            return None
+        features = self.embedder(message, request)
+        if features is None:
+            return None
+        return self.model.predict_proba(features)
+
+    def fit(self, samples: List[Tuple[str, int]], **kwargs) -> "QueryClassifier":
+        """Train on (message, label) pairs; label 1 = cloud, 0 = local"""
+        X, y = [], []
+        for text, label in samples:
+            features = self.embedder(text)
+            if features is not None:
+                X.append(features)
+                y.append(int(label))
+        self.model = LogisticRegression().fit(X, y, **kwargs)
+        return self
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "embedder": self.embedder.name,
+                "dim": getattr(self.embedder, "dim", None),
+                "bias": self.model.bias,
+                "weights": {str(i): w for i, w in self.model.weights.items() if abs(w) > 1e-6}
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "QueryClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        embedder_cls = EMBEDDERS[data["embedder"]]
+        embedder = embedder_cls(data["dim"]) if data.get("dim") else embedder_cls()
+        model = LogisticRegression({int(i): w for i, w in data["weights"].items()}, data["bias"])
+        return cls(embedder, model)
+
+
+def load_labeled_log(path: str) -> List[Tuple[str, int]]:
+    """
+    Read labeled routing samples from a JSONL file.
+    Each line needs 'message' and 'label' (1 = cloud, 0 = local); decision log
+    lines without a label are skipped, so a reviewed route log can be used directly.
+    """
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "label" in record and record.get("message"):
+                samples.append((record["message"], int(record["label"])))
+    return samples
+
+
+# ==================== Routers ====================
+
+class KeywordRouter:
+    """Legacy keyword/length heuristic"""
+
+    name = "keyword"
+
+    def probability(self, message: str) -> float:
+        return 0.9 if keyword_is_complex(message) else 0.1
+
+
+class QueryRouter:
+    """
+    Routes messages between 'local' and 'gemini'.
+    The cloud is chosen when P(needs cloud) clears a threshold that rises when
+    Gemini is currently slower than local (latency * queue pressure) and falls
+    when local is backed up.
+    """
+
+    def __init__(
+        self,
+        classifier: Optional[QueryClassifier] = None,
+        threshold: float = 0.5,
+        latency_weight: float = 0.3,
+        latency_scale: float = 5.0,
+        log_path: Optional[str] = None,
+        keep_decisions: int = 200,
+        log_max_bytes: int = 10 * 1024 * 1024
+    ):
+        self.classifier = classifier
+        self.fallback = KeywordRouter()
+        self.threshold = threshold
+        self.latency_weight = latency_weight
+        self.latency_scale = latency_scale
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.decisions = deque(maxlen=keep_decisions)
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return "classifier" if self.classifier and self.classifier.trained else self.fallback.name
+
+    def probability(self, message: str, request=None) -> float:
+        """P(message needs the cloud model)"""
+        if self.classifier:
+            p = self.classifier.probability(message, request)
+            if p is not None:
+                return p
+        return self.fallback.probability(message)
+
+    def is_complex(self, message: str) -> bool:
+        """Latency-independent classification"""
+        return self.probability(message) >= self.threshold
+
+    @staticmethod
+    def _expected_seconds(stats: Optional[Dict]) -> float:
+        """Expected time to serve one more request on a backend"""
+        if not stats:
+            return 0.0
+        latency = stats.get("ewma_latency_ms", 0.0) / 1000
+        pressure = (stats.get("queue_depth", 0) + stats.get("in_flight", 0)) / max(1, stats.get("max_concurrency", 1))
+        return latency * (1 + pressure)
+
+    def effective_threshold(self, backend_stats: Optional[Dict]) -> float:
+        backend_stats = backend_stats or {}
+        delta = self._expected_seconds(backend_stats.get("gemini")) - self._expected_seconds(backend_stats.get("local"))
+        return self.threshold + self.latency_weight * math.tanh(delta / self.latency_scale)
+
+    def decide(
+        self,
+        message: str,
+        force_local: bool = False,
+        cloud_available: bool = True,
+        backend_stats: Optional[Dict] = None,
+        request=None
+    ) -> Dict:
+        """Pick a backend and record why (`request` is the message's RequestContext)"""
+        if force_local or not cloud_available:
+            decision = {
+                "backend": "local",
+                "reason": "forced local" if force_local else "cloud unavailable",
+                "p_complex": None,
+                "threshold": None
+            }
+        else:
+            p = self.probability(message, request)
+            threshold = self.effective_threshold(backend_stats)
+            backend = "gemini" if p >= threshold else "local"
+            decision = {
+                "backend": backend,
+                "reason": f"{self.name} p={p:.2f} {'>=' if backend == 'gemini' else '<'} threshold {threshold:.2f}",
+                "p_complex": round(p, 4),
+                "threshold": round(threshold, 4)
+            }
+
+        decision["router"] = self.name
+        decision["time"] = datetime.now().isoformat()
+        self._record(decision, message)
+        return decision
+
+    def _record(self, decision: Dict, message: str):
+        with self._lock:
+            self.decisions.append(decision)
+            if not self.log_path:
+                return
+            try:
+                # Keep one rotated file: route_log.jsonl -> route_log.jsonl.1
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                if self.log_max_bytes and os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= self.log_max_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({**decision, "message": message[:2000]}, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"⚠️ Failed to log route decision: {e}")
+
+    def recent_decisions(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.decisions)[-limit:]
+
+
+def _backend_path(path: str) -> str:
+    """
+    Resolve a relative path against the backend directory rather than the cwd
+    (a leading "backend/", as in the other data paths, is accepted)
+    """
+    if os.path.isabs(path):
+        return path
+    parts = os.path.normpath(path).split(os.sep)
+    if parts[0] == "backend":
+        parts = parts[1:]
+    return os.path.join(BACKEND_DIR, *parts)
+
+
+def create_router() -> QueryRouter:
+    """Build the router from environment configuration"""
+    classifier = None
+    model_path = os.getenv("ROUTER_MODEL_PATH", "backend/data/router_model.json")
+    if os.getenv("LLM_ROUTER", "classifier") == "classifier" and os.path.exists(model_path):
+        try:
+            classifier = QueryClassifier.load(model_path)
+            print(f"✅ Router classifier loaded: {model_path}")
+        except Exception as e:
+            print(f"⚠️ Router classifier failed to load, using keywords: {e}")
+
+    return QueryRouter(
+        classifier=classifier,
+        threshold=float(os.getenv("ROUTER_THRESHOLD", "0.5")),
+        latency_weight=float(os.getenv("ROUTER_LATENCY_WEIGHT", "0.3")),
+        # Logging raw messages (training data for the classifier) is opt-in
+        log_path=_backend_path(os.getenv("ROUTER_LOG_PATH")) if os.getenv("ROUTER_LOG_PATH") else None,
+        log_max_bytes=int(float(os.getenv("ROUTER_LOG_MAX_MB", "10")) * 1024 * 1024)
+    )
+
+
+if __name__ == "__main__":
+    # Train from labeled traffic: python -m core.router <labeled.jsonl> [model.json] [embedder]
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python -m core.router <labeled.jsonl> [model.json] [hashing|sentence-transformer]")
+        sys.exit(1)
+    samples = load_labeled_log(sys.argv[1])
+    out_path = sys.argv[2] if len(sys.argv) > 2 else "backend/data/router_model.json"
+    embedder = EMBEDDERS[sys.argv[3] if len(sys.argv) > 3 else "hashing"]()
+    classifier = QueryClassifier(embedder).fit(samples)
+    correct = sum((classifier.probability(m) >= 0.5) == bool(label) for m, label in samples)
+    classifier.save(out_path)
+    print(f"✅ Trained on {len(samples)} samples (train accuracy {correct / max(1, len(samples)):.2%}) -> {out_path}")
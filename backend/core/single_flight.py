@@ -0,0 +1,211 @@
+"""
+Single-flight Request Coalescing
+Concurrent identical LLM requests share one in-flight generation; streamed
+tokens are fanned out to every waiter (late joiners replay from the start).
+"""
+
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def normalize(text: Optional[str]) -> str:
+    """Collapse whitespace so trivially different retries coalesce"""
+    return " ".join((text or "").split())
+
+
+def request_key(
+    message: str,
+    system_prompt: Optional[str],
+    history: Optional[List[Dict]],
+    **params
+) -> str:
+    """Key over the normalized full prompt and generation parameters"""
+    payload = [
+        normalize(system_prompt),
+        [(m.get("role"), normalize(m.get("content"))) for m in history or []],
+        normalize(message),
+        sorted(params.items())
+    ]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class FlightCancelled(Exception):
+    """The shared generation was stopped because every subscriber left"""
+
+
+class _Flight:
+    """Shared state of one in-flight generation"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.cancelled = False
+        self.cond = threading.Condition()
+
+    def finish(self, chunks: Optional[List[str]] = None, error: Optional[BaseException] = None):
+        with self.cond:
+            if chunks:
+                self.chunks.extend(chunks)
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent requests by key"""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """Find or start the flight for a key; a joiner is subscribed before this returns"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight:
+                with flight.cond:
+                    joined = not flight.cancelled
+                    if joined:
+                        flight.subscribers += 1
+                if joined:
+                    self.coalesced += 1
+                    return flight, False
+            flight = _Flight(key)
+            self._flights[key] = flight
+            self.leaders += 1
+            return flight, True
+
+    def _forget(self, key: str, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def run(self, key: str, fn: Callable[[], str]) -> str:
+        """Non-streaming call: the first caller generates, the rest wait for its result"""
+        flight, leader = self._join(key)
+        if not leader:
+            return "".join(_Subscription(self, flight))
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.finish(error=e)
+            raise
+        finally:
+            self._forget(key, flight)
+        flight.finish(chunks=[result])
+        return result
+
+    def stream(self, key: str, factory: Callable[[], Iterator]) -> "_Subscription":
+        """
+        Streaming call: the first caller opens the stream (so admission errors
+        surface immediately) and a pump thread fans its chunks out to all waiters.
+        Each caller counts as a subscriber from this call, before its first read.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            with flight.cond:
+                flight.subscribers += 1
+            try:
+                source = factory()
+            except BaseException as e:
+                flight.finish(error=e)
+                self._forget(key, flight)
+                raise
+            threading.Thread(target=self._pump, args=(key, flight, source), daemon=True).start()
+        return _Subscription(self, flight)
+
+    def _pump(self, key: str, flight: _Flight, source: Iterator):
+        error = None
+        try:
+            for chunk in source:
+                with flight.cond:
+                    if flight.cancelled:
+                        # Anyone who joined after the last subscriber left must not
+                        # mistake the partial output for a complete answer
+                        error = FlightCancelled("generation cancelled: all subscribers left")
+                        break
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            error = e
+        finally:
+            close = getattr(source, "close", None)
+            if close:
+                close()
+            self._forget(key, flight)
+            flight.finish(error=error)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self._flights),
+                "generations": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_rate": round(self.coalesced / total, 3) if total else 0.0
+            }
+
+
+class _Subscription:
+    """
+    One (already counted) subscriber's view of a flight. Callers subscribe when
+    they join rather than on their first read, so a joiner whose response hasn't
+    started streaming yet still keeps the generation alive when the others leave.
+    """
+
+    def __init__(self, flights: SingleFlight, flight: _Flight):
+        self._flights = flights
+        self._flight = flight
+        self._index = 0
+        self._left = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        flight = self._flight
+        try:
+            with flight.cond:
+                if self._left:
+                    raise StopIteration
+                if flight.cancelled and not flight.done:
+                    raise FlightCancelled("generation cancelled: all subscribers left")
+                while self._index >= len(flight.chunks) and not flight.done:
+                    flight.cond.wait()
+                if self._index < len(flight.chunks):
+                    chunk = flight.chunks[self._index]
+                    self._index += 1
+                    return chunk
+                if flight.error:
+                    raise flight.error
+                raise StopIteration
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        flight = self._flight
+        with flight.cond:
+            if self._left:
+                return
+            self._left = True
+            flight.subscribers -= 1
+            # Everyone hung up: stop generating for nobody
+            cancelled = flight.subscribers == 0 and not flight.done
+            if cancelled:
+                flight.cancelled = True
+        if cancelled:
+            # New identical requests start a fresh generation instead of joining this one
+            self._flights._forget(flight.key, flight)
+
+    def __del__(self):
+        self.close()
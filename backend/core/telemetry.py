@@ -0,0 +1,204 @@
+"""
+LLM Performance Telemetry
+Per-call records (TTFT, prompt/completion tokens, prompt-eval time, decode
+speed, backend, route reason) aggregated into histograms and rendered in the
+Prometheus text exposition format for /metrics.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160)
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in pairs]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["counts"][i] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series["counts"]):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(key, le)} {series['count']}")
+            lines.append(f"{self.name}_sum{_labels(key)} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {series['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+def render_gauges(name: str, help_text: str, values: Dict[str, float], label: str = "backend", kind: str = "gauge") -> List[str]:
+    """Render a one-label gauge (or counter) family from a {label_value: value} dict"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for label_value, value in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{label_value}"}} {value}')
+    return lines
+
+
+class LLMTelemetry:
+    """Collects one record per backend call and aggregates it"""
+
+    def __init__(self, keep_records: int = 200):
+        self.records = deque(maxlen=keep_records)
+        self._lock = threading.Lock()
+        self.requests = Counter("llm_requests_total", "LLM backend calls by outcome")
+        self.routes = Counter("llm_route_decisions_total", "Routing decisions by backend and router")
+        self.histograms = {
+            "ttft_s": Histogram("llm_ttft_seconds", "Time to first token", SECONDS_BUCKETS),
+            "duration_s": Histogram("llm_request_duration_seconds", "Backend call duration", SECONDS_BUCKETS),
+            "queue_s": Histogram("llm_queue_wait_seconds", "Wait for an admission slot", SECONDS_BUCKETS),
+            "prompt_eval_s": Histogram("llm_prompt_eval_seconds", "Prompt evaluation time reported by the backend", SECONDS_BUCKETS),
+            "prompt_tokens": Histogram("llm_prompt_tokens", "Prompt tokens evaluated per call", TOKEN_BUCKETS),
+            "completion_tokens": Histogram("llm_completion_tokens", "Completion tokens generated per call", TOKEN_BUCKETS),
+            "decode_tps": Histogram("llm_decode_tokens_per_second", "Decode speed", RATE_BUCKETS),
+        }
+
+    def start(self, backend: str, model: str, route_reason: str, stream: bool) -> Dict:
+        """Open a call record; generation code fills in token counts"""
+        return {
+            "time": datetime.now().isoformat(),
+            "backend": backend,
+            "model": model,
+            "route_reason": route_reason,
+            "stream": stream,
+            "_start": time.monotonic(),
+            "queue_ms": None,
+            "ttft_ms": None,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "prompt_eval_ms": None,
+            "decode_ms": None,
+            "decode_tps": None,
+            "duration_ms": None,
+            "outcome": None
+        }
+
+    @staticmethod
+    def mark_admitted(record: Dict):
+        """Time spent waiting for an admission slot (TTFT and duration include it)"""
+        record["queue_ms"] = round(1000 * (time.monotonic() - record["_start"]), 1)
+
+    @staticmethod
+    def mark_first_token(record: Dict):
+        if record["ttft_ms"] is None:
+            record["ttft_ms"] = round(1000 * (time.monotonic() - record["_start"]), 1)
+
+    @staticmethod
+    def fill_ollama(record: Dict, response):
+        """Copy Ollama's timing stats (final response / last stream chunk) into a record"""
+        get = response.get
+        record["prompt_tokens"] = get("prompt_eval_count")
+        record["completion_tokens"] = get("eval_count")
+        if get("prompt_eval_duration") is not None:
+            record["prompt_eval_ms"] = round(get("prompt_eval_duration") / 1e6, 1)
+        if get("eval_duration"):
+            record["decode_ms"] = round(get("eval_duration") / 1e6, 1)
+        if record["ttft_ms"] is None and not record["stream"]:
+            # Not observable without streaming; queue wait + model load + prompt eval precede the first token
+            server_ttft = (get("load_duration") or 0) + (get("prompt_eval_duration") or 0)
+            if server_ttft:
+                record["ttft_ms"] = round((record["queue_ms"] or 0) + server_ttft / 1e6, 1)
+
+    @staticmethod
+    def fill_gemini(record: Dict, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            record["prompt_tokens"] = getattr(usage, "prompt_token_count", None)
+            record["completion_tokens"] = getattr(usage, "candidates_token_count", None)
+
+    def finish(self, record: Dict, outcome: str = "ok"):
+        """Close a call record and aggregate it"""
+        if record["outcome"] is not None:
+            return
+        record["outcome"] = outcome
+        duration_s = time.monotonic() - record.pop("_start")
+        record["duration_ms"] = round(1000 * duration_s, 1)
+
+        if record["completion_tokens"]:
+            decode_ms = record["decode_ms"]
+            if not decode_ms:
+                decode_ms = record["duration_ms"] - (record["ttft_ms"] or 0)
+            if decode_ms > 0:
+                record["decode_tps"] = round(record["completion_tokens"] / (decode_ms / 1000), 2)
+
+        backend = record["backend"]
+        with self._lock:
+            self.records.append(record)
+            self.requests.inc(backend=backend, outcome=outcome)
+            if outcome != "ok":
+                return
+            h = self.histograms
+            h["duration_s"].observe(duration_s, backend=backend)
+            if record["queue_ms"] is not None:
+                h["queue_s"].observe(record["queue_ms"] / 1000, backend=backend)
+            if record["ttft_ms"] is not None:
+                h["ttft_s"].observe(record["ttft_ms"] / 1000, backend=backend)
+            if record["prompt_eval_ms"] is not None:
+                h["prompt_eval_s"].observe(record["prompt_eval_ms"] / 1000, backend=backend)
+            if record["prompt_tokens"] is not None:
+                h["prompt_tokens"].observe(record["prompt_tokens"], backend=backend)
+            if record["completion_tokens"] is not None:
+                h["completion_tokens"].observe(record["completion_tokens"], backend=backend)
+            if record["decode_tps"] is not None:
+                h["decode_tps"].observe(record["decode_tps"], backend=backend)
+
+    def record_route(self, decision: Dict):
+        with self._lock:
+            self.routes.inc(backend=decision["backend"], router=decision.get("router", "unknown"))
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            return list(self.records)[-limit:]
+
+    def render(self, extra_lines: Optional[List[str]] = None) -> str:
+        """Prometheus text exposition"""
+        with self._lock:
+            lines = self.requests.render() + self.routes.render()
+            for histogram in self.histograms.values():
+                lines += histogram.render()
+        lines += extra_lines or []
+        return "\n".join(lines) + "\n"
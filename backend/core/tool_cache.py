@@ -0,0 +1,97 @@
+"""
+Agent Tool Result Cache
+TTL + LRU cache for idempotent tool calls (searches, scrapes, calculations),
+shared within and across agent runs. Side-effecting tools are never cached.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Tools whose calls change the world; a cached "success" would skip the action
+NEVER_CACHE = {"send_email", "send_whatsapp", "open_app", "type_text", "write_file", "remember", "execute_code"}
+
+
+def normalize_input(tool: str, tool_input: str) -> str:
+    """Cache key normalization: whitespace always, case for queries, spacing for math"""
+    text = " ".join(tool_input.split())
+    if tool == "calculator":
+        return text.replace(" ", "")
+    if tool == "scrape_webpage":
+        return text.rstrip("/")
+    if tool in ("web_search", "search_news"):
+        return text.lower().strip(" ?.!")
+    return text
+
+
+def is_cacheable_output(output: str) -> bool:
+    """Failed calls are retried next time rather than cached"""
+    head = output.lstrip()[:40].lower()
+    return not (head.startswith("error") or head.startswith("❌") or "timed out" in head)
+
+
+class ToolResultCache:
+    """Per-tool TTL results with an LRU bound on entries and total characters"""
+
+    def __init__(self, max_entries: int = 256, max_chars: int = 2_000_000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, Optional[float]]]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, tool: str, tool_input: str) -> Optional[str]:
+        key = (tool, normalize_input(tool, tool_input))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (entry[1] is None or entry[1] > time.time()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, tool: str, tool_input: str, output: str, ttl: Optional[float]):
+        """Store a result; ttl=None keeps it until evicted"""
+        if tool in NEVER_CACHE or not is_cacheable_output(output) or len(output) > self.max_chars:
+            return
+        key = (tool, normalize_input(tool, tool_input))
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (output, expires)
+            self._chars += len(output)
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        """Drop an entry (lock held)"""
+        output, _ = self._entries.pop(key)
+        self._chars -= len(output)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "chars": self._chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
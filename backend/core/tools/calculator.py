@@ -1,10 +1,80 @@
 """
 Calculator Tool for Mathematical Computations
+Expressions are parsed once into a whitelisted AST, compiled, and cached by
+their text. "EXPR for x in A..B" evaluates over a whole range in one shot,
+vectorized with NumPy when it is installed.
 """
 
+import ast
 import math
 import operator
-from typing import Union
+import os
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_RESULT_BITS = 100000  # Larger integer powers would stall the server
+RANGE_PATTERN = re.compile(
+    r"^\s*(?:(sum|mean|min|max|prod)\s+(?:of\s+)?)?(.+?)\s+for\s+([a-z_]\w*)\s+in\s+(.+?)\s*\.\.\s*(.+?)(?:\s+step\s+(.+?))?\s*$",
+    re.IGNORECASE
+)
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub
+)
+
+
+def _safe_pow(base, exponent):
+    """Exact integer powers are bounded by the size of their result (float powers overflow fast)"""
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent > MAX_RESULT_BITS or exponent * math.log2(abs(base)) > MAX_RESULT_BITS:
+            raise ValueError(f"result too large (max {MAX_RESULT_BITS} bits)")
+    return operator.pow(base, exponent)
+
+
+def _format_number(value) -> str:
+    """Integers past Python's int-to-str digit limit (4300 by default) are shown in scientific notation"""
+    try:
+        return str(value)
+    except ValueError:
+        return f"{Decimal(value):.15e}"
+
+
+def _vector_pow(base, exponent):
+    """Integer powers stay exact unless they could overflow int64 (compared in log space)"""
+    if np.issubdtype(np.result_type(base, exponent), np.integer):
+        largest = float(np.max(np.abs(base))) if np.size(base) else 0.0
+        if np.min(exponent) >= 0 and (largest <= 1 or float(np.max(exponent)) * math.log2(largest) < 62):
+            return np.power(base, exponent)
+    return np.float_power(base, exponent)
+
+
+def _vector_reduce(aggregate: str, values):
+    """Aggregate an array; integer sums and products that could overflow int64 use floats"""
+    if aggregate in ("sum", "prod") and np.issubdtype(values.dtype, np.integer) and values.size:
+        largest = float(np.max(np.abs(values)))
+        bits = math.log2(largest * values.size) if aggregate == "sum" else values.size * math.log2(max(largest, 1.0))
+        if largest and bits >= 62:
+            values = values.astype(np.float64)
+    return {"sum": np.sum, "mean": np.mean, "min": np.min, "max": np.max, "prod": np.prod}[aggregate](values)
+
+
+class _PowRewriter(ast.NodeTransformer):
+    """a ** b -> _pow(a, b), so scalar and vector modes can guard it differently"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(ast.Name("_pow", ast.Load()), [node.left, node.right], []), node)
+        return node
+
 
 class Calculator:
     """Safe calculator for mathematical operations"""
@@ -40,38 +110,120 @@ class Calculator:
         'e': math.e,
     }
     
+    # Largest range evaluated in one call
+    max_points = int(os.getenv("CALC_MAX_POINTS", "1000000" if np is not None else "100000"))
+    
+    @staticmethod
+    @lru_cache(maxsize=int(os.getenv("CALC_CACHE_SIZE", "512")))
+    def compile_expression(expression: str, variable: str = "") -> Any:
+        """
+        Validate an expression against the whitelist and compile it (cached by text).
+        `variable` is an extra name allowed in range mode. Raises ValueError.
+        """
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"invalid expression ({e.msg})")
+        allowed = set(Calculator.functions) | set(Calculator.constants) | ({variable} if variable else set())
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"unsupported syntax: {type(node).__name__}")
+            if isinstance(node, ast.Name) and node.id not in allowed:
+                raise ValueError(f"unknown name '{node.id}'")
+            if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in Calculator.functions or node.keywords):
+                raise ValueError("only plain calls to the math functions are allowed")
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError("only numeric constants are allowed")
+        tree = ast.fix_missing_locations(_PowRewriter().visit(tree))
+        return compile(tree, "<calculator>", "eval")
+
+    @staticmethod
+    def evaluate(expression: str, **variables) -> Union[int, float]:
+        """Evaluate a (cached) compiled expression"""
+        code = Calculator.compile_expression(expression, next(iter(variables), ""))
+        return eval(code, {"__builtins__": {}}, {**Calculator.functions, **Calculator.constants, "_pow": _safe_pow, **variables})
+
     @staticmethod
     def calculate(expression: str) -> str:
         """
         Safely evaluate mathematical expression
         
         Args:
-            expression: Mathematical expression as string
+            expression: Mathematical expression, or "[sum|mean|min|max|prod] EXPR for x in A..B [step S]"
         
         Returns:
             Result or error message
         """
         try:
-            # Simple eval with restricted namespace for safety
-            allowed_names = {
-                **Calculator.functions,
-                **Calculator.constants,
-            }
-            
-            # Remove any potentially dangerous operations
-            forbidden = ['import', '__', 'exec', 'eval', 'compile', 'open', 'file']
-            for word in forbidden:
-                if word in expression.lower():
-                    return f"❌ Forbidden operation detected: {word}"
-            
-            result = eval(expression, {"__builtins__": {}}, allowed_names)
-            return f"✅ Result: {result}"
+            match = RANGE_PATTERN.match(expression)
+            if match:
+                return Calculator.evaluate_range(*match.groups())
+            result = Calculator.evaluate(expression)
+            return f"✅ Result: {_format_number(result)}"
         
         except ZeroDivisionError:
             return "❌ Error: Division by zero"
         except Exception as e:
             return f"❌ Calculation error: {str(e)}"
     
+    @staticmethod
+    def evaluate_range(aggregate: str, expression: str, variable: str, start: str, stop: str, step: str = None) -> str:
+        """Evaluate an expression for every value of an inclusive range"""
+        start_value, stop_value = Calculator.evaluate(start), Calculator.evaluate(stop)
+        step_value = Calculator.evaluate(step) if step else (1 if stop_value >= start_value else -1)
+        if step_value == 0 or (stop_value - start_value) * step_value < 0:
+            raise ValueError("empty range")
+        count = int(math.floor((stop_value - start_value) / step_value + 1e-9)) + 1
+        if count > Calculator.max_points:
+            raise ValueError(f"range too large ({count:,} points, max {Calculator.max_points:,})")
+        
+        code = Calculator.compile_expression(expression, variable)
+        integral = all(float(v).is_integer() for v in (start_value, step_value))
+        if np is not None:
+            xs = start_value + step_value * np.arange(count, dtype=np.int64 if integral else np.float64)
+            namespace = {**Calculator.vector_functions(), **Calculator.constants, "_pow": _vector_pow, variable: xs}
+            # Overflow and invalid results show up as inf / nan; NumPy's integer division
+            # by zero would silently give 0, so it raises like scalar mode does
+            try:
+                with np.errstate(divide="raise", over="ignore", under="ignore", invalid="ignore"):
+                    ys = eval(code, {"__builtins__": {}}, namespace)
+                    ys = np.broadcast_to(ys, xs.shape)
+                    if aggregate:
+                        return f"✅ Result: {_vector_reduce(aggregate.lower(), ys).item()}"
+            except FloatingPointError:
+                raise ZeroDivisionError()
+            xs, ys = xs.tolist(), ys.tolist()
+        else:
+            xs = [start_value + step_value * i if not integral else int(start_value + step_value * i) for i in range(count)]
+            namespace = {**Calculator.functions, **Calculator.constants, "_pow": _safe_pow}
+            ys = [eval(code, {"__builtins__": {}}, {**namespace, variable: x}) for x in xs]
+            if aggregate:
+                reducer = {"sum": sum, "mean": lambda v: sum(v) / len(v), "min": min, "max": max, "prod": math.prod}[aggregate.lower()]
+                return f"✅ Result: {_format_number(reducer(ys))}"
+        return Calculator.format_table(expression, variable, xs, ys)
+    
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def vector_functions() -> Dict[str, Callable]:
+        """NumPy equivalents of the allowed functions"""
+        return {
+            'sqrt': np.sqrt, 'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+            'log': np.log, 'log10': np.log10, 'exp': np.exp, 'abs': np.abs,
+            'round': np.round, 'floor': np.floor, 'ceil': np.ceil,
+        }
+    
+    @staticmethod
+    def format_table(expression: str, variable: str, xs: list, ys: list, head: int = 10, tail: int = 5) -> str:
+        """Range results as a table (long ranges show the ends plus a summary)"""
+        rows = list(zip(xs, ys))
+        shown = rows if len(rows) <= head + tail else rows[:head] + [None] + rows[-tail:]
+        lines = [f"✅ {expression} for {variable} = {xs[0]}..{xs[-1]} ({len(rows)} values)"]
+        lines += ["  ..." if row is None else f"  {row[0]} -> {_format_number(row[1])}" for row in shown]
+        finite = [y for y in ys if isinstance(y, int) or (isinstance(y, float) and math.isfinite(y))]
+        if len(rows) > head + tail and finite:
+            lines.append(f"Sum: {_format_number(sum(finite))}  Min: {_format_number(min(finite))}  Max: {_format_number(max(finite))}")
+        return "\n".join(lines)
+    
     @staticmethod
     def solve_percentage(value: float, percentage: float) -> str:
         """Calculate percentage of a value"""
@@ -1,31 +1,29 @@
 """
 Code Executor Tool with Sandboxing
-Safely executes Python code in a restricted environment
+Executes Python code in a pool of restricted worker processes (see sandbox.py)
 """
 
-import sys
-import io
-import traceback
-from contextlib import redirect_stdout, redirect_stderr
-from typing import Dict, Any
-import os
+from typing import Callable, Dict, Any, Optional
+from core.tools.sandbox import SandboxPool, create_sandbox_pool
 
 class CodeExecutor:
     """Safe Python code executor"""
     
-    def __init__(self):
-        self.timeout = 5  # 5 seconds timeout
-        self.max_output_length = 5000  # 5KB max output
+    def __init__(self, pool: Optional[SandboxPool] = None):
+        self.pool = pool or create_sandbox_pool()
+        self.timeout = self.pool.timeout
+        self.max_output_length = self.pool.max_output_bytes
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_output: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
         """
         Execute Python code safely
         
         Args:
             code: Python code to execute
+            on_output: Optional callback receiving output as it is printed
         
         Returns:
-            Dict with success status, output, and errors
+            Dict with success status, output, errors, timed_out and duration_ms
         """
         # Security checks
         forbidden_imports = [
@@ -43,70 +41,11 @@ class CodeExecutor:
                     "error": f"❌ Forbidden operation detected: '{forbidden}' is not allowed for security reasons."
                 }
         
-        # Capture output
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
-        
-        # Restricted globals (only safe built-ins)
-        safe_builtins = {
-            'print': print,
-            'range': range,
-            'len': len,
-            'str': str,
-            'int': int,
-            'float': float,
-            'bool': bool,
-            'list': list,
-            'dict': dict,
-            'set': set,
-            'tuple': tuple,
-            'sum': sum,
-            'min': min,
-            'max': max,
-            'abs': abs,
-            'round': round,
-            'sorted': sorted,
-            'enumerate': enumerate,
-            'zip': zip,
-            'map': map,
-            'filter': filter,
-        }
-        
-        globals_dict = {"__builtins__": safe_builtins}
-        locals_dict = {}
-        
-        try:
-            # Execute code with output capture
-            with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-                exec(code, globals_dict, locals_dict)
-            
-            output = stdout_capture.getvalue()
-            errors = stderr_capture.getvalue()
-            
-            # Limit output length
-            if len(output) > self.max_output_length:
-                output = output[:self.max_output_length] + "\n... (output truncated)"
-            
-            if errors:
-                return {
-                    "success": False,
-                    "output": output,
-                    "error": errors
-                }
-            
-            return {
-                "success": True,
-                "output": output or "✅ Code executed successfully (no output)",
-                "error": None
-            }
-        
-        except Exception as e:
-            error_msg = traceback.format_exc()
-            return {
-                "success": False,
-                "output": stdout_capture.getvalue(),
-                "error": f"❌ Execution Error:\n{error_msg}"
-            }
+        # Runs in a warm worker process with wall-clock, CPU, memory and output limits
+        result = self.pool.run(code, on_output)
+        if result["success"] and not result["output"]:
+            result["output"] = "✅ Code executed successfully (no output)"
+        return result
     
     def format_result(self, result: Dict[str, Any]) -> str:
         """Format execution result for display"""
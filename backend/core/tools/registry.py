@@ -0,0 +1,212 @@
+"""
+Lazy Tool Registry
+Agent tools declare their metadata up front (description, timeout, caching,
+required packages) and point at their implementation as "module:attribute".
+The implementation is imported on the first call, so loading the agent does
+not pull in duckduckgo_search, bs4, pyautogui or pywhatkit. Tools whose
+requirements are missing are left out of the agent's prompt.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from core.fakes import fake_backends_enabled
+
+
+def _installed(package: str) -> bool:
+    """Whether a package can be imported, without importing it"""
+    if package in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(package) is not None
+    except (ImportError, ValueError):
+        return False
+
+def _list_files(directory: str) -> str:
+    from core.tools.file_manager import file_manager
+    return str(file_manager.list_files(directory if directory else "."))
+
+def _write_file(input_str: str) -> str:
+    """write_file input is 'filename||content'"""
+    from core.tools.file_manager import file_manager
+    if "||" not in input_str:
+        return "Error: Input must be 'filename||content'"
+    path, content = input_str.split("||", 1)
+    return file_manager.write_file(path, content)
+
+def _current_time(_: str) -> str:
+    from core.tools.web_search import get_current_time
+    return get_current_time()
+
+
+class ToolRegistry:
+    """Tool declarations with on-demand imports"""
+
+    def __init__(self):
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._funcs: Dict[str, Callable[[str], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        desc: str,
+        target: Union[str, Callable[[str], Any]],
+        method: Optional[str] = None,
+        args: Tuple = (),
+        requires: Tuple[str, ...] = (),
+        env: Tuple[str, ...] = (),
+        fake_ok: bool = False,
+        **meta
+    ):
+        """
+        Declare a tool. `target` is a callable or "module:attr"; a class target is
+        instantiated once (shared by every tool using it) and `method` is called on
+        it with `args` before the tool input. `requires` lists importable packages
+        and `env` environment variables the tool needs; with fake_ok the offline
+        stand-ins (JARVIS_FAKE_BACKENDS) make the packages unnecessary. Any other
+        keyword (timeout, parallel, cache_ttl) is agent metadata.
+        """
+        self._specs[name] = {
+            "desc": desc, "target": target, "method": method, "args": args,
+            "requires": requires, "env": env, "fake_ok": fake_ok, "meta": meta
+        }
+
+    def missing(self, name: str) -> List[str]:
+        """Unmet requirements of a tool (checked without importing anything)"""
+        spec = self._specs[name]
+        missing = [var for var in spec["env"] if not os.getenv(var)]
+        if not (spec["fake_ok"] and fake_backends_enabled()):
+            missing += [pkg for pkg in spec["requires"] if not _installed(pkg)]
+        return missing
+
+    def tools(self) -> Dict[str, Dict[str, Any]]:
+        """Available tools in the agent's format: desc, func and metadata"""
+        tools = {}
+        for name, spec in self._specs.items():
+            missing = self.missing(name)
+            if missing:
+                if name not in self._reported:
+                    print(f"⚠️ Tool {name} unavailable (missing {', '.join(missing)})")
+                    self._reported.add(name)
+                continue
+            tools[name] = {"desc": spec["desc"], "func": self._lazy(name), **spec["meta"]}
+        return tools
+
+    def _lazy(self, name: str) -> Callable[[str], Any]:
+        def call(tool_input: str):
+            return self.resolve(name)(tool_input)
+        return call
+
+    def resolve(self, name: str) -> Callable[[str], Any]:
+        """The tool's implementation, imported on first use"""
+        func = self._funcs.get(name)
+        if func:
+            return func
+        spec = self._specs[name]
+        with self._lock:
+            target = spec["target"]
+            if isinstance(target, str):
+                obj = self._instances.get(target)
+                if obj is None:
+                    module, _, attr = target.partition(":")
+                    obj = importlib.import_module(module)
+                    for part in attr.split("."):
+                        obj = getattr(obj, part)
+                    if isinstance(obj, type):
+                        obj = obj()
+                    self._instances[target] = obj
+            else:
+                obj = target
+            if spec["method"]:
+                method, bound = getattr(obj, spec["method"]), spec["args"]
+                func = lambda tool_input: method(*bound, tool_input)
+            else:
+                func = obj
+            self._funcs[name] = func
+        return func
+
+    def load_all(self) -> Dict[str, str]:
+        """Import every available tool now (warm-up / measuring); returns failures"""
+        failures = {}
+        for name in self.tools():
+            try:
+                self.resolve(name)
+            except Exception as e:
+                failures[name] = str(e)
+        return failures
+
+    def loaded(self) -> List[str]:
+        """Tools whose implementation has been imported"""
+        return list(self._funcs)
+
+
+def create_tool_registry() -> ToolRegistry:
+    registry = ToolRegistry()
+    registry.register(
+        "web_search", "Search the internet for real-time information, news, and facts.",
+        "core.tools.web_search:search_web", requires=("duckduckgo_search",), fake_ok=True, timeout=15, cache_ttl=600
+    )
+    registry.register(
+        "search_news", "Search recent news articles. Input: news topic.",
+        "core.tools.web_search:search_news", requires=("duckduckgo_search",), fake_ok=True, timeout=15, cache_ttl=600
+    )
+    registry.register(
+        "scrape_webpage", "Read the text content of a webpage. Input: URL.",
+        "core.tools.web_search:scrape_webpage", requires=("requests", "bs4"), fake_ok=True, timeout=20, cache_ttl=3600
+    )
+    registry.register(
+        "calculator", "Perform mathematical calculations. Input: math expression string, or 'EXPR for x in A..B' for a table over a range (prefix sum/mean/min/max/prod to aggregate).",
+        "core.tools.calculator:calculate", timeout=5, cache_ttl=None
+    )
+    registry.register(
+        "execute_code", "Execute Python code in a secure sandbox. Input: valid python code.",
+        "core.tools.code_executor:execute_code", timeout=15
+    )
+    registry.register(
+        "read_file", "Read contents of a file. Input: filename.",
+        "core.tools.file_manager:file_manager.read_file"
+    )
+    registry.register(
+        "list_files", "List files in directory. Input: directory path (or empty for root).",
+        _list_files
+    )
+    registry.register(
+        "write_file", "Write content to a file. Input format: 'filename||content'",
+        _write_file, parallel=False
+    )
+    registry.register(
+        "get_time", "Get current date and time.",
+        _current_time, cache_ttl=5
+    )
+    registry.register(
+        "open_app", "Open a desktop application. Input: app name (e.g., 'spotify', 'notepad').",
+        "core.tools.automation:AutomationTools", method="execute", args=("open_app",), parallel=False
+    )
+    registry.register(
+        "type_text", "Type text on the keyboard. Input: text to type.",
+        "core.tools.automation:AutomationTools", method="execute", args=("type_text",), requires=("pyautogui",), parallel=False
+    )
+    registry.register(
+        "send_email", "Send an email. Input format: 'to_email|subject|body'",
+        "core.tools.communication:CommunicationTools", method="execute", args=("send_email",), env=("EMAIL_USER", "EMAIL_PASS"), parallel=False
+    )
+    registry.register(
+        "send_whatsapp", "Send a WhatsApp message. Input format: 'phone_number|message'",
+        "core.tools.communication:CommunicationTools", method="execute", args=("send_whatsapp",), requires=("pywhatkit",), parallel=False
+    )
+    registry.register(
+        "remember", "Store a fact or memory for the future. Input: text to remember.",
+        "core.memory:memory_manager.store_long_term_memory"
+    )
+    return registry
+
+
+# Global instance
+tool_registry = create_tool_registry()
@@ -0,0 +1,260 @@
+"""
+Sandbox Process Pool
+Runs untrusted Python in pre-started worker processes (sandbox_worker.py)
+instead of the server process. Each job gets a wall-clock timeout enforced
+here and a CPU-time limit enforced by the kernel (RLIMIT_CPU); workers run
+under a memory rlimit, stream output up to a byte cap, and are replaced after
+a timeout, a crash, a MemoryError or max_jobs jobs. Replacements start in the
+background so the next job finds a warm worker.
+"""
+
+import atexit
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+SIGXCPU = getattr(signal, "SIGXCPU", None)
+
+
+def _worker_env() -> Dict[str, str]:
+    """Minimal environment: no API keys or credentials reach executed code"""
+    return {k: v for k, v in os.environ.items() if k in ("PATH", "SYSTEMROOT", "LANG")}
+
+
+class SandboxWorker:
+    """One worker process and the thread reading its messages"""
+
+    def __init__(self, memory_mb: int):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-I", WORKER_SCRIPT, str(memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            cwd=tempfile.gettempdir(),
+            env=_worker_env()
+        )
+        self.messages: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self.ready = False
+        self.jobs = 0
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            try:
+                self.messages.put(json.loads(line))
+            except ValueError:
+                continue
+        self.messages.put(None)  # Process exited
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.ready:
+            try:
+                message = self.messages.get(timeout=timeout)
+            except queue.Empty:
+                return False
+            self.ready = bool(message and message.get("ready"))
+        return self.ready
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def send(self, job: Dict):
+        self.proc.stdin.write(json.dumps(job) + "\n")
+        self.proc.stdin.flush()
+        self.jobs += 1
+
+    def kill(self):
+        if self.alive():
+            self.proc.kill()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class SandboxPool:
+    """Fixed-size pool of warm sandbox workers"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout: float = 5.0,
+        cpu_timeout: float = 5.0,
+        memory_mb: int = 256,
+        max_output_bytes: int = 5000,
+        max_jobs: int = 50,
+        start_timeout: float = 10.0
+    ):
+        self.size = workers
+        self.timeout = timeout
+        self.cpu_timeout = cpu_timeout
+        self.memory_mb = memory_mb
+        self.max_output_bytes = max_output_bytes
+        self.max_jobs = max_jobs
+        self.start_timeout = start_timeout
+        self._idle: "queue.Queue[SandboxWorker]" = queue.Queue()
+        self._workers = set()
+        self._started = False
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.jobs = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.total_ms = 0.0
+
+    def start(self):
+        """Spawn the workers (idempotent); they warm up in the background"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._spawn()
+        atexit.register(self.close)
+        print(f"🧪 Code sandbox: {self.size} worker(s), {self.timeout:g}s wall / {self.cpu_timeout:g}s CPU, {self.memory_mb}MB")
+
+    def _spawn(self):
+        try:
+            worker = SandboxWorker(self.memory_mb)
+        except OSError as e:
+            print(f"❌ Could not start sandbox worker: {e}")
+            return
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker: SandboxWorker):
+        """Kill a worker and start its replacement"""
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            self.recycled += 1
+        self._spawn()
+
+    def _acquire(self) -> Optional[SandboxWorker]:
+        self.start()
+        for _ in range(self.size + 1):
+            try:
+                worker = self._idle.get(timeout=self.start_timeout + self.timeout)
+            except queue.Empty:
+                return None
+            if worker.alive() and worker.wait_ready(self.start_timeout):
+                return worker
+            self._retire(worker)
+        return None
+
+    def _release(self, worker: SandboxWorker, recycle: bool):
+        if recycle or worker.jobs >= self.max_jobs or not worker.alive():
+            threading.Thread(target=self._retire, args=(worker,), daemon=True).start()
+        else:
+            self._idle.put(worker)
+
+    def run(self, code: str, on_output: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+        """
+        Execute code in a worker. Returns success, output, error, timed_out and
+        duration_ms; `on_output` receives output chunks as they are printed.
+        """
+        worker = self._acquire()
+        if worker is None:
+            return {"success": False, "output": "", "error": "❌ Code sandbox unavailable: no worker could be started.", "timed_out": False, "duration_ms": 0}
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        output, done, problem = [], None, None
+        try:
+            worker.send({"code": code, "cpu_seconds": self.cpu_timeout, "max_output_bytes": self.max_output_bytes})
+        except OSError:
+            problem = "died"
+        while problem is None:
+            try:
+                message = worker.messages.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                problem = "timeout"
+                break
+            if message is None:
+                problem = "died"
+            elif "out" in message:
+                output.append(message["out"])
+                if on_output:
+                    on_output(message["out"])
+            elif message.get("done"):
+                done = message
+                break
+
+        if problem == "timeout":
+            worker.kill()
+        elif problem == "died":
+            worker.proc.wait()
+        self._release(worker, recycle=problem is not None or bool(done and done.get("recycle")))
+
+        duration_ms = round((time.monotonic() - started) * 1000, 1)
+        with self._lock:
+            self.jobs += 1
+            self.total_ms += duration_ms
+            if problem == "timeout":
+                self.timeouts += 1
+
+        text = "".join(output)
+        if done and done.get("truncated"):
+            text += "\n... (output truncated)"
+        if problem == "timeout":
+            error = f"❌ Timeout: execution exceeded the {self.timeout:g}s time limit"
+        elif problem == "died":
+            returncode = worker.proc.returncode
+            if SIGXCPU is not None and returncode == -SIGXCPU:
+                error = f"❌ Timeout: execution exceeded the {self.cpu_timeout:g}s CPU time limit"
+            else:
+                error = f"❌ Execution Error: sandbox worker exited (code {returncode})"
+        else:
+            error = done.get("error")
+        return {
+            "success": error is None,
+            "output": text,
+            "error": error,
+            "timed_out": problem == "timeout" or (problem == "died" and error.startswith("❌ Timeout")),
+            "duration_ms": duration_ms
+        }
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+            self._started = False
+        for worker in workers:
+            worker.kill()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "idle": self._idle.qsize(),
+                "jobs": self.jobs,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+                "avg_ms": round(self.total_ms / self.jobs, 1) if self.jobs else 0.0
+            }
+
+
+def create_sandbox_pool() -> SandboxPool:
+    return SandboxPool(
+        workers=int(os.getenv("SANDBOX_WORKERS", "2")),
+        timeout=float(os.getenv("SANDBOX_TIMEOUT", "5")),
+        cpu_timeout=float(os.getenv("SANDBOX_CPU_TIMEOUT", "5")),
+        memory_mb=int(os.getenv("SANDBOX_MEMORY_MB", "256")),
+        max_output_bytes=int(os.getenv("SANDBOX_MAX_OUTPUT_BYTES", "5000")),
+        max_jobs=int(os.getenv("SANDBOX_MAX_JOBS_PER_WORKER", "50"))
+    )
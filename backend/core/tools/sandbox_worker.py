@@ -0,0 +1,125 @@
+"""
+Sandbox Worker Process
+Started by sandbox.py as `python -I sandbox_worker.py <memory_mb>`; imports
+nothing from the backend. Reads one JSON job per line on stdin and answers on
+stdout with {"out": text} lines while the code prints, then {"done": true, ...}.
+"""
+
+import builtins
+import json
+import os
+import sys
+import time
+import traceback
+
+try:
+    import resource  # Unix only: rlimits are skipped elsewhere
+except ImportError:
+    resource = None
+
+# Only safe built-ins are visible to executed code
+SAFE_BUILTINS = {
+    name: getattr(builtins, name) for name in (
+        'print', 'range', 'len', 'str', 'int', 'float', 'bool', 'list', 'dict',
+        'set', 'tuple', 'sum', 'min', 'max', 'abs', 'round', 'sorted',
+        'enumerate', 'zip', 'map', 'filter'
+    )
+}
+
+_channel = sys.stdout
+
+
+def send(message: dict):
+    _channel.write(json.dumps(message) + "\n")
+    _channel.flush()
+
+
+class OutputLimitExceeded(BaseException):
+    """Stops the code once it has printed max_output_bytes (not catchable with `except Exception`)"""
+
+
+class CappedOutput:
+    """sys.stdout for executed code: streams lines to the parent up to a byte cap"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.written = 0
+        self.pending = ""
+        self.truncated = False
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        room = self.limit - self.written
+        if len(data) > room:
+            self.pending += data[:room].decode("utf-8", "ignore")
+            self.written = self.limit
+            self.truncated = True
+            self.flush()
+            raise OutputLimitExceeded()
+        self.written += len(data)
+        self.pending += text
+        if "\n" in text or len(self.pending) >= 1024:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            send({"out": self.pending})
+            self.pending = ""
+
+
+def limit_memory(memory_mb: int):
+    if resource and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def limit_cpu(seconds: float):
+    """Allow `seconds` more CPU time; past it the kernel's SIGXCPU ends the process"""
+    if not resource or seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def run(job: dict):
+    output = CappedOutput(job.get("max_output_bytes", 5000))
+    error, recycle = None, False
+    limit_cpu(job.get("cpu_seconds", 0))
+    started = time.perf_counter()
+    sys.stdout = sys.stderr = output
+    try:
+        exec(job["code"], {"__builtins__": dict(SAFE_BUILTINS)})
+    except OutputLimitExceeded:
+        pass
+    except MemoryError:
+        error, recycle = "❌ Execution Error:\nMemoryError: memory limit exceeded", True
+    except BaseException:
+        error = f"❌ Execution Error:\n{traceback.format_exc()}"
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        output.flush()
+    send({
+        "done": True,
+        "error": error,
+        "truncated": output.truncated,
+        "recycle": recycle,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+    })
+
+
+def main():
+    limit_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    send({"ready": True, "pid": os.getpid()})
+    for line in sys.stdin:
+        if line.strip():
+            run(json.loads(line))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,25 @@ Web Search Tool for Real-time Information
 Uses DuckDuckGo for internet access
 """
 
-from duckduckgo_search import DDGS
 from typing import List, Dict
 from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
+from core.fakes import fake_backends_enabled
+
+# duckduckgo_search, requests and bs4 are imported when a search/scrape runs,
+# so importing get_current_time stays cheap
 
 def get_current_time() -> str:
     """Get current date and time"""
     return datetime.now().strftime("%A, %B %d, %Y at %I:%M %p")
 
+def _ddgs():
+    """DuckDuckGo client (offline stand-in when JARVIS_FAKE_BACKENDS=true)"""
+    if fake_backends_enabled():
+        from core.fakes import FakeDDGS
+        return FakeDDGS()
+    from duckduckgo_search import DDGS
+    return DDGS()
+
 def search_web(query: str, max_results: int = 5) -> str:
     """
     Search the web using DuckDuckGo
@@ -25,7 +34,7 @@ def search_web(query: str, max_results: int = 5) -> str:
         Formatted search results
     """
     try:
-        with DDGS() as ddgs:
+        with _ddgs() as ddgs:
             results = list(ddgs.text(query, max_results=max_results))
         
         if not results:
@@ -58,7 +67,13 @@ def scrape_webpage(url: str, max_length: int = 2000) -> str:
     Returns:
         Extracted text content
     """
+    if fake_backends_enabled():
+        from core.fakes import fake_scrape
+        return fake_scrape(url, max_length)
+
     try:
+        import requests
+        from bs4 import BeautifulSoup
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
@@ -100,7 +115,7 @@ def search_news(query: str, max_results: int = 5) -> str:
         Formatted news results
     """
     try:
-        with DDGS() as ddgs:
+        with _ddgs() as ddgs:
             results = list(ddgs.news(query, max_results=max_results))
         
         if not results:
@@ -3,16 +3,12 @@ from google.generativeai import types
 import os
 import base64
 import time
+from core.gemini_pool import gemini_pool
 
 class VideoGenerator:
     def __init__(self):
-        # Initialize Gemini for Veo video generation
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.has_api_key = True
-        else:
-            self.has_api_key = False
+        # Gemini for Veo video generation, through the shared client layer
+        self.has_api_key = bool(gemini_pool.api_key)
 
     def generate(self, prompt: str, duration: int = 8, aspect_ratio: str = "16:9", 
                  reference_image: bytes = None) -> dict:
@@ -48,7 +44,7 @@ class VideoGenerator:
                 config["reference_images"] = [reference_image]
             
             # Generate video using Veo 3.1 API
-            operation = genai.Client().models.generate_videos(
+            operation = gemini_pool.client().models.generate_videos(
                 model="veo-3.1-generate-preview",
                 prompt=prompt,
                 config=config
@@ -83,7 +79,7 @@ class VideoGenerator:
         
         try:
             # Get operation status
-            operation = genai.Client().operations.get(operation_id)
+            operation = gemini_pool.client().operations.get(operation_id)
             
             if operation.done:
                 # Video is ready
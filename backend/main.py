@@ -3,21 +3,31 @@ FastAPI Backend for Autonomous Jarvis AI
 Main server with all endpoints
 """
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from typing import Optional
 import os
 import json
+import math
+import asyncio
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from core.llm_engine import llm_engine
+from core.admission import BackendOverloaded, Cancellation
+from core.circuit_breaker import BackendUnavailable
 from core.agent import autonomous_agent
+from core.batch import batch_manager
+from core.agent_jobs import agent_jobs
+from core.budget import RunBudget
+from core.request_context import RequestContext, embedding_stats
 from core.memory import memory_manager
 from core.rag import rag_system
+from core.prompt_builder import prompt_builder, EDUCATIONAL_MODES
 from core.document_processor import process_document
 from core.voice_local import speak, listen
 from core.tools.web_search import get_current_time
@@ -30,6 +40,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Modes whose answers may be served from semantically similar cached prompts
+SEMANTIC_CACHE_MODES = {"eli5", "flashcard"}
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +52,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(BackendOverloaded)
+async def backend_overloaded_handler(request, exc: BackendOverloaded):
+    """Reject fast when an LLM backend cannot admit more work"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "backend": exc.backend, "reason": exc.reason},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+@app.on_event("startup")
+async def warm_local_models():
+    """Preload local models in the background so the first /chat doesn't pay the load"""
+    llm_engine.lifecycle.start()
+
+@app.on_event("startup")
+async def resume_batch_jobs():
+    """Pick up batch jobs interrupted by a crash or restart"""
+    batch_manager.resume_jobs()
+
+@app.on_event("startup")
+async def start_agent_workers():
+    """Start background agent workers and re-queue jobs interrupted by a restart"""
+    agent_jobs.start()
+
+@app.on_event("startup")
+async def warm_code_sandbox():
+    """Start the code sandbox workers so the agent's first execute_code is warm"""
+    if os.getenv("ENABLE_CODE_EXECUTION", "true").lower() == "true":
+        from core.tools.code_executor import code_executor
+        code_executor.pool.start()
+
+@app.on_event("shutdown")
+async def stop_keep_warm():
+    llm_engine.lifecycle.stop()
+
+@app.exception_handler(BackendUnavailable)
+async def backend_unavailable_handler(request, exc: BackendUnavailable):
+    """Fail fast while an LLM backend's circuit is open"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "backend": exc.backend},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
 # Mount static directory for audio files
 os.makedirs("backend/data/audio", exist_ok=True)
 app.mount("/audio", StaticFiles(directory="backend/data/audio"), name="audio")
@@ -69,9 +126,34 @@ async def health_check():
     return {
         "status": "healthy",
         "llm": "Ollama",
-        "time": get_current_time()
+        "time": get_current_time(),
+        "admission": llm_engine.admission_stats(),
+        "breakers": llm_engine.breaker_stats(),
+        "cache": llm_engine.cache_stats(),
+        "coalescing": llm_engine.coalescing_stats(),
+        "hedging": llm_engine.hedging_stats(),
+        "gemini": llm_engine.gemini_stats(),
+        "agent": autonomous_agent.cache_stats(),
+        "embeddings": embedding_stats(),
+        # status() may call Ollama's /api/ps, so it runs off the event loop
+        "local_models": await asyncio.to_thread(llm_engine.lifecycle.status)
     }
 
+@app.get("/router/decisions")
+async def router_decisions(limit: int = 50):
+    """Recent routing decisions (backend, classifier probability, threshold)"""
+    return {"router": llm_engine.router.name, "decisions": llm_engine.router.recent_decisions(limit)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: TTFT, token counts, prompt-eval time and decode speed histograms per backend"""
+    return PlainTextResponse(llm_engine.metrics_text(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/calls")
+async def metrics_calls(limit: int = 50):
+    """Recent per-call telemetry records (including the route reason)"""
+    return {"calls": llm_engine.telemetry.recent(limit)}
+
 # ==================== Session Management ====================
 
 @app.get("/sessions")
@@ -109,7 +191,8 @@ async def chat(
     session_id: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
     mode: str = Form("normal"),  # normal, quiz, eli5, flashcard, coding
-    use_agent: bool = Form(False)  # Use autonomous agent
+    use_agent: bool = Form(False),  # Use autonomous agent
+    use_cache: bool = Form(True)  # Set False to bypass the response cache
 ):
     """
     Main chat endpoint
@@ -152,57 +235,57 @@ async def chat(
     # Save user message
     memory_manager.add_message(session_id, "user", message)
     
-    # Get conversation history
-    history = memory_manager.get_conversation_history(session_id, max_messages=10)
+    # Get conversation history (trimmed by the prompt builder to keep a stable prefix)
+    history = memory_manager.get_conversation_history(session_id, max_messages=None)
+    
+    # Shares one lazily computed query embedding between RAG, routing and the cache
+    request_ctx = RequestContext(message)
     
     # Generate response based on mode
     if use_agent:
-        # Use autonomous agent
-        result = autonomous_agent.execute(message)
+        # Use autonomous agent (it blocks while waiting for an Ollama slot, so off the event loop)
+        result = await asyncio.to_thread(autonomous_agent.execute, message)
         response_text = result.get("output", "Agent execution failed")
     else:
         # Use direct LLM
-        # Check if we need RAG context
-        rag_context = rag_system.get_context_for_query(message, n_results=2)
-        
-        # Create system prompt based on mode
-        if mode == "coding":
-            system_prompt = llm_engine.create_coding_prompt(message)
-        elif mode in ["quiz", "eli5", "flashcard", "tutor"]:
-            system_prompt = llm_engine.create_educational_prompt(message, mode)
+        # Stable content (persona, mode instructions, history) goes first;
+        # volatile content (time, search results, RAG context) goes last
+        if mode == "coding" or mode in EDUCATIONAL_MODES:
+            prompt = prompt_builder.build(mode, history[:-1])  # Exclude current message
         else:
-            # Normal mode with web search detection
+            # Normal mode with web search detection; RAG and web search run in parallel
+            lookups = {
+                "rag_context": lambda: rag_system.get_context_for_query(message, n_results=2, embedding=request_ctx.embedding())
+            }
             message_lower = message.lower()
             search_keywords = ['search', 'latest', 'news', 'weather', 'current', 'price']
             
             if any(kw in message_lower for kw in search_keywords):
                 from core.tools.web_search import search_web
-                search_results = search_web(message, max_results=3)
-                system_prompt = f"""You are Jarvis, an advanced AI assistant.
-                
-Current time: {get_current_time()}
-
-Web Search Results:
-{search_results}
-
-{rag_context}
-
-Use the above information to answer the user's question accurately."""
-            else:
-                system_prompt = f"""You are Jarvis, an advanced AI assistant specializing in coding, education, and general knowledge.
-
-Current time: {get_current_time()}
-
-{rag_context}
-
-Be helpful, concise, and accurate."""
+                lookups["search_results"] = lambda: search_web(message, max_results=3)
+            
+            found = await asyncio.to_thread(RequestContext.parallel, **lookups)
+            rag_context = found["rag_context"]
+            search_results = found.get("search_results")
+            
+            prompt = prompt_builder.build(
+                "normal",
+                history[:-1],  # Exclude current message
+                current_time=get_current_time(),
+                search_results=search_results,
+                rag_context=rag_context
+            )
         
         # Generate response
-        response_text = llm_engine.generate_response(
+        response_text = await llm_engine.agenerate_response(
             message,
-            system_prompt=system_prompt,
-            history=history[:-1],  # Exclude current message
-            temperature=0.7
+            system_prompt=prompt["system_prompt"],
+            history=prompt["history"],
+            context=prompt["context"],
+            temperature=0.7,
+            use_cache=use_cache,
+            cache_namespace=mode if mode in SEMANTIC_CACHE_MODES else None,
+            request=request_ctx
         )
     
     # Generate audio (TTS)
@@ -259,12 +342,139 @@ async def check_video_status(operation_id: str):
 @app.post("/agent/execute")
 async def execute_agent_task(
     task: str = Form(...),
-    context: Optional[str] = Form(None)
+    context: Optional[str] = Form(None),
+    background: bool = Form(False),  # Queue the task and return a job id immediately
+    max_seconds: Optional[float] = Form(None),  # Run budget overrides (default AGENT_MAX_SECONDS / AGENT_MAX_TOKENS)
+    max_tokens: Optional[int] = Form(None)
 ):
     """Execute autonomous agent task"""
-    result = autonomous_agent.execute(task, context)
+    if background:
+        job = agent_jobs.submit(task, context, max_seconds=max_seconds, max_tokens=max_tokens)
+        return {"job_id": job["id"], "status": job["status"], "queue_position": job.get("queue_position")}
+    result = await asyncio.to_thread(autonomous_agent.execute, task, context, budget=RunBudget(max_seconds, max_tokens))
     return result
 
+@app.get("/agent/jobs")
+async def list_agent_jobs():
+    return {"jobs": agent_jobs.list_jobs()}
+
+@app.get("/agent/jobs/{job_id}")
+async def get_agent_job(job_id: str):
+    """Status, progress and step trace of a background agent job"""
+    job = agent_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Agent job not found")
+    return job
+
+@app.delete("/agent/jobs/{job_id}")
+async def cancel_agent_job(job_id: str):
+    if agent_jobs.cancel(job_id):
+        return {"success": True}
+    raise HTTPException(status_code=404, detail="Agent job not found")
+
+@app.get("/agent/stream")
+async def stream_agent_task(
+    request: Request,
+    task: str,
+    context: Optional[str] = None,
+    max_seconds: Optional[float] = None,
+    max_tokens: Optional[int] = None
+):
+    """
+    Server-sent events for an agent run as it happens: start (with run_id),
+    token, thought, tool_call, tool_output and final. Closing the connection
+    or DELETE /agent/runs/{run_id} cancels the run and its in-flight LLM call.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel = Cancellation()
+
+    def produce():
+        # The run owns one thread start to finish, so cancelling never leaves it half-iterated
+        try:
+            for event in autonomous_agent.run(task, context, cancel, RunBudget(max_seconds, max_tokens)):
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    # Nothing to send (e.g. the model is still reading the prompt): notice a disconnect anyway
+                    if await request.is_disconnected():
+                        break
+                    continue
+                if event is None:
+                    break
+                yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+                if await request.is_disconnected():
+                    break
+        finally:
+            cancel.set()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.delete("/agent/runs/{run_id}")
+async def cancel_agent_run(run_id: str):
+    """Cancel a streamed agent run"""
+    if autonomous_agent.cancel_run(run_id):
+        return {"success": True}
+    raise HTTPException(status_code=404, detail="Agent run not found")
+
+# ==================== Batch Generation ====================
+
+@app.post("/batch")
+async def create_batch(
+    prompts: str = Form(...),  # JSON list, or one prompt per line
+    mode: str = Form("normal"),
+    use_cache: bool = Form(True)
+):
+    """Queue a batch of prompts (e.g. one quiz per syllabus topic) and return the job id"""
+    if prompts.strip().startswith("["):
+        try:
+            prompt_list = [str(p) for p in json.loads(prompts)]
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="prompts is not a valid JSON list")
+    else:
+        prompt_list = [line.strip() for line in prompts.splitlines() if line.strip()]
+    if not prompt_list:
+        raise HTTPException(status_code=400, detail="No prompts given")
+    return batch_manager.create_job(prompt_list, mode=mode, use_cache=use_cache)
+
+@app.get("/batch")
+async def list_batches():
+    return {"jobs": batch_manager.list_jobs()}
+
+@app.get("/batch/{job_id}")
+async def get_batch(job_id: str):
+    """Progress and throughput (prompts/min) of a batch job"""
+    status = batch_manager.get_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return status
+
+@app.get("/batch/{job_id}/results")
+async def get_batch_results(job_id: str):
+    status = batch_manager.get_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return {**status, "results": batch_manager.get_results(job_id)}
+
+@app.delete("/batch/{job_id}")
+async def cancel_batch(job_id: str):
+    if batch_manager.cancel_job(job_id):
+        return {"success": True}
+    raise HTTPException(status_code=404, detail="Batch job not found")
+
 # ==================== Voice Endpoints ====================
 
 @app.post("/tts")
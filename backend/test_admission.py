@@ -0,0 +1,196 @@
+"""
+Admission control tests: concurrency cap, queue bound, interactive priority,
+background caps and cancellation, driven by the offline fake Ollama client.
+Run from backend/: python -m pytest -q test_admission.py
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("JARVIS_FAKE_BACKENDS", "true")
+
+from core.admission import BackendLimiter, BackendOverloaded, Cancellation, StreamCancelled
+from core.fakes import FakeOllamaClient, ScriptedResponder
+
+
+def fake_stream(tokens_per_sec: float = 0.0, ttft: float = 0.0):
+    responder = ScriptedResponder(default="one two three four", ttft=ttft, tokens_per_sec=tokens_per_sec, prompt_tokens_per_sec=0)
+    client = FakeOllamaClient(responder=responder)
+    return client.chat("fake", [{"role": "user", "content": "hi"}], stream=True)
+
+
+def acquire_in_thread(limiter: BackendLimiter, order: list, label: str, background: bool = False, cancel=None):
+    """Start a waiter; its label (once admitted) or the exception is appended to `order`"""
+    def run():
+        try:
+            limiter.acquire(cancel, background)
+            order.append(label)
+        except Exception as e:
+            order.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def drain(stream, result: list):
+    """Read a stream to the end, appending "done" or the StreamCancelled raised"""
+    try:
+        for _ in stream:
+            pass
+        result.append("done")
+    except StreamCancelled as e:
+        result.append(e)
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def test_queue_full_is_rejected_fast():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=1, max_wait=5)
+    limiter.acquire()
+    order = []
+    waiter = acquire_in_thread(limiter, order, "queued")
+    wait_for(lambda: limiter.stats()["queue_depth"] == 1)
+
+    start = time.monotonic()
+    with pytest.raises(BackendOverloaded) as info:
+        limiter.acquire()
+    assert time.monotonic() - start < 0.5
+    assert info.value.reason == "queue full"
+
+    limiter.release()
+    waiter.join(1)
+    assert order == ["queued"]
+    assert limiter.stats()["in_flight"] == 1
+
+
+def test_queue_timeout():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=2, max_wait=0.2)
+    limiter.acquire()
+    with pytest.raises(BackendOverloaded) as info:
+        limiter.acquire()
+    assert info.value.reason == "queue timeout"
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_interactive_is_admitted_before_queued_background():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=4, max_wait=5)
+    limiter.acquire()
+    order = []
+    background = acquire_in_thread(limiter, order, "background", background=True)
+    wait_for(lambda: limiter.stats()["background_queue_depth"] == 1)
+    interactive = acquire_in_thread(limiter, order, "interactive")
+    wait_for(lambda: limiter.stats()["queue_depth"] == 2)
+
+    limiter.release()
+    interactive.join(1)
+    assert order == ["interactive"]
+
+    limiter.release()
+    background.join(1)
+    assert order == ["interactive", "background"]
+
+
+def test_background_cap_keeps_a_slot_for_chat():
+    limiter = BackendLimiter("test", max_concurrency=2, max_queue=4, max_wait=5)
+    assert limiter.max_background == 1
+    limiter.acquire(background=True)
+
+    order = []
+    second_job = acquire_in_thread(limiter, order, "background", background=True)
+    wait_for(lambda: limiter.stats()["background_queue_depth"] == 1)
+    assert limiter.stats()["in_flight"] == 1  # A slot is free, but not for jobs
+
+    limiter.acquire()  # Chat gets the reserved slot without waiting
+    assert order == []
+    limiter.release()
+    limiter.release(background=True)
+    second_job.join(1)
+    assert order == ["background"]
+    assert limiter.stats()["background_in_flight"] == 1
+
+
+def test_background_queue_does_not_fill_the_interactive_queue():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=1, max_wait=5)
+    limiter.acquire()
+    order = []
+    acquire_in_thread(limiter, order, "background", background=True)
+    wait_for(lambda: limiter.stats()["background_queue_depth"] == 1)
+    with pytest.raises(BackendOverloaded):
+        limiter.acquire(background=True)
+    interactive = acquire_in_thread(limiter, order, "interactive")
+    wait_for(lambda: limiter.stats()["queue_depth"] == 2)
+    limiter.release()
+    interactive.join(1)
+    assert order == ["interactive"]
+
+
+def test_cancel_while_queued_leaves_at_once():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=2, max_wait=5)
+    limiter.acquire()
+    cancel = Cancellation()
+    order = []
+    waiter = acquire_in_thread(limiter, order, "admitted", cancel=cancel)
+    wait_for(lambda: limiter.stats()["queue_depth"] == 1)
+
+    start = time.monotonic()
+    cancel.set()
+    waiter.join(1)
+    assert time.monotonic() - start < 0.5
+    assert isinstance(order[0], StreamCancelled)
+    assert limiter.stats()["queue_depth"] == 0
+    assert limiter.stats()["in_flight"] == 1
+
+
+def test_rate_limit_rejects_beyond_the_burst():
+    limiter = BackendLimiter("test", max_concurrency=4, max_queue=4, max_wait=0.1, rate_per_minute=6, burst=2)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(BackendOverloaded) as info:
+        limiter.acquire()
+    assert info.value.reason == "rate limit"
+
+
+def test_stream_holds_the_slot_until_exhausted():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=1, max_wait=5)
+    stream = limiter.stream(fake_stream())
+    assert limiter.stats()["in_flight"] == 1
+    chunks = list(stream)
+    assert chunks[-1]["done"]
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_cancelled_stream_keeps_its_slot_until_the_backend_answers():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=1, max_wait=5)
+    cancel = Cancellation()
+    stream = limiter.stream(fake_stream(ttft=0.4), cancel)
+    result = []
+    reader = threading.Thread(target=drain, args=(stream, result), daemon=True)
+    reader.start()
+    time.sleep(0.1)  # Reader is blocked on the first chunk
+
+    cancel.set()
+    assert limiter.stats()["in_flight"] == 1  # Backend request still running
+    reader.join(2)
+    assert isinstance(result[0], StreamCancelled)
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_cancelled_idle_stream_releases_at_once():
+    limiter = BackendLimiter("test", max_concurrency=1, max_queue=1, max_wait=5)
+    cancel = Cancellation()
+    stream = limiter.stream(fake_stream(), cancel)
+    next(stream)
+    cancel.set()
+    assert limiter.stats()["in_flight"] == 0
+    with pytest.raises(StreamCancelled):
+        next(stream)
+
@@ -0,0 +1,72 @@
+"""
+Agent tool execution tests: several calls from one step run in parallel,
+order-sensitive tools run one at a time, and a timed out call neither blocks
+the step nor starves the calls after it. Uses the fake Ollama backend.
+Run from backend/: python -m pytest -q test_agent_tools.py
+"""
+
+import threading
+import time
+
+
+def sleeper(seconds: float, log: list = None):
+    def run(tool_input: str) -> str:
+        if log is not None:
+            log.append(("start", tool_input))
+        time.sleep(seconds)
+        if log is not None:
+            log.append(("end", tool_input))
+        return f"done {tool_input}"
+    return run
+
+
+def test_parses_several_calls_from_one_reply(agent):
+    calls = agent._parse_tool_calls("Checking both.\nTOOL: web_search\nINPUT: weather Paris\nTOOL: web_search\nINPUT: weather Rome\n")
+    assert calls == [{"tool": "web_search", "input": "weather Paris"}, {"tool": "web_search", "input": "weather Rome"}]
+
+
+def test_independent_calls_run_in_parallel(agent):
+    agent.tools["lookup"] = {"func": sleeper(0.3), "description": "test"}
+    start = time.monotonic()
+    results = agent._run_tools([{"tool": "lookup", "input": str(i)} for i in range(3)])
+    assert time.monotonic() - start < 0.6
+    assert [r["output"] for r in results] == ["done 0", "done 1", "done 2"]
+
+
+def test_order_sensitive_tools_run_one_at_a_time(agent):
+    log = []
+    agent.tools["click"] = {"func": sleeper(0.05, log), "description": "test", "parallel": False}
+    agent._run_tools([{"tool": "click", "input": "a"}, {"tool": "click", "input": "b"}])
+    assert log == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+
+
+def test_unknown_tool_is_reported(agent):
+    results = agent._run_tools([{"tool": "teleport", "input": "mars"}])
+    assert results[0]["output"].startswith("Error: Tool 'teleport' not found")
+
+
+def test_timed_out_call_does_not_block_the_step(agent):
+    agent.tools["slow"] = {"func": sleeper(2.0), "description": "test", "timeout": 0.2}
+    agent.tools["fast"] = {"func": sleeper(0.0), "description": "test"}
+    start = time.monotonic()
+    results = agent._run_tools([{"tool": "slow", "input": "x"}, {"tool": "fast", "input": "y"}])
+    assert time.monotonic() - start < 1.0
+    assert results[0]["timed_out"] and "timed out" in results[0]["output"]
+    assert results[1]["output"] == "done y"
+
+
+def test_abandoned_calls_do_not_starve_later_ones(agent):
+    agent.tool_workers = 1
+    agent.tool_pool = agent._new_tool_pool()
+    release = threading.Event()
+    agent.tools["stuck"] = {"func": lambda tool_input: release.wait(5) and "late", "description": "test", "timeout": 0.2}
+    agent.tools["fast"] = {"func": sleeper(0.0), "description": "test"}
+    try:
+        assert agent._run_tools([{"tool": "stuck", "input": "x"}])[0]["timed_out"]
+        start = time.monotonic()
+        results = agent._run_tools([{"tool": "fast", "input": "y"}])
+        assert results[0]["output"] == "done y"
+        assert time.monotonic() - start < 0.5
+        assert agent.cache_stats()["abandoned_tool_calls"] == 1
+    finally:
+        release.set()
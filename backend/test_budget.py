@@ -0,0 +1,76 @@
+"""
+Run budget tests: iteration, token and wall-clock limits on RunBudget, and
+their enforcement in AutonomousAgent runs against the fake Ollama backend.
+Run from backend/: python -m pytest -q test_budget.py
+"""
+
+import time
+
+from core.budget import RunBudget, parse_tool_timeouts
+
+MATH_TASK = "What is 25 * 4?"  # The fake model answers with a calculator call
+
+
+def test_iteration_limit():
+    budget = RunBudget(max_seconds=0, max_tokens=0, max_iterations=2)
+    assert budget.next_iteration() and budget.next_iteration()
+    assert not budget.next_iteration()
+    assert budget.exhausted == "iterations"
+    assert budget.report()["iterations"] == 2
+
+
+def test_token_limit_is_sticky():
+    budget = RunBudget(max_seconds=0, max_tokens=100, max_iterations=10)
+    budget.tokens_used = 60
+    assert budget.check() is None
+    assert budget.remaining_tokens() == 40
+    budget.tokens_used = 120
+    assert budget.check() == "tokens"
+    assert budget.remaining_tokens() == 0
+    budget.tokens_used = 0
+    assert budget.check() == "tokens"
+    assert not budget.next_iteration()
+
+
+def test_time_limit_and_timeout_cap():
+    budget = RunBudget(max_seconds=0.2, max_tokens=0, max_iterations=10)
+    assert budget.cap_timeout(30) <= 0.2
+    assert budget.next_iteration()
+    time.sleep(0.25)
+    assert budget.check() == "time"
+    assert budget.cap_timeout(30) == 0.0
+    assert not budget.next_iteration()
+
+
+def test_zero_means_unlimited():
+    budget = RunBudget(max_seconds=0, max_tokens=0, max_iterations=1)
+    budget.tokens_used = 10 ** 9
+    assert budget.check() is None
+    assert budget.remaining_seconds() is None and budget.remaining_tokens() is None
+    assert budget.cap_timeout(30) == 30
+
+
+def test_parse_tool_timeouts():
+    assert parse_tool_timeouts("scrape_webpage=20, execute_code=7.5,bad=x,,") == {"scrape_webpage": 20.0, "execute_code": 7.5}
+
+
+def test_agent_stops_at_the_iteration_budget(agent):
+    result = agent.execute(MATH_TASK, budget=RunBudget(max_seconds=0, max_tokens=0, max_iterations=1))
+    assert result["budget_exhausted"] == "iterations"
+    assert result["budget"]["iterations"] == 1
+    assert result["output"]  # Best-effort answer instead of an error
+
+
+def test_agent_stops_at_the_token_budget(agent):
+    result = agent.execute(MATH_TASK, budget=RunBudget(max_seconds=0, max_tokens=50, max_iterations=10))
+    assert result["budget_exhausted"] == "tokens"
+    assert result["budget"]["iterations"] == 1
+
+
+def test_agent_caps_tool_timeouts_by_the_time_left(agent):
+    agent.tools["calculator"]["func"] = lambda expression: time.sleep(3) or "late"
+    start = time.monotonic()
+    result = agent.execute(MATH_TASK, budget=RunBudget(max_seconds=0.5, max_tokens=0, max_iterations=10))
+    assert time.monotonic() - start < 2.5
+    assert result["budget_exhausted"] == "time"
+    assert "timed out" in result["steps"][0]["tool_output"]
@@ -0,0 +1,101 @@
+"""
+Calculator tests: whitelisted syntax, bounded integer powers, division by
+zero, and range mode both vectorized (NumPy) and in pure Python.
+Run from backend/: python -m pytest -q test_calculator.py
+"""
+
+import pytest
+
+from core.tools import calculator
+from core.tools.calculator import Calculator, calculate
+
+
+@pytest.fixture(params=["numpy", "python"])
+def range_mode(request, monkeypatch):
+    """Run range tests vectorized and with the pure-Python fallback"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(calculator, "np", None)
+    return request.param
+
+
+def test_basic_expressions():
+    assert calculate("2 + 3 * 4") == "✅ Result: 14"
+    assert calculate("sqrt(16) + floor(pi)") == "✅ Result: 7.0"
+    assert calculate("7 // 2 + 7 % 2") == "✅ Result: 4"
+
+
+@pytest.mark.parametrize("expression", ["__import__('os')", "(1).real", "[1, 2]", "lambda: 1", "open('x')", "'a' * 3", "abs(x=1)"])
+def test_rejects_unsafe_syntax(expression):
+    assert calculate(expression).startswith("❌ Calculation error")
+
+
+def test_compiled_expressions_are_cached():
+    Calculator.compile_expression.cache_clear()
+    calculate("1 + 1")
+    calculate("1 + 1")
+    assert Calculator.compile_expression.cache_info().hits >= 1
+
+
+def test_huge_integer_power_is_rejected():
+    result = calculate("2**100001")
+    assert result.startswith("❌ Calculation error")
+    assert "too large" in result
+    assert calculate("9**9**9").startswith("❌ Calculation error")
+
+
+def test_large_but_bounded_power():
+    # Past Python's int-to-str digit limit the result is shown in scientific notation
+    assert calculate("2**100000") == "✅ Result: 9.990020930143845e+30102"
+    assert calculate("2**1000") == f"✅ Result: {2 ** 1000}"
+    assert calculate("(-1)**1000001") == "✅ Result: -1"
+    assert calculate("2**-2") == "✅ Result: 0.25"
+
+
+def test_division_by_zero():
+    assert calculate("1/0") == "❌ Error: Division by zero"
+    assert calculate("5//0") == "❌ Error: Division by zero"
+    assert calculate("5 % 0") == "❌ Error: Division by zero"
+
+
+def test_range_floor_division_by_zero(range_mode):
+    assert calculate("x//0 for x in 1..3") == "❌ Error: Division by zero"
+    assert calculate("sum of 1/(x-2) for x in 1..3") == "❌ Error: Division by zero"
+
+
+def test_range_aggregates(range_mode):
+    assert calculate("sum of x**2 for x in 1..10") == "✅ Result: 385"
+    assert calculate("mean x for x in 1..4") == "✅ Result: 2.5"
+    assert calculate("max of x*(10-x) for x in 0..10") == "✅ Result: 25"
+    assert calculate("sum x for x in 0..1 step 0.25") == "✅ Result: 2.5"
+
+
+def test_range_table(range_mode):
+    table = calculate("x**2 for x in 1..3")
+    assert "1" in table and "4" in table and "9" in table
+
+
+def test_range_integer_powers_stay_exact_or_fall_back_to_float(range_mode):
+    assert calculate("max of 3**x for x in 1..30") == f"✅ Result: {3 ** 30}"
+    big = calculate("max of x**40 for x in 1..10")
+    assert big.startswith("✅ Result: ")
+    assert float(big.split(": ")[1]) == pytest.approx(10.0 ** 40)
+
+
+def test_range_sum_overflow_falls_back_to_float(range_mode):
+    result = calculate("sum of 2**62 + x for x in 1..4")
+    assert float(result.split(": ")[1]) == pytest.approx(4 * 2.0 ** 62)
+
+
+def test_pure_python_range_table_of_huge_integers(monkeypatch):
+    monkeypatch.setattr(calculator, "np", None)  # NumPy mode overflows to inf instead
+    table = calculate("2**(1000*x) for x in 1..20")
+    assert table.startswith("✅")
+    assert "e+6020" in table  # 2**20000
+
+
+def test_range_size_is_bounded(monkeypatch):
+    monkeypatch.setattr(Calculator, "max_points", 100)
+    assert "range too large" in calculate("x for x in 1..1000")
+    assert "empty range" in calculate("x for x in 1..5 step -1")
@@ -0,0 +1,114 @@
+"""
+Circuit breaker tests: closed -> open on failure rate, fail-fast while open,
+half-open probe after the cool-down, and closing or re-opening on its result.
+Run from backend/: python -m pytest -q test_circuit_breaker.py
+"""
+
+import time
+
+import pytest
+
+from core.circuit_breaker import BackendUnavailable, CircuitBreaker
+
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    settings = {"failure_rate": 0.5, "min_calls": 4, "window": 10, "slow_call_seconds": 1.0, "open_seconds": 0.2}
+    settings.update(overrides)
+    return CircuitBreaker("test", **settings)
+
+
+def fail(breaker: CircuitBreaker, times: int = 1):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure(RuntimeError("backend down"))
+
+
+def succeed(breaker: CircuitBreaker, times: int = 1, latency: float = 0.1):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_success(latency)
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    fail(breaker, 3)
+    assert breaker.stats()["state"] == CircuitBreaker.CLOSED
+
+
+def test_opens_on_failure_rate_and_fails_fast():
+    breaker = make_breaker()
+    succeed(breaker, 2)
+    fail(breaker, 2)
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+    assert not breaker.available()
+
+    with pytest.raises(BackendUnavailable) as info:
+        breaker.before_call()
+    assert info.value.retry_after >= 1.0
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker()
+    succeed(breaker, 4, latency=5.0)
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+
+
+def test_half_open_probe_success_closes():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.25)
+    assert breaker.available()
+
+    breaker.before_call()
+    assert breaker.stats()["state"] == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.available()
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
+
+    breaker.record_success(0.1)
+    stats = breaker.stats()
+    assert stats["state"] == CircuitBreaker.CLOSED
+    assert stats["window_calls"] == 0  # The old failures no longer count
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.25)
+    fail(breaker)
+    stats = breaker.stats()
+    assert stats["state"] == CircuitBreaker.OPEN
+    assert stats["times_opened"] == 2
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
+
+
+def test_slow_probe_reopens():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.25)
+    succeed(breaker, latency=5.0)
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+
+
+def test_released_probe_frees_the_slot():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.25)
+    breaker.before_call()
+    breaker.release_probe()  # Caller cancelled: no verdict
+    assert breaker.stats()["state"] == CircuitBreaker.HALF_OPEN
+    assert breaker.available()
+    succeed(breaker)
+    assert breaker.stats()["state"] == CircuitBreaker.CLOSED
+
+
+def test_trip_opens_immediately():
+    breaker = make_breaker(open_seconds=30)
+    breaker.trip()
+    assert breaker.stats()["state"] == CircuitBreaker.OPEN
+    assert breaker.stats()["retry_after_s"] > 0
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()
@@ -0,0 +1,112 @@
+"""
+Hedged request tests: a slow primary is hedged on the other backend, the
+loser is cancelled without its admission slot being freed early, failover on
+errors, and the hedge-rate cap. Backends are offline fake Ollama streams.
+Run from backend/: python -m pytest -q test_hedging.py
+"""
+
+import os
+import time
+
+import pytest
+
+os.environ.setdefault("JARVIS_FAKE_BACKENDS", "true")
+
+from core.admission import BackendLimiter
+from core.fakes import FakeOllamaClient, ScriptedResponder
+from core.hedging import Hedger
+
+
+def backend(text: str, ttft: float, limiter: BackendLimiter):
+    """Factory for a fake backend stream admitted through `limiter`"""
+    responder = ScriptedResponder(default=text, ttft=ttft, tokens_per_sec=0, prompt_tokens_per_sec=0)
+    client = FakeOllamaClient(responder=responder)
+
+    def factory(cancel):
+        chunks = client.chat("fake", [{"role": "user", "content": "hi"}], stream=True)
+        return limiter.stream((c["message"]["content"] for c in chunks if not c["done"]), cancel)
+    return factory
+
+
+def broken(cancel):
+    raise RuntimeError("connection refused")
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def limiters():
+    return (
+        BackendLimiter("local", max_concurrency=1, max_queue=2, max_wait=5),
+        BackendLimiter("gemini", max_concurrency=1, max_queue=2, max_wait=5)
+    )
+
+
+def test_fast_primary_is_not_hedged():
+    local, gemini = limiters()
+    hedger = Hedger(["local", "gemini"], default_threshold=0.3)
+    served = {}
+    text = "".join(hedger.stream("local", backend("local answer", 0.0, local), "gemini", backend("cloud answer", 0.0, gemini), served))
+    assert text == "local answer"
+    assert served["backend"] == "local"
+    assert hedger.stats()["hedges_fired"] == 0
+    assert gemini.stats()["admitted"] == 0
+
+
+def test_slow_primary_is_hedged_and_the_loser_keeps_its_slot_until_it_answers():
+    local, gemini = limiters()
+    hedger = Hedger(["local", "gemini"], default_threshold=0.1)
+    served = {}
+    start = time.monotonic()
+    text = "".join(hedger.stream("local", backend("local answer", 0.8, local), "gemini", backend("cloud answer", 0.0, gemini), served))
+    assert text == "cloud answer"
+    assert served["backend"] == "gemini"
+    assert time.monotonic() - start < 0.6
+    assert hedger.stats()["hedges_won"] == 1
+
+    # The loser's request is still in prompt evaluation: its slot stays taken
+    assert local.stats()["in_flight"] == 1
+    # ...and is released once the backend answers and the stream is closed
+    wait_for(lambda: local.stats()["in_flight"] == 0)
+    assert gemini.stats()["in_flight"] == 0
+
+
+def test_queued_hedge_leaves_the_queue_when_the_primary_wins():
+    local, gemini = limiters()
+    gemini.acquire()  # Cloud busy: the hedge has to queue
+    hedger = Hedger(["local", "gemini"], default_threshold=0.1)
+    stream = hedger.stream("local", backend("local answer", 0.3, local), "gemini", backend("cloud answer", 0.0, gemini))
+    assert "".join(stream) == "local answer"
+    assert hedger.stats()["hedges_lost"] == 1
+    wait_for(lambda: gemini.stats()["queue_depth"] == 0)
+    assert gemini.stats()["admitted"] == 1  # Only the slot taken above
+
+
+def test_failing_primary_fails_over():
+    local, gemini = limiters()
+    hedger = Hedger(["local", "gemini"], default_threshold=5.0)
+    served = {}
+    text = "".join(hedger.stream("local", broken, "gemini", backend("cloud answer", 0.0, gemini), served))
+    assert text == "cloud answer"
+    assert served["backend"] == "gemini"
+    assert hedger.stats()["failovers"] == 1
+
+
+def test_both_failing_raises_the_primary_error():
+    hedger = Hedger(["local", "gemini"], default_threshold=5.0)
+    with pytest.raises(RuntimeError):
+        "".join(hedger.stream("local", broken, "gemini", broken))
+
+
+def test_hedge_rate_cap():
+    local, gemini = limiters()
+    hedger = Hedger(["local", "gemini"], default_threshold=0.05, max_hedge_rate=0.0)
+    text = "".join(hedger.stream("local", backend("local answer", 0.2, local), "gemini", backend("cloud answer", 0.0, gemini)))
+    assert text == "local answer"
+    assert hedger.stats()["skipped_by_cap"] == 1
+    assert gemini.stats()["admitted"] == 0
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+from core.plan_cache import PlanCache
+
+def test_plan_cache():
+    print("📋 Testing Plan Cache...")
+    cache = PlanCache(path=os.path.join(tempfile.mkdtemp(), "plan_cache.json"))
+    passed = True
+
+    # Test 1: Fully templated plan is refilled and may be prefilled
+    print("\n1. Clean plan...")
+    cache.put("What is 25 * 4?", [[{"tool": "calculator", "input": "25 * 4"}]], llm_calls=2)
+    plan = cache.lookup("What is 7 * 6?")
+    print(f"Plan: {plan['steps']} reusable={plan['reusable']}")
+    if plan["match"] != "exact" or not plan["reusable"] or plan["steps"][0][0]["input"] != "7 * 6":
+        print("❌ Clean plan was not refilled")
+        passed = False
+
+    # Test 2: A slot value left inside a literal ("15" in "0.15") must not be replayed
+    print("\n2. Plan with a leftover literal...")
+    cache.put("What's 15% of 80?", [[{"tool": "calculator", "input": "0.15*80"}]], llm_calls=2)
+    plan = cache.lookup("What's 20% of 80?")
+    print(f"Plan: {plan['steps']} reusable={plan['reusable']}")
+    if plan["match"] != "exact" or plan["reusable"]:
+        print("❌ Plan with a leftover literal was marked reusable")
+        passed = False
+    if plan["steps"][0][0]["input"] != "0.15*80":
+        print("❌ Partially templated input was refilled instead of shown as recorded")
+        passed = False
+
+    # Test 3: A slot the plan never uses makes it unsafe to replay
+    print("\n3. Plan ignoring a slot...")
+    cache.put("Search the web for 3 results about 'python asyncio'", [[{"tool": "web_search", "input": "python asyncio"}]], llm_calls=2)
+    plan = cache.lookup("Search the web for 5 results about 'python asyncio'")
+    print(f"Plan: {plan['steps']} reusable={plan['reusable']}")
+    if plan["reusable"]:
+        print("❌ Plan ignoring a slot was marked reusable")
+        passed = False
+
+    print("\n✅ Plan Cache Test PASSED" if passed else "\n❌ Plan Cache Test FAILED")
+    assert passed, "Plan cache test failed"
+
+if __name__ == "__main__":
+    test_plan_cache()
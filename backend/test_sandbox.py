@@ -0,0 +1,115 @@
+"""
+Code sandbox tests: warm workers, wall-clock timeout, CPU and memory rlimits,
+output cap, and worker recycling after failures or max_jobs.
+Run from backend/: python -m pytest -q test_sandbox.py
+"""
+
+import time
+
+import pytest
+
+from core.tools.sandbox import SandboxPool
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**settings) -> SandboxPool:
+        options = {"workers": 1, "timeout": 5.0, "cpu_timeout": 5.0, "memory_mb": 256, "max_output_bytes": 5000, "max_jobs": 50}
+        options.update(settings)
+        pool = SandboxPool(**options)
+        pools.append(pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.02)
+
+
+def test_runs_code_and_streams_output(make_pool):
+    pool = make_pool()
+    chunks = []
+    result = pool.run("for i in range(3):\n    print(i)", on_output=chunks.append)
+    assert result["success"] and result["error"] is None
+    assert result["output"] == "0\n1\n2\n"
+    assert "".join(chunks) == result["output"]
+
+
+def test_worker_stays_warm_between_jobs(make_pool):
+    pool = make_pool()
+    pool.run("print(1)")
+    result = pool.run("print(2)")
+    assert result["output"] == "2\n"
+    assert pool.stats()["recycled"] == 0
+
+
+def test_errors_are_reported_without_recycling(make_pool):
+    pool = make_pool()
+    result = pool.run("print(1 / 0)")
+    assert not result["success"]
+    assert "ZeroDivisionError" in result["error"]
+    assert pool.stats()["recycled"] == 0
+
+
+def test_only_safe_builtins(make_pool):
+    pool = make_pool()
+    for code in ("import os", "open('/etc/passwd')", "__import__('os')"):
+        result = pool.run(code)
+        assert not result["success"], code
+
+
+def test_wall_clock_timeout_kills_and_replaces_the_worker(make_pool):
+    pool = make_pool(timeout=0.5, cpu_timeout=30)
+    start = time.monotonic()
+    result = pool.run("while True:\n    pass")
+    assert time.monotonic() - start < 2.0
+    assert result["timed_out"] and not result["success"]
+    assert "0.5s time limit" in result["error"]
+    assert pool.stats()["timeouts"] == 1
+
+    wait_for(lambda: pool.stats()["recycled"] == 1)
+    assert pool.run("print('next')")["output"] == "next\n"
+
+
+def test_cpu_rlimit_stops_busy_code(make_pool):
+    pytest.importorskip("resource")
+    pool = make_pool(timeout=30, cpu_timeout=1)
+    start = time.monotonic()
+    result = pool.run("while True:\n    pass")
+    assert time.monotonic() - start < 10
+    assert result["timed_out"]
+    assert "CPU time limit" in result["error"]
+    assert pool.run("print('ok')")["success"]
+
+
+def test_memory_rlimit_recycles_the_worker(make_pool):
+    pytest.importorskip("resource")
+    pool = make_pool(memory_mb=256)
+    result = pool.run("data = 'x' * (1024 * 1024 * 1024)")
+    assert not result["success"]
+    assert "MemoryError" in result["error"]
+    wait_for(lambda: pool.stats()["recycled"] == 1)
+    assert pool.run("print('ok')")["success"]
+
+
+def test_output_is_capped(make_pool):
+    pool = make_pool(max_output_bytes=100)
+    result = pool.run("while True:\n    print('spam')")
+    assert result["success"]
+    assert result["output"].endswith("(output truncated)")
+    assert len(result["output"].split("\n...")[0].encode()) <= 100
+
+
+def test_workers_are_recycled_after_max_jobs(make_pool):
+    pool = make_pool(max_jobs=2)
+    for i in range(3):
+        assert pool.run(f"print({i})")["output"] == f"{i}\n"
+    wait_for(lambda: pool.stats()["recycled"] == 1)
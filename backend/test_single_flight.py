@@ -0,0 +1,169 @@
+"""
+Single-flight tests: identical concurrent requests share one generation,
+late joiners replay from the start, errors reach every waiter, and the
+generation stops once every subscriber has left.
+Run from backend/: python -m pytest -q test_single_flight.py
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("JARVIS_FAKE_BACKENDS", "true")
+
+from core.fakes import FakeOllamaClient, ScriptedResponder
+from core.single_flight import SingleFlight, request_key
+
+
+class CountingBackend:
+    """Fake Ollama client that counts generations and notices closed streams"""
+
+    def __init__(self, tokens_per_sec: float = 50.0, ttft: float = 0.0):
+        responder = ScriptedResponder(default="alpha beta gamma delta epsilon", ttft=ttft, tokens_per_sec=tokens_per_sec, prompt_tokens_per_sec=0)
+        self.client = FakeOllamaClient(responder=responder)
+        self.calls = 0
+        self.closed = threading.Event()
+
+    def stream(self):
+        self.calls += 1
+        try:
+            for chunk in self.client.chat("fake", [{"role": "user", "content": "hi"}], stream=True):
+                yield chunk["message"]["content"]
+        finally:
+            self.closed.set()
+
+
+def call(results: list, fn, *args):
+    """Thread target: append fn's result, or the exception it raised"""
+    try:
+        results.append(fn(*args))
+    except Exception as e:
+        results.append(e)
+
+
+def test_request_key_normalizes_whitespace_and_params():
+    a = request_key("what  is\nup", "sys", [{"role": "user", "content": "hi "}], temperature=0.7)
+    b = request_key("what is up", " sys", [{"role": "user", "content": "hi"}], temperature=0.7)
+    assert a == b
+    assert a != request_key("what is up", "sys", [{"role": "user", "content": "hi"}], temperature=0.2)
+
+
+def test_run_coalesces_concurrent_callers():
+    flights = SingleFlight()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=call, args=(results, flights.run, "k", generate)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+    assert flights.stats()["coalesced"] == 3
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_run_error_reaches_joiners():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def generate():
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("backend down")
+
+    results = []
+    leader = threading.Thread(target=call, args=(results, flights.run, "k", generate))
+    leader.start()
+    started.wait(1)
+    joiner = threading.Thread(target=call, args=(results, flights.run, "k", generate))
+    joiner.start()
+    leader.join(2)
+    joiner.join(2)
+    assert len(results) == 2
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flights.stats()["generations"] == 1
+
+
+def test_stream_joiner_replays_from_the_start():
+    backend = CountingBackend()
+    flights = SingleFlight()
+    leader = flights.stream("k", backend.stream)
+    first = next(leader)
+    joiner = flights.stream("k", backend.stream)
+
+    joined = "".join(joiner)
+    rest = first + "".join(leader)
+    assert joined == rest == "alpha beta gamma delta epsilon"
+    assert backend.calls == 1
+    assert flights.stats()["coalesced"] == 1
+
+
+def test_one_subscriber_leaving_does_not_stop_the_others():
+    backend = CountingBackend()
+    flights = SingleFlight()
+    leaving = flights.stream("k", backend.stream)
+    staying = flights.stream("k", backend.stream)
+    next(leaving)
+    leaving.close()
+
+    assert "".join(staying) == "alpha beta gamma delta epsilon"
+    assert backend.calls == 1
+
+
+def test_all_subscribers_leaving_stops_the_generation():
+    backend = CountingBackend(tokens_per_sec=20)
+    flights = SingleFlight()
+    only = flights.stream("k", backend.stream)
+    next(only)
+    only.close()
+
+    assert backend.closed.wait(1), "source stream was not closed"
+    assert flights.stats()["in_flight"] == 0
+
+    # An identical request afterwards starts a fresh, complete generation
+    fresh = CountingBackend()
+    assert "".join(flights.stream("k", fresh.stream)) == "alpha beta gamma delta epsilon"
+    assert fresh.calls == 1
+
+
+def test_joiner_that_has_not_read_yet_keeps_the_generation():
+    backend = CountingBackend(tokens_per_sec=20)
+    flights = SingleFlight()
+    first = flights.stream("k", backend.stream)
+    late = flights.stream("k", backend.stream)  # e.g. a response not streaming yet
+    next(first)
+    first.close()
+
+    assert "".join(late) == "alpha beta gamma delta epsilon"
+    assert backend.calls == 1
+
+
+def test_closing_twice_counts_once():
+    backend = CountingBackend(tokens_per_sec=20)
+    flights = SingleFlight()
+    leaving = flights.stream("k", backend.stream)
+    staying = flights.stream("k", backend.stream)
+    leaving.close()
+    leaving.close()
+    assert "".join(staying) == "alpha beta gamma delta epsilon"
+
+
+def test_factory_error_is_raised_to_the_leader_and_forgotten():
+    flights = SingleFlight()
+
+    def broken():
+        raise RuntimeError("queue full")
+
+    with pytest.raises(RuntimeError):
+        flights.stream("k", broken)
+    assert flights.stats()["in_flight"] == 0
+    assert "".join(flights.stream("k", CountingBackend().stream)) == "alpha beta gamma delta epsilon"
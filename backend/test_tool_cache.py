@@ -0,0 +1,101 @@
+"""
+Tool result cache tests: TTL expiry, side-effecting tools never cached,
+failed outputs not cached, input normalization, LRU bounds, and reuse
+across AutonomousAgent runs on the fake Ollama backend.
+Run from backend/: python -m pytest -q test_tool_cache.py
+"""
+
+import time
+
+from core.tool_cache import NEVER_CACHE, ToolResultCache, is_cacheable_output, normalize_input
+
+
+def test_hit_within_ttl_and_miss_after_expiry():
+    cache = ToolResultCache()
+    cache.put("web_search", "python asyncio", "results", ttl=0.2)
+    assert cache.get("web_search", "python asyncio") == "results"
+    time.sleep(0.25)
+    assert cache.get("web_search", "python asyncio") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+
+
+def test_ttl_none_never_expires():
+    cache = ToolResultCache()
+    cache.put("calculator", "2+2", "✅ Result: 4", ttl=None)
+    time.sleep(0.05)
+    assert cache.get("calculator", "2+2") == "✅ Result: 4"
+
+
+def test_side_effecting_tools_are_never_cached():
+    cache = ToolResultCache()
+    for tool in NEVER_CACHE:
+        cache.put(tool, "hello", "✅ done", ttl=60)
+        assert cache.get(tool, "hello") is None
+    assert cache.stats()["size"] == 0
+    assert {"send_email", "write_file", "execute_code"} <= NEVER_CACHE
+
+
+def test_failed_outputs_are_not_cached():
+    cache = ToolResultCache()
+    for output in ("Error: connection refused", "❌ Search failed", "Request timed out after 20s"):
+        assert not is_cacheable_output(output)
+        cache.put("web_search", "q", output, ttl=60)
+    assert cache.get("web_search", "q") is None
+    assert is_cacheable_output("✅ Result: 4")
+
+
+def test_inputs_are_normalized_per_tool():
+    assert normalize_input("calculator", " 2 *  3 ") == "2*3"
+    assert normalize_input("web_search", "Python  Asyncio?") == "python asyncio"
+    assert normalize_input("scrape_webpage", "https://example.com/") == "https://example.com"
+    assert normalize_input("get_time", "Europe/London ") == "Europe/London"  # Case kept elsewhere
+
+    cache = ToolResultCache()
+    cache.put("web_search", "Python Asyncio", "results", ttl=60)
+    assert cache.get("web_search", "python  asyncio!") == "results"
+    assert cache.get("search_news", "python asyncio") is None  # Keyed per tool
+
+
+def test_lru_eviction_by_entries():
+    cache = ToolResultCache(max_entries=2)
+    cache.put("calculator", "1+1", "2", ttl=None)
+    cache.put("calculator", "2+2", "4", ttl=None)
+    cache.get("calculator", "1+1")  # Most recently used now
+    cache.put("calculator", "3+3", "6", ttl=None)
+    assert cache.get("calculator", "2+2") is None
+    assert cache.get("calculator", "1+1") == "2"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_eviction_by_size():
+    cache = ToolResultCache(max_chars=10)
+    cache.put("web_search", "a", "x" * 6, ttl=None)
+    cache.put("web_search", "b", "y" * 6, ttl=None)
+    assert cache.get("web_search", "a") is None
+    assert cache.stats()["chars"] == 6
+    cache.put("web_search", "c", "z" * 11, ttl=None)  # Larger than the whole cache
+    assert cache.get("web_search", "c") is None
+
+
+def test_agent_reuses_results_across_runs(agent):
+    calls = []
+    agent.tools["calculator"]["func"] = lambda expression: calls.append(expression) or "✅ Result: 100"
+    first = agent.execute("What is 25 * 4?")
+    second = agent.execute("What is 25 * 4?")
+    assert calls == ["25 * 4"]
+    assert first["usage"]["tool_cache"] == {"hits": 0, "misses": 1}
+    assert second["usage"]["tool_cache"] == {"hits": 1, "misses": 0}
+
+
+def test_agent_never_caches_side_effecting_tools(agent):
+    for name in NEVER_CACHE & agent.tools.keys():
+        assert "cache_ttl" not in agent.tools[name]
+
+
+def test_agent_does_not_cache_timed_out_calls(agent):
+    agent.tools["calculator"]["timeout"] = 0.1
+    agent.tools["calculator"]["func"] = lambda expression: time.sleep(0.5) or "✅ Result: 100"
+    results = agent._run_tools([{"tool": "calculator", "input": "25 * 4"}])
+    assert results[0]["timed_out"]
+    assert agent.tool_cache.get("calculator", "25 * 4") is None
@@ -1,24 +1,152 @@
+"""
+Offline evaluation of the hybrid query router.
+Compares the legacy keyword heuristic with the trained classifier on a labeled
+query set, reporting routing accuracy against simulated end-to-end latency.
+"""
+
+import os
+import sys
 import unittest
-from backend.core.llm_engine import llm_engine
 
-class TestHybridRouter(unittest.TestCase):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from core.router import QueryClassifier, QueryRouter, keyword_is_complex
+
+LOREM_DOC = (
+    "Quarterly report. Revenue grew in the northern region while costs stayed flat. "
+    "The team shipped the new onboarding flow and support tickets dropped. "
+) * 6
+
+# label 1 = needs the cloud model, 0 = local is good enough
+TRAIN = [
+    ("Write a python function to add two numbers.", 0),
+    ("What is the capital of France?", 0),
+    ("Design a button with rounded corners in CSS.", 0),
+    ("Design a simple login form in HTML.", 0),
+    ("Fix this syntax error: print('hi'", 0),
+    ("Translate 'good morning' to Spanish.", 0),
+    ("What's a floor plan?", 0),
+    ("Reverse a string in javascript", 0),
+    ("Convert 5 miles to kilometers", 0),
+    ("What does HTTP 404 mean?", 0),
+    ("Give me a regex for email addresses", 0),
+    ("Summarize this text: " + LOREM_DOC, 0),
+    ("Fix the typos in this paragraph: " + LOREM_DOC, 0),
+    ("Explain what a list comprehension is", 0),
+    ("How do I install numpy?", 0),
+    ("Plan a quick lunch menu with a sandwich", 0),
+    ("Compare two integers in python", 0),
+    ("Write a SQL query to count rows in a table", 0),
+    ("Analyze the geopolitical implications of Mars colonization and propose a 10-year strategy.", 1),
+    ("Design a scalable microservice architecture for a global payments platform with failover.", 1),
+    ("Evaluate the trade-offs between event sourcing and CRUD for a banking system, step by step.", 1),
+    ("Critique this business strategy and reason about its long-term risks in detail.", 1),
+    ("Compare and contrast the economic policies of Keynes and Hayek with historical evidence.", 1),
+    ("Develop a multi-phase migration plan from a monolith to Kubernetes with rollback strategy.", 1),
+    ("Reason through the ethical implications of autonomous weapons and argue both sides.", 1),
+    ("Prove that there are infinitely many primes and discuss generalizations.", 1),
+    ("Analyze the root causes of the 2008 financial crisis and evaluate the policy responses.", 1),
+    ("Design a distributed consensus protocol and reason about its fault tolerance guarantees.", 1),
+    ("Write a detailed research proposal evaluating competing theories of dark matter.", 1),
+    ("Create a comprehensive go-to-market strategy for a B2B SaaS product across three regions.", 1),
+]
+
+EVAL = [
+    ("Write a python function to multiply two numbers.", 0),
+    ("Design a button that turns blue on hover.", 0),
+    ("What's the capital of Japan?", 0),
+    ("Summarize this document: " + LOREM_DOC, 0),
+    ("Give me a regex for phone numbers", 0),
+    ("Compare two strings in javascript", 0),
+    ("Translate 'thank you' to French.", 0),
+    ("How do I install pandas?", 0),
+    ("Analyze the long-term implications of AI regulation and propose a policy strategy.", 1),
+    ("Design a fault tolerant architecture for a global chat platform with failover.", 1),
+    ("Evaluate the trade-offs between microservices and a monolith for a startup, step by step.", 1),
+    ("Critique this research proposal and reason about its methodological risks in detail.", 1),
+]
+
+# Simulated latency: local pays prompt eval per input char, cloud pays network + queue
+LOCAL_BASE_S, LOCAL_PER_CHAR_S = 1.2, 0.002
+CLOUD_S = 3.5
+
+
+def simulated_latency(message: str, backend: str) -> float:
+    if backend == "local":
+        return LOCAL_BASE_S + LOCAL_PER_CHAR_S * len(message)
+    return CLOUD_S
+
+
+def evaluate(predict_cloud, samples):
+    """Accuracy, cloud share and mean simulated latency of a routing policy"""
+    correct = cloud = 0
+    latency = 0.0
+    for message, label in samples:
+        to_cloud = predict_cloud(message)
+        correct += int(to_cloud == bool(label))
+        cloud += int(to_cloud)
+        latency += simulated_latency(message, "gemini" if to_cloud else "local")
+    n = len(samples)
+    return {"accuracy": correct / n, "cloud_rate": cloud / n, "mean_latency_s": latency / n}
+
+
+class TestKeywordRouter(unittest.TestCase):
     def test_simple_query(self):
         query = "Write a python function to add two numbers."
-        is_complex = llm_engine._is_complex_query(query)
+        is_complex = keyword_is_complex(query)
         print(f"Query: '{query}' -> Complex: {is_complex}")
         self.assertFalse(is_complex, "Simple coding query should be routed to Local")
 
     def test_complex_query(self):
         query = "Analyze the geopolitical implications of Mars colonization and design a comprehensive 10-year strategy for a sustainable colony."
-        is_complex = llm_engine._is_complex_query(query)
+        is_complex = keyword_is_complex(query)
         print(f"Query: '{query}' -> Complex: {is_complex}")
         self.assertTrue(is_complex, "Complex strategy query should be routed to Gemini")
 
     def test_complex_keywords(self):
         query = "Compare and contrast React and Vue."
-        is_complex = llm_engine._is_complex_query(query)
+        is_complex = keyword_is_complex(query)
         print(f"Query: '{query}' -> Complex: {is_complex}")
         self.assertTrue(is_complex, "Query with 'compare' should be complex")
 
+
+class TestRoutingEvaluation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.router = QueryRouter(classifier=QueryClassifier().fit(TRAIN))
+
+    def test_classifier_beats_keywords(self):
+        keyword = evaluate(keyword_is_complex, EVAL)
+        learned = evaluate(self.router.is_complex, EVAL)
+        oracle = evaluate(lambda m: dict(EVAL)[m] == 1, EVAL)
+        for name, result in (("keyword", keyword), ("classifier", learned), ("oracle", oracle)):
+            print(f"{name:>10}: accuracy={result['accuracy']:.2f} cloud_rate={result['cloud_rate']:.2f} "
+                  f"mean_latency={result['mean_latency_s']:.2f}s")
+        self.assertGreater(learned["accuracy"], keyword["accuracy"])
+        self.assertLess(learned["mean_latency_s"], keyword["mean_latency_s"])
+
+    def test_simple_design_and_pasted_documents_stay_local(self):
+        self.assertFalse(self.router.is_complex("Design a button that turns blue on hover."))
+        self.assertFalse(self.router.is_complex("Summarize this document: " + LOREM_DOC))
+
+    def test_latency_pressure_shifts_threshold(self):
+        idle = {"local": {"ewma_latency_ms": 1000, "max_concurrency": 1},
+                "gemini": {"ewma_latency_ms": 1000, "max_concurrency": 4}}
+        cloud_slow = {"local": {"ewma_latency_ms": 1000, "max_concurrency": 1},
+                      "gemini": {"ewma_latency_ms": 20000, "queue_depth": 4, "max_concurrency": 4}}
+        local_busy = {"local": {"ewma_latency_ms": 8000, "queue_depth": 6, "in_flight": 1, "max_concurrency": 1},
+                      "gemini": {"ewma_latency_ms": 1000, "max_concurrency": 4}}
+        self.assertAlmostEqual(self.router.effective_threshold(idle), self.router.threshold)
+        self.assertGreater(self.router.effective_threshold(cloud_slow), self.router.threshold)
+        self.assertLess(self.router.effective_threshold(local_busy), self.router.threshold)
+
+    def test_decisions_are_recorded(self):
+        decision = self.router.decide("What's the capital of Japan?")
+        self.assertEqual(decision["backend"], "local")
+        self.assertEqual(self.router.recent_decisions(1)[-1], decision)
+        forced = self.router.decide("Analyze everything in detail", force_local=True)
+        self.assertEqual(forced["reason"], "forced local")
+
+
 if __name__ == '__main__':
     unittest.main()